@@ -4,7 +4,6 @@ import json
 import os
 from time import time
 
-import aiohttp
 import discord
 from discord.ext import commands
 
@@ -13,7 +12,7 @@ from cogs.utils import checks
 from cogs.utils.chat_formatting import pagify, box
 from cogs.utils.dataIO import dataIO
 
-from .rpadutils import Menu, char_to_emoji
+from .rpadutils import Menu, char_to_emoji, get_http_client
 from .utils.chat_formatting import *
 
 
@@ -32,10 +31,8 @@ class AzureLane:
     async def reload_al(self):
         await self.bot.wait_until_ready()
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(DATA_URL) as resp:
-                raw_resp = await resp.text()
-                self.card_data = json.loads(raw_resp)['items']
+        raw_resp = await get_http_client().get_text(DATA_URL)
+        self.card_data = json.loads(raw_resp)['items']
         print('done retrieving cards: {}'.format(len(self.card_data)))
 
         self.id_to_card = {c['id']: c for c in self.card_data}
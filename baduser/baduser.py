@@ -10,7 +10,6 @@ import os
 import re
 from time import time
 
-import aiohttp
 import discord
 from discord.ext import commands
 
@@ -331,10 +330,9 @@ class BadUser:
         }
 
         if rpadutils.should_download(ban_file_path, expiry_secs):
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, data=payload) as resp:
-                    ban_text = await resp.text()
-                    rpadutils.writePlainFile(ban_file_path, ban_text)
+            resp = await rpadutils.get_http_client().fetch(url, method='POST', data=payload)
+            ban_text = resp.text()
+            rpadutils.writePlainFile(ban_file_path, ban_text)
         else:
             ban_text = rpadutils.readPlainFile(ban_file_path)
 
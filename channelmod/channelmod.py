@@ -6,14 +6,13 @@ import os
 import time
 import traceback
 
-import aiohttp
 import discord
 from discord.ext import commands
 
 from cogs.utils import checks
 from cogs.utils.chat_formatting import inline, box
 
-from .rpadutils import CogSettings, ReportableError
+from .rpadutils import CogSettings, ReportableError, get_http_client
 
 
 log = logging.getLogger("red.admin")
@@ -185,9 +184,7 @@ class ChannelMod:
             if 'url' and 'filename' in attachment:
                 url = attachment['url']
                 filename = attachment['filename']
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        attachment_bytes = io.BytesIO(await response.read())
+                attachment_bytes = io.BytesIO(await get_http_client().get_bytes(url))
 
         for dest_channel_id in mirrored_channels:
             try:
@@ -12,7 +12,6 @@ import textwrap
 from time import time
 from zipfile import ZipFile
 
-import aiohttp
 import cv2
 import discord
 from discord.ext import commands
@@ -32,6 +31,9 @@ ORB_DATA_DIR = os.path.join(DATA_DIR, 'orb_images')
 PIXEL_DATA_DIR = os.path.join(DATA_DIR, 'pixel_data')
 PIXEL_FILE = 'hsv_pixels_to_orb.pdict'
 PIXEL_FILE_PATH = os.path.join(PIXEL_DATA_DIR, PIXEL_FILE)
+# Training zips are much larger than the shared client's default cap, and take longer than its timeout
+MAX_DOWNLOAD_BYTES = 256 * 1024 * 1024
+DOWNLOAD_TIMEOUT_SECS = 10 * 60
 
 DAWNGLARE_BOARD_TEMPLATE = "https://candyninja001.github.io/Puzzled/?patt={}"
 MIRUGLARE_BOARD_TEMPLATE = "https://storage.googleapis.com/mirubot/websites/padsim/index.html?patt={}"
@@ -70,22 +72,23 @@ class PadBoard:
     async def downloadpixelfile(self, ctx, pixel_file_url):
         """Replaces the current H/S pixel to orb map file"""
         await self.bot.say(inline('starting download'))
-        async with aiohttp.get(pixel_file_url) as r:
-            if r.status != 200:
-                await self.bot.say(inline('download failed'))
-                return
+        r = await rpadutils.get_http_client().fetch(pixel_file_url, max_bytes=MAX_DOWNLOAD_BYTES,
+                                                  timeout_secs=DOWNLOAD_TIMEOUT_SECS)
+        if r.status != 200:
+            await self.bot.say(inline('download failed'))
+            return
 
-            file_bytes = await r.read()
+        file_bytes = r.body
 
-            await self.bot.say(box('deleting existing file and replacing with file of size: {}'.format(len(file_bytes))))
+        await self.bot.say(box('deleting existing file and replacing with file of size: {}'.format(len(file_bytes))))
 
-            os.makedirs(PIXEL_DATA_DIR, exist_ok=True)
-            with open(PIXEL_FILE_PATH, 'wb') as f:
-                f.write(file_bytes)
+        os.makedirs(PIXEL_DATA_DIR, exist_ok=True)
+        with open(PIXEL_FILE_PATH, 'wb') as f:
+            f.write(file_bytes)
 
-            await self.bot.say(inline('done saving'))
-            self.hsv_pixels_to_orb = padvision.load_hsv_to_orb(PIXEL_FILE_PATH)
-            await self.bot.say(inline('done reloading'))
+        await self.bot.say(inline('done saving'))
+        self.hsv_pixels_to_orb = padvision.load_hsv_to_orb(PIXEL_FILE_PATH)
+        await self.bot.say(inline('done reloading'))
 
     @padboard.command(pass_context=True)
     @checks.is_owner()
@@ -94,25 +97,25 @@ class PadBoard:
         Current path to zip file is https://drive.google.com/uc?export=download&id=0B4BJOUE5gL0UTF9xZnJkVHJYWEU
         """
         await self.bot.say(inline('starting download'))
-        async with aiohttp.get(training_zip_url) as r:
-            if r.status != 200:
-                await self.bot.say(inline('download failed'))
-                return
-
-            zipfile_bytes = await r.read()
-            zip_file = ZipFile(BytesIO(zipfile_bytes))
-            files = zip_file.namelist()
-
-            if len(files) == 0:
-                await self.bot.say(inline('empty zip file?'))
-                return
-
-            await self.bot.say(box('deleting existing files and unzipping files: {}'.format(len(files))))
-            self.clear_training_folder()
-            zip_file.extractall(ORB_DATA_DIR)
-            await self.bot.say(inline('done extracting'))
-            self.orb_type_to_images = padvision.load_orb_images_dir_to_map(ORB_DATA_DIR)
-            await self.bot.say(inline('done reloading'))
+        r = await rpadutils.get_http_client().fetch(training_zip_url, max_bytes=MAX_DOWNLOAD_BYTES,
+                                                  timeout_secs=DOWNLOAD_TIMEOUT_SECS)
+        if r.status != 200:
+            await self.bot.say(inline('download failed'))
+            return
+
+        zip_file = ZipFile(BytesIO(r.body))
+        files = zip_file.namelist()
+
+        if len(files) == 0:
+            await self.bot.say(inline('empty zip file?'))
+            return
+
+        await self.bot.say(box('deleting existing files and unzipping files: {}'.format(len(files))))
+        self.clear_training_folder()
+        zip_file.extractall(ORB_DATA_DIR)
+        await self.bot.say(inline('done extracting'))
+        self.orb_type_to_images = padvision.load_orb_images_dir_to_map(ORB_DATA_DIR)
+        await self.bot.say(inline('done reloading'))
 
     def find_image(self, user_id):
         urls = list(self.logs[user_id])
@@ -121,10 +124,9 @@ class PadBoard:
         return None
 
     async def download_image(self, image_url):
-        async with aiohttp.get(image_url) as r:
-            if r.status == 200:
-                image_data = await r.read()
-                return image_data
+        r = await rpadutils.get_http_client().fetch(image_url)
+        if r.status == 200:
+            return r.body
         return None
 
     @commands.command(pass_context=True)
@@ -45,6 +45,8 @@ class PadEvents:
 
         self.fake_uid = -999
 
+        generation_tracker.track('PadEvents cog', self)
+
     def __unload(self):
         # Manually nulling out database because the GC for cogs seems to be pretty shitty
         self.events = list()
@@ -707,10 +707,9 @@ class PadGlobal:
                 break
 
         try:
-            async with aiohttp.get(source_url) as resp:
-                emoji_content = await resp.read()
-                await self.bot.create_custom_emoji(emoji_server, name=emoji_name, image=emoji_content)
-                await self.bot.say(inline('Done creating emoji named {}'.format(emoji_name)))
+            emoji_content = await rpadutils.get_http_client().get_bytes(source_url)
+            await self.bot.create_custom_emoji(emoji_server, name=emoji_name, image=emoji_content)
+            await self.bot.say(inline('Done creating emoji named {}'.format(emoji_name)))
         except Exception as ex:
             await self.bot.say(box('Error:\n' + str(ex)))
 
@@ -8,15 +8,22 @@ Don't hold on to any of the dastructures exported from here, or the
 entire database could be leaked when the module is reloaded.
 """
 from _collections import defaultdict
+from collections import Counter
+from collections import namedtuple
 import asyncio
+import bisect
 import csv
 from datetime import datetime
 from datetime import timedelta
 import difflib
+import gc
+import hashlib
+import io
 from itertools import groupby
 from operator import itemgetter
 import os
 import re
+import sqlite3
 import time
 import traceback
 
@@ -32,13 +39,14 @@ from . import rpadutils
 from .rpadutils import CogSettings
 from .utils import checks
 from .utils.chat_formatting import box, inline
-from .utils.dataIO import dataIO
 
 
 DUMMY_FILE_PATTERN = 'data/padguide2/{}.dummy'
 JSON_FILE_PATTERN = 'data/padguide2/{}.json'
 CSV_FILE_PATTERN = 'data/padguide2/{}.csv'
 ATTR_EXPORT_PATH = 'data/padguide2/card_data.csv'
+ATTR_CHANGES_EXPORT_PATH = 'data/padguide2/card_data_changed.csv'
+SQLITE_EXPORT_PATH = 'data/padguide2/padguide.sqlite'
 
 SHEETS_PATTERN = 'https://docs.google.com/spreadsheets/d/1EoZJ3w5xsXZ67kmarLE4vfrZSIIIAfj04HXeZVST3eY/pub?gid={}&single=true&output=csv'
 GROUP_BASENAMES_OVERRIDES_SHEET = SHEETS_PATTERN.format('2070615818')
@@ -49,6 +57,16 @@ NICKNAME_FILE_PATTERN = CSV_FILE_PATTERN.format('nicknames')
 BASENAME_FILE_PATTERN = CSV_FILE_PATTERN.format('basenames')
 MONSTERDATA_FILE_PATTERN = CSV_FILE_PATTERN.format('monsterdata')
 
+SKILL_ROTATION_SERVERS = {
+    'JP': rpadutils.JP_TZ_OBJ,
+    'NA': rpadutils.NA_TZ_OBJ,
+}
+
+
+def server_date(server: str):
+    """The current date in the server's local timezone."""
+    return datetime.now(SKILL_ROTATION_SERVERS[server]).date()
+
 
 class PadGuide2(object):
     def __init__(self, bot):
@@ -57,6 +75,9 @@ class PadGuide2(object):
 
         self.settings = PadGuide2Settings("padguide2")
         self.reload_task = None
+        # Hash of the last card_data.csv contents, used to skip unchanged exports
+        self.attr_export_hash = None
+        self.rotation_task = None
 
         self._standard_refresh = [
             PgAttribute,
@@ -93,6 +114,12 @@ class PadGuide2(object):
         self.basename_overrides = defaultdict(set)
 
         self.database = PgRawDatabase(skip_load=True)
+        # Set once a download has been built with overrides and indexed; until then always rebuild
+        self.database_is_current = False
+
+        gc_pause_monitor.install()
+        rpadutils.generation_tracker.refreeze_callbacks.append(freeze_long_lived_objects)
+        rpadutils.generation_tracker.track('PadGuide2 cog', self)
 
     @asyncio.coroutine
     def wait_until_ready(self):
@@ -113,18 +140,37 @@ class PadGuide2(object):
 
     def register_tasks(self):
         self.reload_task = self.bot.loop.create_task(self.reload_data_task())
+        self.rotation_task = self.bot.loop.create_task(self.refresh_skill_rotations_task())
 
     def __unload(self):
         # Manually nulling out database because the GC for cogs seems to be pretty shitty
         self.database = None
         self._is_ready.clear()
 
+        gc_pause_monitor.uninstall()
+        if freeze_long_lived_objects in rpadutils.generation_tracker.refreeze_callbacks:
+            rpadutils.generation_tracker.refreeze_callbacks.remove(freeze_long_lived_objects)
+        # Let the cyclic collector see the old generations again
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+
+    def _install_database(self, database: 'PgRawDatabase'):
+        """Swaps in a newly built database and schedules a freeze of the heap.
+
+        The old database is left to the cyclic GC rather than retired; padinfo, padevents
+        and padrem hold its monsters until their next hourly refresh.
+        """
+        self.database = database
+        # Consumers keep the previous generation until they reindex
+        rpadutils.generation_tracker.track('padguide2 database', database, expected_alive=2)
+        freeze_long_lived_objects()
+
     async def reload_data_task(self):
         await self.bot.wait_until_ready()
 
         try:
             # Try and load the PadGuide database the first time with existing files
-            self.database = PgRawDatabase()
+            self._install_database(PgRawDatabase())
             self._is_ready.set()
             print('Finished initial PadGuide2 load with existing database')
         except:
@@ -149,6 +195,26 @@ class PadGuide2(object):
                 traceback.print_exc()
                 raise ex
 
+    async def refresh_skill_rotations_task(self):
+        """Recomputes skill rotations when a server rolls over to a new day.
+
+        The database only computes rotations when it is built, so without this
+        the active skillups would go stale until the next download.
+        """
+        await self.wait_until_ready()
+        while self == self.bot.get_cog('PadGuide2'):
+            try:
+                for server in SKILL_ROTATION_SERVERS:
+                    if self.database.refresh_skill_rotations(server):
+                        print('Recomputed', server, 'skill rotations')
+            except Exception as ex:
+                print("padguide2 skill rotation refresh failed", ex)
+                traceback.print_exc()
+
+            # Wake up shortly after the next server-local midnight
+            wait_time = min(seconds_until_server_midnight(s) for s in SKILL_ROTATION_SERVERS)
+            await asyncio.sleep(wait_time + 5)
+
     async def reload_config_files(self):
         os.remove(NICKNAME_FILE_PATTERN)
         os.remove(BASENAME_FILE_PATTERN)
@@ -156,7 +222,9 @@ class PadGuide2(object):
         await self.download_and_refresh_nicknames()
 
     async def download_and_refresh_nicknames(self):
-        await self._download_files()
+        if not await self._download_files() and self.database_is_current:
+            print('PadGuide2 files unchanged, skipping rebuild')
+            return
 
         nickname_overrides = self._csv_to_tuples(NICKNAME_FILE_PATTERN)
         basename_overrides = self._csv_to_tuples(BASENAME_FILE_PATTERN)
@@ -173,14 +241,30 @@ class PadGuide2(object):
         monsterdata_overrides = self._csv_to_tuples(MONSTERDATA_FILE_PATTERN, 7)
         self.monsterdata_overrides = {int(x[0]): x for x in monsterdata_overrides if x[0].isdigit()}
 
-        self.database = PgRawDatabase()
-        self.database.update_with_overrides(self.monsterdata_overrides)
+        database = PgRawDatabase()
+        database.update_with_overrides(self.monsterdata_overrides)
+        self._install_database(database)
         self.index = MonsterIndex(self.database, self.nickname_overrides, self.basename_overrides)
+        rpadutils.generation_tracker.track('padguide2 index', self.index)
+
+        self.database_is_current = True
 
         self.write_monster_attr_data()
 
+        try:
+            export_database_to_sqlite(self.database, SQLITE_EXPORT_PATH)
+        except Exception as ex:
+            # Only external tools read this; don't fail the refresh over it
+            print('padguide2 sqlite export failed', ex)
+            traceback.print_exc()
+
     def write_monster_attr_data(self):
-        """Write id,server,attr1,attr2 to be used by the portrait generation process."""
+        """Write id,server,attr1,attr2 to be used by the portrait generation process.
+
+        The file is only replaced when its contents change, so the portrait process
+        isn't woken up for nothing. Rows that are new or changed since the previous
+        export are also written to ATTR_CHANGES_EXPORT_PATH.
+        """
         attr_short_prefix_map = {
             Attribute.Fire: 'r',
             Attribute.Water: 'b',
@@ -193,24 +277,47 @@ class PadGuide2(object):
         na_only = [x for x in self.database._monster_map.values() if x.monster_no !=
                    x.monster_no_na and x.monster_no_na == x.monster_no_jp]
 
-        na_only_base_no = [x.monster_no for x in na_only]
-        na_only_server_no = [x.monster_no_na for x in na_only]
-
-        with open(ATTR_EXPORT_PATH, 'w') as csvfile:
-            writer = csv.writer(csvfile, delimiter=',', lineterminator='\n')
-            for m in self.database._monster_map.values():
-                attr1 = attr_short_prefix_map[m.attr1]
-                attr2 = attr_short_prefix_map[m.attr2] if m.attr2 else ''
-                if m.monster_no in na_only_base_no:
-                    # Writes stuff like voltron
-                    writer.writerow([m.monster_no_na, 'na', attr1, attr2])
-                elif m.monster_no_jp in na_only_server_no:
-                    # Writes stuff like crows
-                    writer.writerow([m.monster_no_jp, 'jp', attr1, attr2])
-                else:
-                    # writes everything else
-                    writer.writerow([m.monster_no_na, 'na', attr1, attr2])
-                    writer.writerow([m.monster_no_jp, 'jp', attr1, attr2])
+        na_only_base_no = set([x.monster_no for x in na_only])
+        na_only_server_no = set([x.monster_no_na for x in na_only])
+
+        rows = []
+        for m in self.database._monster_map.values():
+            attr1 = attr_short_prefix_map[m.attr1]
+            attr2 = attr_short_prefix_map[m.attr2] if m.attr2 else ''
+            if m.monster_no in na_only_base_no:
+                # Writes stuff like voltron
+                rows.append([str(m.monster_no_na), 'na', attr1, attr2])
+            elif m.monster_no_jp in na_only_server_no:
+                # Writes stuff like crows
+                rows.append([str(m.monster_no_jp), 'jp', attr1, attr2])
+            else:
+                # writes everything else
+                rows.append([str(m.monster_no_na), 'na', attr1, attr2])
+                rows.append([str(m.monster_no_jp), 'jp', attr1, attr2])
+
+        content = rows_to_csv(rows)
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        if content_hash == self.attr_export_hash:
+            return
+
+        old_content = ''
+        if os.path.exists(ATTR_EXPORT_PATH):
+            with open(ATTR_EXPORT_PATH, encoding='utf-8', newline='') as f:
+                old_content = f.read()
+
+        if content == old_content:
+            # First export since startup, and the file on disk is already current
+            self.attr_export_hash = content_hash
+            return
+
+        # Keyed by (id, server); anything missing or different from the old export changed
+        old_rows = {(r[0], r[1]): r for r in csv.reader(io.StringIO(old_content)) if len(r) >= 2}
+        changed_rows = [r for r in rows if old_rows.get((r[0], r[1])) != r]
+
+        rpadutils.write_plain_file_atomic(ATTR_CHANGES_EXPORT_PATH, rows_to_csv(changed_rows))
+        rpadutils.write_plain_file_atomic(ATTR_EXPORT_PATH, content)
+        self.attr_export_hash = content_hash
+        print('wrote monster attr data, {} changed rows'.format(len(changed_rows)))
 
     def _csv_to_tuples(self, file_path: str, cols: int=2):
         # Loads a two-column CSV into an array of tuples.
@@ -231,37 +338,52 @@ class PadGuide2(object):
                 results.append(data)
         return results
 
-    async def _download_files(self):
+    async def _download_files(self, api_base_url=None, api_max_bytes=None, json_file_pattern=JSON_FILE_PATTERN,
+                              dummy_file_pattern=DUMMY_FILE_PATTERN, file_to_sheet=None):
+        """Refreshes the cached PadGuide and override files.
+
+        The arguments default to the live API, the override sheets and data/padguide2;
+        padguidebench points them at its stand-in.
+
+        Returns True if any file changed since the last download.
+        """
+        changed = False
+
         # twelve hours expiry
         standard_expiry_secs = 12 * 60 * 60
         # four hours expiry
         quick_expiry_secs = 4 * 60 * 60
 
         # Use a dummy file to proxy for the entire database being out of date
-        general_dummy_file = DUMMY_FILE_PATTERN.format('general')
+        general_dummy_file = dummy_file_pattern.format('general')
         download_all = rpadutils.checkPadguideCacheFile(general_dummy_file, standard_expiry_secs)
 
         for type in self._standard_refresh:
             endpoint = type.file_name()
-            result_file = JSON_FILE_PATTERN.format(endpoint)
+            result_file = json_file_pattern.format(endpoint)
             if download_all or rpadutils.should_download(result_file, standard_expiry_secs):
-                await rpadutils.async_cached_padguide_request(endpoint, result_file)
+                changed |= await rpadutils.async_cached_padguide_request(
+                    endpoint, result_file, base_url=api_base_url, max_bytes=api_max_bytes)
 
         for type in self._quick_refresh:
             cur_time = int(round(time.time() * 1000))
             three_weeks_ago = cur_time - 3 * 7 * 24 * 60 * 60 * 1000
             endpoint = type.file_name()
-            result_file = JSON_FILE_PATTERN.format(endpoint)
+            result_file = json_file_pattern.format(endpoint)
             if download_all or rpadutils.should_download(result_file, quick_expiry_secs):
-                await rpadutils.async_cached_padguide_request(endpoint, result_file, time_ms=three_weeks_ago)
+                changed |= await rpadutils.async_cached_padguide_request(
+                    endpoint, result_file, time_ms=three_weeks_ago, base_url=api_base_url,
+                    max_bytes=api_max_bytes)
 
         overrides_expiry_secs = 1 * 60 * 60
-        await rpadutils.makeAsyncCachedPlainRequest(
-            NICKNAME_FILE_PATTERN, NICKNAME_OVERRIDES_SHEET, overrides_expiry_secs)
-        await rpadutils.makeAsyncCachedPlainRequest(
-            BASENAME_FILE_PATTERN, GROUP_BASENAMES_OVERRIDES_SHEET, overrides_expiry_secs)
-        await rpadutils.makeAsyncCachedPlainRequest(
-            MONSTERDATA_FILE_PATTERN, MONSTERDATA_OVERRIDES_SHEET, overrides_expiry_secs)
+        file_to_sheet = file_to_sheet or [
+            (NICKNAME_FILE_PATTERN, NICKNAME_OVERRIDES_SHEET),
+            (BASENAME_FILE_PATTERN, GROUP_BASENAMES_OVERRIDES_SHEET),
+            (MONSTERDATA_FILE_PATTERN, MONSTERDATA_OVERRIDES_SHEET),
+        ]
+        for file_path, sheet_url in file_to_sheet:
+            changed |= await rpadutils.refresh_cached_plain_file(file_path, sheet_url, overrides_expiry_secs)
+        return changed
 
     @commands.group(pass_context=True)
     @checks.is_owner()
@@ -270,6 +392,38 @@ class PadGuide2(object):
         if ctx.invoked_subcommand is None:
             await send_cmd_help(ctx)
 
+    @padguide2.command(pass_context=True)
+    @checks.is_owner()
+    async def benchmarkbuild(self, ctx):
+        """Rebuild the database from disk with a cold and warm skill cache and print timings.
+
+        Blocks the bot while the builds run.
+        """
+        results = []
+        for label, clear_cache in [('cold', True), ('warm', False)]:
+            if clear_cache:
+                active_skill_effects_cache.clear()
+            database = PgRawDatabase()
+            results.append((label, database))
+
+        msg = 'Database build timings'
+        for label, database in results:
+            msg += '\n{}: load {:.3f}s finalize {:.3f}s (skill effects parsed {}, reused {})'.format(
+                label, database.load_time, database.finalize_time,
+                database.skill_effects_misses, database.skill_effects_hits)
+            # Nothing else can see these builds
+            database.retire()
+        await self.bot.say(box(msg))
+
+    @padguide2.command(pass_context=True)
+    @checks.is_owner()
+    async def gcstats(self, ctx):
+        """Print cyclic GC pause statistics, split by whether the heap was frozen."""
+        msg = 'Frozen objects: {}\n'.format(
+            gc.get_freeze_count() if hasattr(gc, 'get_freeze_count') else 'unsupported')
+        msg += gc_pause_monitor.summary()
+        await self.bot.say(box(msg))
+
 
 class PadGuide2Settings(CogSettings):
     def make_default_settings(self):
@@ -278,6 +432,83 @@ class PadGuide2Settings(CogSettings):
         return config
 
 
+class GcPauseMonitor(object):
+    """Times every cyclic GC collection through gc.callbacks.
+
+    Stats are bucketed by generation and by whether the heap was frozen at the
+    time, so the effect of freezing the database shows up side by side. It also
+    applies a freeze requested by freeze_long_lived_objects once a full collection
+    has cleared out the garbage.
+    """
+
+    def __init__(self):
+        self.collection_start = None
+        self.freeze_pending = False
+        # (frozen, generation) -> [count, total seconds, max seconds]
+        self.stats = {}
+
+    def install(self):
+        if self.on_gc not in gc.callbacks:
+            gc.callbacks.append(self.on_gc)
+
+    def uninstall(self):
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.collection_start = time.perf_counter()
+            return
+        if self.collection_start is None:
+            return
+
+        elapsed = time.perf_counter() - self.collection_start
+        self.collection_start = None
+        frozen = hasattr(gc, 'get_freeze_count') and gc.get_freeze_count() > 0
+        stats = self.stats.setdefault((frozen, info['generation']), [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+        if self.freeze_pending and info['generation'] == 2:
+            self.freeze_pending = False
+            gc.freeze()
+
+    def summary(self):
+        if not self.stats:
+            return 'No collections recorded'
+        lines = []
+        for (frozen, generation), (count, total, max_time) in sorted(self.stats.items()):
+            lines.append('{} gen{}: {} collections, avg {:.2f}ms, max {:.2f}ms'.format(
+                'frozen  ' if frozen else 'unfrozen', generation, count,
+                total * 1000 / count, max_time * 1000))
+        return '\n'.join(lines)
+
+
+gc_pause_monitor = GcPauseMonitor()
+
+
+def freeze_long_lived_objects():
+    """Releases the previous freeze, and freezes the heap again after the next full collection.
+
+    No collection is forced, since that would stall the event loop on every install;
+    the freeze waits for one the interpreter runs on its own, so garbage from older
+    generations is reclaimed first. A generation still held by a consumer at that
+    point stays frozen until the next install. gc.freeze needs python 3.7+; on older
+    interpreters this does nothing.
+    """
+    if hasattr(gc, 'freeze'):
+        gc.unfreeze()
+        gc_pause_monitor.freeze_pending = True
+
+
+def seconds_until_server_midnight(server: str):
+    now = datetime.now(SKILL_ROTATION_SERVERS[server])
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    tomorrow = SKILL_ROTATION_SERVERS[server].localize(tomorrow)
+    return max(0, (tomorrow - now).total_seconds())
+
+
 def setup(bot):
     n = PadGuide2(bot)
     bot.add_cog(n)
@@ -285,10 +516,20 @@ def setup(bot):
 
 
 class PgRawDatabase(object):
-    def __init__(self, skip_load=False):
+    def __init__(self, skip_load=False, json_file_pattern=JSON_FILE_PATTERN):
         self._skip_load = skip_load
+        # Lets benchmarks build from a corpus other than the live cache
+        self._json_file_pattern = json_file_pattern
         self._all_pg_items = []
 
+        # Distinguishes this build from others; used by consumers to key caches
+        self.generation = time.time()
+
+        # monster_no -> list(MonsterDropInfo), filled in while dungeon monsters link
+        self._monster_no_to_drops = defaultdict(list)
+
+        load_start_time = time.perf_counter()
+
         # Load raw data items into id->value maps
         self._attribute_map = self._load(PgAttribute)
         self._awakening_map = self._load(PgAwakening)
@@ -319,8 +560,14 @@ class PgRawDatabase(object):
             self._ensure_loaded(i)
 
         # Finish loading now that all the dependencies are resolved
+        finalize_start_time = time.perf_counter()
+        active_skill_effects_cache.start_generation()
         for i in self._all_pg_items:
             i.finalize()
+        self.finalize_time = time.perf_counter() - finalize_start_time
+        self.load_time = finalize_start_time - load_start_time
+        self.skill_effects_hits = active_skill_effects_cache.hits
+        self.skill_effects_misses = active_skill_effects_cache.misses
 
         # Stick the monsters into groups so that we can calculate info across
         # the entire group
@@ -330,18 +577,50 @@ class PgRawDatabase(object):
                 continue
             self.grouped_monsters.append(MonsterGroup(m))
 
+        # Freeze the drop index and share it across each evolution tree
+        self._monster_no_to_drops = {
+            k: tuple(sorted(set(v), key=drop_display_key)) for k, v in self._monster_no_to_drops.items()}
+        self._base_monster_no_to_tree_drops = {}
+        for mg in self.grouped_monsters:
+            tree_drops = set()
+            for m in mg.members:
+                tree_drops.update(self._monster_no_to_drops.get(m.monster_no, ()))
+            if tree_drops:
+                self._base_monster_no_to_tree_drops[mg.base_monster.monster_no] = tuple(
+                    sorted(tree_drops, key=drop_display_key))
+
+        # Evolution tree closure; answers ancestor/path/material questions without walking
+        self.evolution_graph = EvolutionGraph(
+            [m for m in self._monster_map.values() if m.evo_from is None])
+
         # Used to normalize from monster NA values back to monster number
         self.monster_no_na_to_monster_no = {
             m.monster_no_na: m.monster_no for m in self._monster_map.values()}
 
-        # Skill rotation map
-        self._server_to_rotating_skillups = {
-            'NA': [],
-            'JP': [],
-        }
-        for m in self._monster_map.values():
-            for server in m.server_actives:
-                self._server_to_rotating_skillups[server].append(m)
+        # Presorted in display order (newest NA id first) so searches can stop early
+        self._monsters_by_no_na_desc = tuple(
+            sorted(self._monster_map.values(), key=lambda m: m.monster_no_na, reverse=True))
+
+        # Sorted stat columns for numeric range searches
+        self.stat_index = MonsterStatIndex(self._monster_map.values())
+
+        # Skill rotation map, recomputed when the server-local date changes
+        self._monsters_with_rotations = [m for m in self._monster_map.values() if m.rotating_skillups]
+        self._server_to_rotation_date = {}
+        self._server_to_rotating_skillups = {}
+        self.rotation_version = 0
+        for server in SKILL_ROTATION_SERVERS:
+            self.refresh_skill_rotations(server)
+
+    def retire(self):
+        """Breaks the reference cycles between items so this database can be freed by refcounting.
+
+        Every item is emptied, so only call this once nothing can reach this generation.
+        """
+        for item in self._all_pg_items:
+            item.__dict__.clear()
+        self._all_pg_items = []
+        self.grouped_monsters = []
 
     def update_with_overrides(self, monsterdata_overrides):
         for m_id_na, data in monsterdata_overrides.items():
@@ -363,11 +642,17 @@ class PgRawDatabase(object):
         if self._skip_load:
             return {}
 
-        file_path = JSON_FILE_PATTERN.format(itemtype.file_name())
+        file_path = self._json_file_pattern.format(itemtype.file_name())
         item_list = []
 
-        if dataIO.is_valid_json(file_path):
-            json_data = dataIO.load_json(file_path)
+        if os.path.exists(file_path):
+            try:
+                json_data = rpadutils.readJsonFile(file_path)
+            except (ValueError, OSError, EOFError):
+                # Don't build from a corrupt file; delete it so the next refresh downloads it again
+                print('corrupt PadGuide file, removing', file_path)
+                os.remove(file_path)
+                raise
             item_list = [itemtype(item) for item in json_data['items']]
 
         result_map = {item.key(): item for item in item_list if not item.deleted()}
@@ -391,6 +676,21 @@ class PgRawDatabase(object):
         """Exported for access to the full monster list."""
         return list(self._monster_map.values())
 
+    def monsters_by_no_na_desc(self):
+        """Exported for ordered scans; monsters sorted by monster_no_na, descending."""
+        return self._monsters_by_no_na_desc
+
+    def monster_drops(self, m: 'PgMonster'):
+        """Exported drop lookup; tuple(MonsterDropInfo) for this exact monster."""
+        return self._monster_no_to_drops.get(m.monster_no, ())
+
+    def tree_drops(self, m: 'PgMonster'):
+        """Exported drop lookup; tuple(MonsterDropInfo) for any monster in m's evolution tree."""
+        return self._base_monster_no_to_tree_drops.get(m.base_monster.monster_no, ())
+
+    def add_drop(self, drop_info: 'MonsterDropInfo'):
+        self._monster_no_to_drops[drop_info.drop_monster_no].append(drop_info)
+
     def all_egg_instances(self):
         """Exported for access to the full egg machine list."""
         return list(self._egg_instance_map.values())
@@ -400,9 +700,38 @@ class PgRawDatabase(object):
         return list(self._scheduled_event_map.values())
 
     def rotating_skillups(self, server: str):
-        """Gets monsters used as rotating skillups for the specified server"""
+        """Gets monsters used as rotating skillups for the specified server.
+
+        Sorted by monster_no, descending.
+        """
+        self.refresh_skill_rotations(server)
         return list(self._server_to_rotating_skillups[server])
 
+    def skill_rotation_date(self, server: str):
+        """The server-local date the current skill rotations were computed for."""
+        self.refresh_skill_rotations(server)
+        return self._server_to_rotation_date[server]
+
+    def refresh_skill_rotations(self, server: str, force=False):
+        """Recomputes active and upcoming rotating skillups if the server date changed.
+
+        Returns True if the rotations were recomputed.
+        """
+        today = server_date(server)
+        if not force and self._server_to_rotation_date.get(server) == today:
+            return False
+
+        rotating_skillups = []
+        for m in self._monsters_with_rotations:
+            if m.compute_skill_rotation(server, today):
+                rotating_skillups.append(m)
+        rotating_skillups.sort(key=lambda m: m.monster_no, reverse=True)
+
+        self._server_to_rotating_skillups[server] = rotating_skillups
+        self._server_to_rotation_date[server] = today
+        self.rotation_version += 1
+        return True
+
     def getAttributeEnum(self, ta_seq: int):
         attr = self._ensure_loaded(self._attribute_map.get(ta_seq))
         return attr.value if attr else None
@@ -676,6 +1005,12 @@ class PgDungeonMonsterDrop(PgItem):
         self.monster = database.getMonster(self.monster_no)
         self.dungeon_monster = database.getDungeonMonster(self.tdm_seq)
 
+        if self.monster and self.dungeon_monster and self.dungeon_monster.dungeon:
+            database.add_drop(MonsterDropInfo(self.dungeon_monster.dungeon_seq,
+                                              self.dungeon_monster.floor,
+                                              self.dungeon_monster.monster_no,
+                                              self.monster_no))
+
 
 # dungeonMonsterList.jsp
 # {
@@ -708,6 +1043,7 @@ class PgDungeonMonster(PgItem):
         self.monster_no = int(item['MONSTER_NO'])  # PgMonster unique id
         self.dungeon_seq = int(item['DUNGEON_SEQ'])  # PgDungeon uniqueId
         self.tsd_seq = int(item['TSD_SEQ'])  # ??
+        self.floor = int_or_none(item.get('FLOOR', ''))
 
     def key(self):
         return self.tdm_seq
@@ -719,6 +1055,9 @@ class PgDungeonMonster(PgItem):
 
         if self.drop_monster:
             self.drop_monster.drop_dungeons.append(self.dungeon)
+            if self.dungeon:
+                database.add_drop(MonsterDropInfo(
+                    self.dungeon_seq, self.floor, self.monster_no, self.drop_monster_no))
 
 
 class EvoType(Enum):
@@ -1062,20 +1401,35 @@ class PgMonster(PgItem):
 
         self.search = MonsterSearchHelper(self)
 
-        # Compute server skill rotations
-        for server, server_tz in {'JP': rpadutils.JP_TZ_OBJ, 'NA': rpadutils.NA_TZ_OBJ}.items():
-            server_now = datetime.now().replace(tzinfo=server_tz).date()
-            server_skillups = list(filter(lambda s: s.skill_rotation.server == server,
-                                          self.rotating_skillups))
-            future_skillup = list(filter(lambda s: server_now < s.rotation_date, server_skillups))
-            if future_skillup:
-                self.future_skillup_rotation[server] = future_skillup[0]
+    def compute_skill_rotation(self, server: str, server_today):
+        """Computes the active and upcoming rotating skillup for the server on a date.
+
+        Returns True if this monster has an active rotation on the server.
+        """
+        previous_active = self.server_actives.pop(server, None)
+        if previous_active and previous_active.server_skillups.get(server) == self:
+            previous_active.server_skillups.pop(server)
+        self.future_skillup_rotation.pop(server, None)
+
+        server_skillups = list(filter(lambda s: s.skill_rotation.server == server and s.rotation_date,
+                                      self.rotating_skillups))
+        future_skillup = list(filter(lambda s: server_today < s.rotation_date, server_skillups))
+        if future_skillup:
+            self.future_skillup_rotation[server] = min(
+                future_skillup, key=lambda s: s.rotation_date)
+
+        past_skillups = list(filter(lambda s: server_today >= s.rotation_date, server_skillups))
+        if not past_skillups:
+            return False
+
+        active_skillup = max(past_skillups, key=lambda s: s.rotation_date)
+        self.server_actives[server] = active_skillup.skill
+        active_skillup.skill.server_skillups[server] = active_skillup.skill_rotation.monster
+        return True
 
-            past_skillups = list(filter(lambda s: server_now >= s.rotation_date, server_skillups))
-            if past_skillups:
-                active_skillup = max(past_skillups, key=lambda s: s.rotation_date)
-                self.server_actives[server] = active_skillup.skill
-                active_skillup.skill.server_skillups[server] = active_skillup.skill_rotation.monster
+
+def replace_colors(text: str):
+    return text.replace('red', 'fire').replace('blue', 'water').replace('green', 'wood')
 
 
 class MonsterSearchHelper(object):
@@ -1094,18 +1448,40 @@ class MonsterSearchHelper(object):
 
         self.types = m.types
 
-        def replace_colors(text: str):
-            return text.replace('red', 'fire').replace('blue', 'water').replace('green', 'wood')
         self.leader = replace_colors(self.leader)
         self.active = replace_colors(self.active)
         self.active_name = replace_colors(self.active_name)
         self.active_desc = replace_colors(self.active_desc)
 
+        # Parsed once per distinct skill and shared; don't modify these
+        effects = active_skill_effects_cache.get(m.active_skill)
+        self.board_change = effects.board_change
+        self.orb_convert = effects.orb_convert
+        self.row_convert = effects.row_convert
+        self.column_convert = effects.column_convert
+        self.shuffle = effects.shuffle
+        self.unlock = effects.unlock
+        self.haste = effects.haste
+
+
+class ActiveSkillEffects(object):
+    """Structured effects parsed out of an active skill description.
+
+    Many monsters share the same PgSkill, so these are computed once per skill
+    and shared between every MonsterSearchHelper that uses it.
+    """
+
+    def __init__(self, active_desc: str):
         self.board_change = []
         self.orb_convert = defaultdict(list)
         self.row_convert = []
         self.column_convert = []
 
+        self.shuffle = 'switch orbs' in active_desc
+        self.unlock = 'removes lock' in active_desc
+        haste_match = re.search(r'charge by (\d+)', active_desc)
+        self.haste = int(haste_match.group(1)) if haste_match else None
+
         def color_txt_to_list(txt):
             txt = txt.replace(',', ' ')
             txt = txt.replace('&', ' ')
@@ -1139,7 +1515,6 @@ class MonsterSearchHelper(object):
                 txt = txt[:next_clause_start_idx]
             return txt
 
-        active_desc = self.active_desc
         active_desc = active_desc.replace(' rows ', ' row ')
         active_desc = active_desc.replace(' columns ', ' column ')
         active_desc = active_desc.replace(' into ', ' to ')
@@ -1209,7 +1584,7 @@ class MonsterSearchHelper(object):
                 dest_orbs = color_txt_to_list(sub_parts[1])
 
                 if len(dest_orbs) > 1:
-                    print('error on skill:', self.active_desc, ' -> ', part)
+                    print('error on skill:', active_desc, ' -> ', part)
                     print(parts)
 
                 for so in source_orbs:
@@ -1217,6 +1592,75 @@ class MonsterSearchHelper(object):
                         self.orb_convert[so].append(do)
 
 
+class ActiveSkillEffectsCache(object):
+    """Caches ActiveSkillEffects by (ts_seq, description) across database builds.
+
+    Entries not requested during a build are dropped at the start of the next
+    one, so the cache only ever holds the skills from the last two databases.
+    """
+
+    def __init__(self):
+        self.current = {}
+        self.previous = {}
+        self.hits = 0
+        self.misses = 0
+
+    def start_generation(self):
+        self.previous = self.current
+        self.current = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.current = {}
+        self.previous = {}
+
+    def get(self, skill: 'PgSkill'):
+        key = (skill.ts_seq, skill.desc) if skill else (None, '')
+        effects = self.current.get(key)
+        if effects is None:
+            effects = self.previous.pop(key, None)
+            if effects is None:
+                self.misses += 1
+                desc = replace_colors(skill.desc.lower()) if skill else ''
+                effects = ActiveSkillEffects(desc)
+            else:
+                self.hits += 1
+            self.current[key] = effects
+        else:
+            self.hits += 1
+        return effects
+
+
+active_skill_effects_cache = ActiveSkillEffectsCache()
+
+
+class MonsterStatIndex(object):
+    """Per-stat sorted columns of (value, monster_no) used for range lookups.
+
+    Only holds ints, so it's safe to keep around alongside the database.
+    """
+    STATS = ['hp', 'atk', 'rcv', 'rarity', 'cost', 'weighted_stats']
+
+    def __init__(self, monsters):
+        self.stat_to_column = {}
+        for stat in MonsterStatIndex.STATS:
+            pairs = sorted((getattr(m, stat), m.monster_no) for m in monsters)
+            values = [p[0] for p in pairs]
+            monster_nos = [p[1] for p in pairs]
+            self.stat_to_column[stat] = (values, monster_nos)
+
+    def monster_nos_in_range(self, stat: str, min_value: int=None, max_value: int=None):
+        """Returns the set of monster_no with min_value <= stat <= max_value.
+
+        Either end of the range can be None to leave it open.
+        """
+        values, monster_nos = self.stat_to_column[stat]
+        start_idx = 0 if min_value is None else bisect.bisect_left(values, min_value)
+        end_idx = len(values) if max_value is None else bisect.bisect_right(values, max_value)
+        return set(monster_nos[start_idx:end_idx])
+
+
 class MonsterGroup(object):
     """Computes shared values across a tree of monsters and injects them."""
 
@@ -1249,6 +1693,82 @@ class MonsterGroup(object):
             m.mp_evo = mp_evo
 
 
+class EvolutionGraph(object):
+    """Precomputed closure over every evolution tree.
+
+    Trees are walked from the base through evo_to, so the path to a monster is the
+    one the walk took, and the materials needed between any two forms on that path
+    are the difference of the cumulative materials at each end. A monster listed
+    under two parents is reachable from the ancestors on both paths; its ancestors
+    are those of whichever is walked last. evo_from is not consulted because the
+    loader overwrites it.
+    """
+
+    def __init__(self, base_monsters):
+        # monster_no -> tuple(PgMonster) from the tree base to the monster, inclusive
+        self.monster_no_to_path = {}
+        # monster_no -> frozenset(monster_no) of every later evolution
+        self.monster_no_to_descendants = {}
+        # (from monster_no, to monster_no) -> tuple(PgMonster) from one to the other, inclusive
+        self.path_to_forms = {}
+        # (from monster_no, to monster_no) -> list((PgMonster, count))
+        self.path_to_materials = {}
+
+        for base in base_monsters:
+            self._add_tree(base)
+
+    def _add_tree(self, base: PgMonster):
+        monster_to_cumulative_mats = {base: Counter()}
+        visit_order = []
+
+        stack = [(base, (base,))]
+        while stack:
+            m, path = stack.pop()
+            visit_order.append(m)
+            self.monster_no_to_path[m.monster_no] = path
+
+            if m is not base:
+                monster_to_cumulative_mats[m] = monster_to_cumulative_mats[path[-2]] + \
+                    Counter(m.mats_for_evo)
+
+            cumulative_mats = monster_to_cumulative_mats[m]
+            for i, ancestor in enumerate(path):
+                mats = cumulative_mats - monster_to_cumulative_mats[ancestor]
+                self.path_to_forms[(ancestor.monster_no, m.monster_no)] = path[i:]
+                self.path_to_materials[(ancestor.monster_no, m.monster_no)] = sorted(
+                    mats.items(), key=lambda x: (-x[1], x[0].monster_no))
+
+            for em in m.evo_to:
+                # Guards against loops in bad evolution data
+                if em not in path:
+                    stack.append((em, path + (em,)))
+
+        # Children are always visited after their parents, so walk backwards to roll up
+        for m in reversed(visit_order):
+            descendants = set()
+            for em in m.evo_to:
+                descendants.add(em.monster_no)
+                descendants.update(self.monster_no_to_descendants.get(em.monster_no, ()))
+            self.monster_no_to_descendants[m.monster_no] = frozenset(descendants)
+
+    def ancestors(self, m: PgMonster):
+        """Earlier forms of m, starting from the tree base."""
+        return list(self.monster_no_to_path.get(m.monster_no, ())[:-1])
+
+    def descendants(self, m: PgMonster):
+        """monster_nos of every form m can evolve into, directly or indirectly."""
+        return self.monster_no_to_descendants.get(m.monster_no, frozenset())
+
+    def evolution_path(self, from_m: PgMonster, to_m: PgMonster):
+        """The forms from from_m to to_m inclusive, or None if to_m isn't reachable."""
+        path = self.path_to_forms.get((from_m.monster_no, to_m.monster_no))
+        return list(path) if path is not None else None
+
+    def total_materials(self, from_m: PgMonster, to_m: PgMonster):
+        """List of (PgMonster, count) needed to evolve from_m into to_m, or None if unreachable."""
+        return self.path_to_materials.get((from_m.monster_no, to_m.monster_no))
+
+
 # monsterPriceList.jsp
 # {
 #     "BUY_PRICE": "0",
@@ -1533,12 +2053,15 @@ class PgType(PgItem):
         pass
 
 
-class PgMonsterDropInfoCombined(object):
-    def __init__(self, monster_id, dungeon_monster_drop, dungeon_monster, dungeon):
-        self.monster_id = monster_id
-        self.dungeon_monster_drop = dungeon_monster_drop
-        self.dungeon_monster = dungeon_monster
-        self.dungeon = dungeon
+# Where a monster drops: the dungeon and floor, the encountered monster, and what it drops.
+# Plain ids instead of object references, so the index stays small and hashable.
+MonsterDropInfo = namedtuple(
+    'MonsterDropInfo', ['dungeon_seq', 'floor', 'encounter_monster_no', 'drop_monster_no'])
+
+
+def drop_display_key(drop_info: MonsterDropInfo):
+    # Newest dungeons first, then in floor order
+    return (-drop_info.dungeon_seq, drop_info.floor or 0, drop_info.drop_monster_no)
 
 
 # ================================================================================
@@ -1820,6 +2343,155 @@ def make_roma_subname(name_jp):
     return adjusted_subname.strip()
 
 
+SQLITE_EXPORT_SCHEMA = '''
+CREATE TABLE monsters(
+  monster_no INTEGER PRIMARY KEY,
+  monster_no_na INTEGER NOT NULL,
+  monster_no_jp INTEGER NOT NULL,
+  name_na TEXT NOT NULL,
+  name_jp TEXT NOT NULL,
+  attr1 TEXT,
+  attr2 TEXT,
+  type1 TEXT,
+  type2 TEXT,
+  type3 TEXT,
+  rarity INTEGER NOT NULL,
+  cost INTEGER NOT NULL,
+  max_level INTEGER NOT NULL,
+  hp INTEGER NOT NULL,
+  atk INTEGER NOT NULL,
+  rcv INTEGER NOT NULL,
+  ts_seq_active INTEGER,
+  ts_seq_leader INTEGER,
+  tsr_seq INTEGER,
+  base_monster_no INTEGER NOT NULL,
+  evo_from_monster_no INTEGER,
+  on_na INTEGER NOT NULL,
+  farmable INTEGER NOT NULL,
+  in_pem INTEGER NOT NULL,
+  in_rem INTEGER NOT NULL,
+  in_mpshop INTEGER NOT NULL);
+CREATE INDEX idx_monsters_monster_no_na ON monsters(monster_no_na);
+CREATE INDEX idx_monsters_ts_seq_active ON monsters(ts_seq_active);
+CREATE INDEX idx_monsters_ts_seq_leader ON monsters(ts_seq_leader);
+CREATE INDEX idx_monsters_tsr_seq ON monsters(tsr_seq);
+CREATE INDEX idx_monsters_base_monster_no ON monsters(base_monster_no);
+
+CREATE TABLE skills(
+  ts_seq INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  description TEXT NOT NULL,
+  turn_min INTEGER NOT NULL,
+  turn_max INTEGER NOT NULL);
+
+CREATE TABLE leader_skill_data(
+  ts_seq INTEGER PRIMARY KEY,
+  hp REAL NOT NULL,
+  atk REAL NOT NULL,
+  rcv REAL NOT NULL,
+  resist REAL NOT NULL);
+
+CREATE TABLE awakenings(
+  tma_seq INTEGER PRIMARY KEY,
+  monster_no INTEGER NOT NULL,
+  ts_seq INTEGER NOT NULL,
+  order_idx INTEGER NOT NULL);
+CREATE INDEX idx_awakenings_monster_no ON awakenings(monster_no, order_idx);
+CREATE INDEX idx_awakenings_ts_seq ON awakenings(ts_seq);
+
+CREATE TABLE evolutions(
+  tv_seq INTEGER PRIMARY KEY,
+  from_monster_no INTEGER NOT NULL,
+  to_monster_no INTEGER NOT NULL,
+  evo_type TEXT NOT NULL);
+CREATE INDEX idx_evolutions_from_monster_no ON evolutions(from_monster_no);
+CREATE INDEX idx_evolutions_to_monster_no ON evolutions(to_monster_no);
+
+CREATE TABLE evolution_materials(
+  tem_seq INTEGER PRIMARY KEY,
+  tv_seq INTEGER NOT NULL,
+  monster_no INTEGER NOT NULL,
+  order_idx INTEGER NOT NULL);
+CREATE INDEX idx_evolution_materials_tv_seq ON evolution_materials(tv_seq);
+CREATE INDEX idx_evolution_materials_monster_no ON evolution_materials(monster_no);
+
+CREATE TABLE series(
+  tsr_seq INTEGER PRIMARY KEY,
+  name TEXT NOT NULL);
+
+CREATE TABLE dungeons(
+  dungeon_seq INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  dungeon_type INTEGER NOT NULL);
+
+CREATE TABLE drops(
+  dungeon_seq INTEGER NOT NULL,
+  floor INTEGER,
+  encounter_monster_no INTEGER NOT NULL,
+  drop_monster_no INTEGER NOT NULL);
+CREATE INDEX idx_drops_drop_monster_no ON drops(drop_monster_no);
+CREATE INDEX idx_drops_dungeon_seq ON drops(dungeon_seq, floor);
+'''
+
+
+def export_database_to_sqlite(database: PgRawDatabase, file_path: str):
+    """Writes a normalized, indexed copy of the database for tools outside the bot.
+
+    The file is built under a temp name and renamed into place, so readers never
+    see a partial export.
+    """
+    tmp_file_path = file_path + '.tmp'
+    if os.path.exists(tmp_file_path):
+        os.remove(tmp_file_path)
+
+    def enum_name(e):
+        return e.name if e else None
+
+    con = sqlite3.connect(tmp_file_path)
+    try:
+        con.executescript(SQLITE_EXPORT_SCHEMA)
+        monsters = database.all_monsters()
+        con.executemany('INSERT INTO monsters VALUES ({})'.format(','.join('?' * 26)), [(
+            m.monster_no, m.monster_no_na, m.monster_no_jp, m.name_na, m.name_jp,
+            enum_name(m.attr1), enum_name(m.attr2), m.type1, m.type2, m.type3,
+            m.rarity, m.cost, m.max_level, m.hp, m.atk, m.rcv,
+            m.ts_seq_active, m.ts_seq_leader, m.series.tsr_seq if m.series else None,
+            m.base_monster.monster_no, m.evo_from.monster_no if m.evo_from else None,
+            m.on_na, m.farmable, m.in_pem, m.in_rem, m.in_mpshop) for m in monsters])
+
+        con.executemany('INSERT INTO skills VALUES (?,?,?,?,?)', [
+            (s.ts_seq, s.name, s.desc, s.turn_min, s.turn_max)
+            for s in database._skill_map.values()])
+        con.executemany('INSERT INTO leader_skill_data VALUES (?,?,?,?,?)', [
+            (d.ts_seq,) + d.get_data() for d in database._skill_leader_data_map.values()])
+        con.executemany('INSERT INTO awakenings VALUES (?,?,?,?)', [
+            (a.tma_seq, a.monster_no, a.ts_seq, a.order) for a in database._awakening_map.values()])
+        con.executemany('INSERT INTO evolutions VALUES (?,?,?,?)', [
+            (e.tv_seq, e.from_monster_no, e.to_monster_no, e.evo_type.name)
+            for e in database._evolution_map.values()])
+        con.executemany('INSERT INTO evolution_materials VALUES (?,?,?,?)', [
+            (em.tem_seq, em.tv_seq, em.fodder_monster_no, em.order)
+            for em in database._evolution_material_map.values()])
+        con.executemany('INSERT INTO series VALUES (?,?)', [
+            (s.tsr_seq, s.name) for s in database._series_map.values()])
+        con.executemany('INSERT INTO dungeons VALUES (?,?,?)', [
+            (d.dungeon_seq, d.name, d.dungeon_type) for d in database._dungeon_map.values()])
+        con.executemany('INSERT INTO drops VALUES (?,?,?,?)', [
+            tuple(drop) for drops in database._monster_no_to_drops.values() for drop in drops])
+        con.commit()
+    finally:
+        con.close()
+
+    os.replace(tmp_file_path, file_path)
+
+
+def rows_to_csv(rows):
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=',', lineterminator='\n')
+    writer.writerows(rows)
+    return output.getvalue()
+
+
 def int_or_none(maybe_int: str):
     return int(maybe_int) if len(maybe_int) else None
 
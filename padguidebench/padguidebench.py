@@ -0,0 +1,554 @@
+"""Offline stand-in for the PadGuide API, plus refresh benchmarks.
+
+The stand-in serves synthetic corpora shaped like the real PadGuide JSP responses
+and override sheets, so the padguide2 download/build/index pipeline can be timed
+at several times today's data size without touching the live API.
+"""
+from datetime import datetime
+from datetime import timedelta
+import json
+import os
+import random
+import time
+import traceback
+
+from aiohttp import web
+from discord.ext import commands
+import prettytable
+
+from __main__ import send_cmd_help
+
+from . import padguide2
+from . import rpadutils
+from .utils import checks
+from .utils.chat_formatting import *
+
+
+DATA_DIR = 'data/padguidebench'
+DOWNLOAD_FILE_PATTERN = DATA_DIR + '/download/{}.json'
+DOWNLOAD_CSV_PATTERN = DATA_DIR + '/download/{}.csv'
+DOWNLOAD_DUMMY_PATTERN = DATA_DIR + '/download/{}.dummy'
+CACHE_FORMAT_FILE = DATA_DIR + '/cacheformat.json'
+
+STANDIN_HOST = '127.0.0.1'
+STANDIN_PORT = 8642
+
+# Approximate size of the live PadGuide data at 1x
+BASE_MONSTER_COUNT = 4000
+BASE_DUNGEON_COUNT = 1500
+BASE_SCHEDULED_EVENT_COUNT = 2000
+
+DEFAULT_SCALES = [1, 5, 20]
+
+OVERRIDE_SHEETS = ['nicknames', 'basenames', 'monsterdata']
+
+ATTRIBUTE_NAMES = ['Fire', 'Water', 'Wood', 'Light', 'Dark']
+TYPE_NAMES = ['Evo Material', 'Balanced', 'Physical', 'Healer', 'Dragon', 'God', 'Attacker',
+              'Devil', 'Machine', 'Awoken Skill Material', 'Enhance Material', 'Redeemable Material']
+AWAKENING_NAMES = ['Enhanced HP', 'Enhanced Attack', 'Enhanced Heal', 'Auto-Recover', 'Skill Boost',
+                   'Two-Pronged Attack', 'Resistance-Bind', 'Enhanced Fire Orbs', 'Enhanced Dark Orbs',
+                   'Reduce Fire Damage', 'Skill Lock Resistance', 'Dragon Killer', 'God Killer',
+                   'Awoken Assist']
+ACTIVE_TEMPLATES = [
+    'Change all orbs to {} and {} orbs.',
+    'Change {} orbs to {} orbs.',
+    'Changes the top row to {} orbs. Changes the bottom row to {} orbs.',
+    'Reduce cooldown charge by {} turns.',
+    'Switch orbs with {} and {} for 1 turn.',
+    'Removes lock status from all orbs. Change all orbs to {} orbs.',
+]
+NAME_WORDS = ['Red', 'Blue', 'Green', 'Light', 'Dark', 'Ancient', 'Awoken', 'Reincarnated', 'Divine',
+              'Dragon', 'Knight', 'Goddess', 'Tamadra', 'Mask', 'Warrior', 'Sage', 'Valkyrie', 'Phoenix',
+              'Golem', 'Pixie', 'Ogre', 'Kirin', 'Sprite', 'Lord', 'Queen', 'King', 'Spirit']
+
+
+class PadGuideBench(object):
+    def __init__(self, bot):
+        self.bot = bot
+        self.standin = None
+
+        if not os.path.exists(os.path.dirname(DOWNLOAD_FILE_PATTERN)):
+            os.makedirs(os.path.dirname(DOWNLOAD_FILE_PATTERN))
+
+    def __unload(self):
+        if self.standin:
+            self.bot.loop.create_task(self.standin.stop())
+            self.standin = None
+
+    async def _start_standin(self, scale: int):
+        if self.standin:
+            await self.standin.stop()
+        self.standin = PadGuideStandIn(self.bot.loop, SyntheticCorpus(scale))
+        await self.standin.start(STANDIN_HOST, STANDIN_PORT)
+
+    @commands.group(pass_context=True)
+    @checks.is_owner()
+    async def padguidebench(self, ctx):
+        """PadGuide API stand-in and refresh benchmarks"""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @padguidebench.command(pass_context=True)
+    @checks.is_owner()
+    async def standin(self, ctx, scale: int=1):
+        """Serve a synthetic corpus at scale x today's size; 0 stops the server"""
+        if scale <= 0:
+            if self.standin:
+                await self.standin.stop()
+                self.standin = None
+            await self.bot.say(inline('Stand-in stopped'))
+            return
+
+        await self._start_standin(scale)
+        await self.bot.say(inline('Serving {}x corpus at {}'.format(scale, self.standin.base_url)))
+
+    @padguidebench.command(pass_context=True)
+    @checks.is_owner()
+    async def run(self, ctx, *scales: int):
+        """Time download, build, index and consumer refresh against the stand-in
+
+        Defaults to 1x, 5x and 20x. Builds run on the event loop and block the
+        bot, so only run this on a staging instance.
+        """
+        pg_cog = self.bot.get_cog('PadGuide2')
+        if pg_cog is None:
+            await self.bot.say(inline('PadGuide2 must be loaded'))
+            return
+
+        scales = scales or DEFAULT_SCALES
+        results = []
+        for scale in scales:
+            await self.bot.say(inline('Benchmarking {}x...'.format(scale)))
+            try:
+                await self._start_standin(scale)
+                results.append((scale, await self._run_benchmark(pg_cog)))
+            except Exception as ex:
+                traceback.print_exc()
+                await self.bot.say(inline('{}x failed: {}'.format(scale, ex)))
+
+        tbl = prettytable.PrettyTable(['Scale', 'Monsters', 'Download', 'Delta', 'Build', 'Index', 'Consumers'])
+        tbl.hrules = prettytable.HEADER
+        tbl.vrules = prettytable.NONE
+        tbl.align = "l"
+        for scale, timings in results:
+            tbl.add_row(['{}x'.format(scale), timings['monsters']] +
+                        ['{:.2f}s'.format(timings[k]) for k in ['download', 'delta', 'build', 'index', 'consumers']])
+        await self.bot.say(box(tbl.get_string()))
+
+    @padguidebench.command(pass_context=True)
+    @checks.is_owner()
+    async def cacheformats(self, ctx):
+        """Compare JSON cache formats on the current PadGuide endpoint files"""
+        pg_cog = self.bot.get_cog('PadGuide2')
+        if pg_cog is None:
+            await self.bot.say(inline('PadGuide2 must be loaded'))
+            return
+
+        totals = {name: [0, 0.0, 0.0] for name, _ in CACHE_FORMATS}
+        for itemtype in pg_cog._standard_refresh + pg_cog._quick_refresh:
+            file_path = padguide2.JSON_FILE_PATTERN.format(itemtype.file_name())
+            if not os.path.exists(file_path):
+                continue
+            js_data = rpadutils.readJsonFile(file_path)
+            for name, write_fn in CACHE_FORMATS:
+                size, write_secs, parse_secs = time_cache_format(js_data, write_fn)
+                totals[name][0] += size
+                totals[name][1] += write_secs
+                totals[name][2] += parse_secs
+
+        tbl = prettytable.PrettyTable(['Format', 'Size', 'Write', 'Read'])
+        tbl.hrules = prettytable.HEADER
+        tbl.vrules = prettytable.NONE
+        tbl.align = "l"
+        for name, _ in CACHE_FORMATS:
+            size, write_secs, parse_secs = totals[name]
+            tbl.add_row([name, '{:.1f}MB'.format(size / 1024 / 1024),
+                         '{:.2f}s'.format(write_secs), '{:.2f}s'.format(parse_secs)])
+        await self.bot.say(box(tbl.get_string()))
+
+    async def _run_benchmark(self, pg_cog):
+        timings = {}
+        base_url = self.standin.base_url
+        max_bytes = self.standin.max_response_bytes
+
+        # Start cold, so every file is downloaded and written like a first refresh
+        download_dir = os.path.dirname(DOWNLOAD_FILE_PATTERN)
+        for file_name in os.listdir(download_dir):
+            os.remove(os.path.join(download_dir, file_name))
+
+        start = time.perf_counter()
+        await pg_cog._download_files(
+            api_base_url=base_url,
+            api_max_bytes=max_bytes,
+            json_file_pattern=DOWNLOAD_FILE_PATTERN,
+            dummy_file_pattern=DOWNLOAD_DUMMY_PATTERN,
+            file_to_sheet=[(DOWNLOAD_CSV_PATTERN.format(sheet), '{}/sheets/{}.csv'.format(base_url, sheet))
+                           for sheet in OVERRIDE_SHEETS])
+        timings['download'] = time.perf_counter() - start
+
+        # A quick refresh over the same window, which comes back unchanged
+        start = time.perf_counter()
+        three_weeks_ago = int(round(time.time() * 1000)) - 3 * 7 * 24 * 60 * 60 * 1000
+        for itemtype in pg_cog._quick_refresh:
+            endpoint = itemtype.file_name()
+            await rpadutils.async_cached_padguide_request(
+                endpoint, DOWNLOAD_FILE_PATTERN.format(endpoint), time_ms=three_weeks_ago,
+                base_url=base_url, max_bytes=max_bytes)
+        timings['delta'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        database = padguide2.PgRawDatabase(json_file_pattern=DOWNLOAD_FILE_PATTERN)
+        monsterdata_overrides = pg_cog._csv_to_tuples(DOWNLOAD_CSV_PATTERN.format('monsterdata'), 7)
+        database.update_with_overrides(
+            {int(x[0]): x for x in monsterdata_overrides if x[0].isdigit()})
+        timings['build'] = time.perf_counter() - start
+        timings['monsters'] = len(database.all_monsters())
+
+        nickname_overrides = {x[0].lower(): int(x[1])
+                              for x in pg_cog._csv_to_tuples(DOWNLOAD_CSV_PATTERN.format('nicknames'))
+                              if x[1].isdigit()}
+        basename_overrides = {}
+        for k, v in pg_cog._csv_to_tuples(DOWNLOAD_CSV_PATTERN.format('basenames')):
+            if k.isdigit():
+                basename_overrides.setdefault(int(k), set()).add(v.lower())
+
+        start = time.perf_counter()
+        padguide2.MonsterIndex(database, nickname_overrides, basename_overrides)
+        timings['index'] = time.perf_counter() - start
+
+        # What padinfo does on each refresh
+        start = time.perf_counter()
+        padguide2.MonsterIndex(database, nickname_overrides, basename_overrides)
+        padguide2.MonsterIndex(database, nickname_overrides, basename_overrides,
+                               accept_filter=lambda m: m.on_na)
+        timings['consumers'] = time.perf_counter() - start
+
+        database.retire()
+        return timings
+
+
+def write_indented_json_file(file_path, js_data):
+    """The cache writer before compact JSON, kept for comparison."""
+    with open(file_path, 'w') as f:
+        json.dump(js_data, f, sort_keys=True, indent=4)
+
+
+CACHE_FORMATS = [
+    ('indent=4', write_indented_json_file),
+    ('compact', rpadutils.writeJsonFile),
+    ('compact+gzip', lambda file_path, d: rpadutils.writeJsonFile(file_path, d, compress=True)),
+]
+
+
+def time_cache_format(js_data, write_fn):
+    """Returns (size, write_secs, read_secs) for one cache writer, through a scratch file."""
+    start = time.perf_counter()
+    write_fn(CACHE_FORMAT_FILE, js_data)
+    write_secs = time.perf_counter() - start
+    size = os.path.getsize(CACHE_FORMAT_FILE)
+
+    start = time.perf_counter()
+    rpadutils.readJsonFile(CACHE_FORMAT_FILE)
+    parse_secs = time.perf_counter() - start
+
+    os.remove(CACHE_FORMAT_FILE)
+    return size, write_secs, parse_secs
+
+
+class PadGuideStandIn(object):
+    """Local HTTP server that answers like the PadGuide API and the override sheets.
+
+    GET /<endpoint>.jsp?time=<ms> returns {"items": [...]} with only the items whose
+    TSTAMP is newer than time, matching the API's delta semantics.
+    GET /sheets/<name>.csv returns an override sheet.
+    """
+
+    def __init__(self, loop, corpus):
+        self.loop = loop
+        self.corpus = corpus
+        self.app = web.Application(loop=loop)
+        self.app.router.add_route('GET', '/sheets/{sheet}.csv', self.handle_sheet)
+        self.app.router.add_route('GET', '/{endpoint}', self.handle_endpoint)
+        self.handler = None
+        self.server = None
+        self.base_url = None
+        # Larger corpora outgrow the http client's default response size limit
+        self.max_response_bytes = corpus.largest_response_bytes()
+
+    async def start(self, host, port):
+        self.handler = self.app.make_handler()
+        self.server = await self.loop.create_server(self.handler, host, port)
+        self.base_url = 'http://{}:{}'.format(host, port)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.app.shutdown()
+        await self.handler.finish_connections(1.0)
+        await self.app.cleanup()
+
+    async def handle_endpoint(self, request):
+        endpoint = request.match_info['endpoint']
+        if endpoint not in self.corpus.endpoint_to_items:
+            return web.Response(status=404, text='unknown endpoint')
+
+        time_ms = int(request.GET.get('time', '0') or 0)
+        items = [i for i in self.corpus.endpoint_to_items[endpoint] if int(i['TSTAMP']) > time_ms]
+        return web.Response(text=json.dumps({'items': items}), content_type='application/json')
+
+    async def handle_sheet(self, request):
+        sheet = request.match_info['sheet']
+        if sheet not in self.corpus.sheet_to_csv:
+            return web.Response(status=404, text='unknown sheet')
+        return web.Response(text=self.corpus.sheet_to_csv[sheet], content_type='text/csv')
+
+
+class SyntheticCorpus(object):
+    """Generates PadGuide-shaped data at a multiple of today's size.
+
+    The shape follows what the real data looks like: evolution trees of one to
+    five monsters sharing skills, material monsters feeding evolutions, dungeons
+    with several floors of encounters, and a schedule centered on now. Generation
+    is seeded, so the same scale always produces the same corpus.
+    """
+
+    def __init__(self, scale: int, seed: int=1234):
+        self.scale = scale
+        self.rng = random.Random(seed + scale)
+        self.now = datetime.utcnow()
+        self.endpoint_to_items = {}
+        self.sheet_to_csv = {}
+
+        self.monster_count = BASE_MONSTER_COUNT * scale
+        self.dungeon_count = BASE_DUNGEON_COUNT * scale
+        self.scheduled_event_count = BASE_SCHEDULED_EVENT_COUNT * scale
+
+        self._generate()
+
+    def largest_response_bytes(self):
+        """Size of the biggest full (time=0) endpoint response; deltas are never larger."""
+        return max(len(json.dumps({'items': items}).encode('utf-8'))
+                   for items in self.endpoint_to_items.values())
+
+    def _tstamp(self):
+        # Most rows are old, a few were touched recently so deltas return something
+        if self.rng.random() < 0.05:
+            age = timedelta(days=self.rng.uniform(0, 14))
+        else:
+            age = timedelta(days=self.rng.uniform(30, 5 * 365))
+        return str(int((self.now - age).timestamp() * 1000))
+
+    def _add(self, itemtype, item):
+        item['TSTAMP'] = self._tstamp()
+        self.endpoint_to_items.setdefault(itemtype.file_name(), []).append(
+            {k: str(v) for k, v in item.items()})
+
+    def _generate(self):
+        rng = self.rng
+        for i, name in enumerate(ATTRIBUTE_NAMES):
+            self._add(padguide2.PgAttribute, {'TA_SEQ': i + 1, 'TA_NAME_US': name})
+        for i, name in enumerate(TYPE_NAMES):
+            self._add(padguide2.PgType, {'TT_SEQ': i, 'TT_NAME_US': name})
+
+        series_count = max(1, self.monster_count // 20)
+        for tsr_seq in range(1, series_count + 1):
+            self._add(padguide2.PgSeries, {'TSR_SEQ': tsr_seq, 'NAME_US': 'Series {}'.format(tsr_seq),
+                                           'DEL_YN': 'N'})
+
+        awakening_skill_seqs = []
+        self.next_ts_seq = 1
+        for name in AWAKENING_NAMES:
+            awakening_skill_seqs.append(self._add_skill(name, name, 0, 0))
+
+        material_count = self.monster_count // 20
+        material_nos = list(range(1, material_count + 1))
+        for monster_no in material_nos:
+            self._add_monster(monster_no, 'Evo Material {}'.format(monster_no), None, None, 0, rng.randint(1, 5))
+
+        monster_no = material_count + 1
+        tsrl_seq, tv_seq, tem_seq, tma_seq = 1, 1, 1, 1
+        monster_nos = []
+        while monster_no <= self.monster_count:
+            # One tree: shared active skill, leader skills vary by evo
+            tree_size = min(rng.choice([1, 2, 2, 3, 3, 4, 5]), self.monster_count - monster_no + 1)
+            attr = rng.randint(1, 5)
+            words = rng.sample(NAME_WORDS, 2)
+            active_seq = self._add_active_skill()
+            tree = []
+            for evo_idx in range(tree_size):
+                name = '{} {} {}'.format(ATTRIBUTE_NAMES[attr - 1], ' '.join(words),
+                                         'Evo {}'.format(evo_idx) if evo_idx else '').strip()
+                leader_seq = self._add_leader_skill()
+                self._add_monster(monster_no, name, active_seq, leader_seq, attr, 3 + evo_idx)
+                for order in range(rng.randint(0, 9)):
+                    self._add(padguide2.PgAwakening, {
+                        'TMA_SEQ': tma_seq, 'TS_SEQ': rng.choice(awakening_skill_seqs), 'DEL_YN': 'N',
+                        'MONSTER_NO': monster_no, 'ORDER_IDX': order})
+                    tma_seq += 1
+
+                if tree:
+                    evo_from = rng.choice(tree)
+                    self._add(padguide2.PgEvolution, {
+                        'TV_SEQ': tv_seq, 'MONSTER_NO': evo_from, 'TO_NO': monster_no,
+                        'TV_TYPE': min(evo_idx - 1, 2)})
+                    for order in range(rng.randint(1, 5)):
+                        self._add(padguide2.PgEvolutionMaterial, {
+                            'TEM_SEQ': tem_seq, 'TV_SEQ': tv_seq, 'MONSTER_NO': rng.choice(material_nos),
+                            'ORDER_IDX': order})
+                        tem_seq += 1
+                    tv_seq += 1
+
+                tree.append(monster_no)
+                monster_nos.append(monster_no)
+                monster_no += 1
+
+        # Rotating skillups; a couple of dated rotations per monster, per server
+        tsr_seq = 1
+        for rotation_monster_no in rng.sample(monster_nos, min(len(monster_nos), 40 * self.scale)):
+            server = rng.choice(['US', 'JP'])
+            self._add(padguide2.PgSkillRotation, {'TSR_SEQ': tsr_seq, 'MONSTER_NO': rotation_monster_no,
+                                                  'SERVER': server, 'STATUS': 0})
+            for days in [-14, 14]:
+                rotation_date = (self.now + timedelta(days=days)).strftime('%Y-%m-%d')
+                self._add(padguide2.PgSkillRotationDated, {
+                    'TSRL_SEQ': tsrl_seq, 'TSR_SEQ': tsr_seq, 'TS_SEQ': self._add_active_skill(),
+                    'ROTATION_DATE': rotation_date})
+                tsrl_seq += 1
+            tsr_seq += 1
+
+        self._generate_dungeons(monster_nos)
+        self._generate_eggs(monster_nos)
+        self._generate_schedule()
+        self._generate_sheets(monster_nos)
+
+    def _add_skill(self, name, desc, turn_min, turn_max):
+        ts_seq = self.next_ts_seq
+        self.next_ts_seq += 1
+        self._add(padguide2.PgSkill, {'TS_SEQ': ts_seq, 'TS_NAME_US': name, 'TS_DESC_US': desc,
+                                      'TURN_MIN': turn_min, 'TURN_MAX': turn_max})
+        return ts_seq
+
+    def _add_active_skill(self):
+        rng = self.rng
+        template = rng.choice(ACTIVE_TEMPLATES)
+        args = [rng.choice(ATTRIBUTE_NAMES).lower() if '{}' in template else '' for _ in range(2)]
+        if 'charge by' in template:
+            args = [rng.randint(1, 3)]
+        turn_max = rng.randint(5, 25)
+        return self._add_skill('Active {}'.format(self.next_ts_seq), template.format(*args),
+                               max(1, turn_max - rng.randint(0, 10)), turn_max)
+
+    def _add_leader_skill(self):
+        rng = self.rng
+        ts_seq = self._add_skill('Leader {}'.format(self.next_ts_seq),
+                                 'ATK x{} for {} type.'.format(rng.randint(2, 7), rng.choice(TYPE_NAMES)), 0, 0)
+        mods = ['2/{}'.format(rng.choice([1.5, 2, 2.5, 3, 3.5, 4, 5, 6, 7]))]
+        if rng.random() < 0.4:
+            mods.append('1/{}'.format(rng.choice([1.2, 1.35, 1.5, 2])))
+        if rng.random() < 0.2:
+            mods.append('3/{}'.format(rng.choice([1.2, 1.5, 2])))
+        if rng.random() < 0.15:
+            mods.append('4/{}'.format(rng.choice([0.5, 0.75, 0.8])))
+        self._add(padguide2.PgSkillLeaderData, {'TS_SEQ': ts_seq, 'LEADER_DATA': '|'.join(mods)})
+        return ts_seq
+
+    def _add_monster(self, monster_no, name, active_seq, leader_seq, attr, rarity):
+        rng = self.rng
+        is_material = active_seq is None
+        hp, atk, rcv = rng.randint(1000, 6000), rng.randint(500, 3000), rng.randint(0, 1000)
+        self._add(padguide2.PgMonster, {
+            'MONSTER_NO': monster_no, 'MONSTER_NO_US': monster_no, 'MONSTER_NO_JP': monster_no,
+            'TM_NAME_US': name, 'TM_NAME_JP': name,
+            'HP_MIN': hp // 2, 'ATK_MIN': atk // 2, 'RCV_MIN': rcv // 2, 'HP_MAX': hp, 'ATK_MAX': atk,
+            'RCV_MAX': rcv, 'TS_SEQ_SKILL': active_seq or '', 'TS_SEQ_LEADER': leader_seq or '',
+            'RARITY': rarity, 'COST': rarity * 5, 'EXP': rng.choice([1000000, 3000000, 4000000]),
+            'LEVEL': 99, 'TA_SEQ': attr or rng.randint(1, 5), 'TA_SEQ_SUB': rng.choice([0, 0, 1, 2, 3, 4, 5]),
+            'TE_SEQ': 1, 'TT_SEQ': 0 if is_material else rng.randint(1, len(TYPE_NAMES) - 4),
+            'TT_SEQ_SUB': 0 if is_material else rng.choice([0, rng.randint(1, len(TYPE_NAMES) - 4)])})
+        self._add(padguide2.PgMonsterInfo, {
+            'MONSTER_NO': monster_no, 'ON_US': int(rng.random() < 0.8),
+            'TSR_SEQ': rng.randint(1, max(1, self.monster_count // 20)),
+            'PAL_EGG': int(rng.random() < 0.1), 'RARE_EGG': int(rng.random() < 0.3),
+            'HISTORY_US': '[2016-12-16] New Added'})
+        self._add(padguide2.PgMonsterPrice, {'MONSTER_NO': monster_no, 'BUY_PRICE': 0,
+                                             'SELL_PRICE': rarity * 100})
+        if rng.random() < 0.1:
+            self._add(padguide2.PgMonsterAddInfo, {'MONSTER_NO': monster_no,
+                                                   'SUB_TYPE': rng.randint(1, len(TYPE_NAMES) - 4),
+                                                   'EXTRA_VAL1': ''})
+
+    def _generate_dungeons(self, monster_nos):
+        rng = self.rng
+        tdm_seq, tdmd_seq = 1, 1
+        for dungeon_seq in range(1, self.dungeon_count + 1):
+            self._add(padguide2.PgDungeon, {
+                'DUNGEON_SEQ': dungeon_seq, 'DUNGEON_TYPE': rng.randint(0, 3),
+                'NAME_US': 'Dungeon {}'.format(dungeon_seq), 'TDT_SEQ': rng.randint(1, 10), 'SHOW_YN': 1})
+            for floor in range(1, rng.randint(2, 10)):
+                for _ in range(rng.randint(1, 3)):
+                    monster_no = rng.choice(monster_nos)
+                    drop_no = monster_no if rng.random() < 0.3 else 0
+                    self._add(padguide2.PgDungeonMonster, {
+                        'TDM_SEQ': tdm_seq, 'DROP_NO': drop_no, 'MONSTER_NO': monster_no,
+                        'DUNGEON_SEQ': dungeon_seq, 'FLOOR': floor, 'TSD_SEQ': dungeon_seq})
+                    if rng.random() < 0.02:
+                        self._add(padguide2.PgDungeonMonsterDrop, {
+                            'TDMD_SEQ': tdmd_seq, 'MONSTER_NO': rng.choice(monster_nos),
+                            'STATUS': 0, 'TDM_SEQ': tdm_seq})
+                        tdmd_seq += 1
+                    tdm_seq += 1
+
+    def _generate_eggs(self, monster_nos):
+        rng = self.rng
+        tem_seq = 1
+        for tet_seq in range(1, 20 * self.scale + 1):
+            start = self.now + timedelta(days=rng.randint(-60, 30))
+            server = rng.choice(['US', 'JP'])
+            self._add(padguide2.PgEggInstance, {
+                'TET_SEQ': tet_seq, 'SERVER': server, 'DEL_YN': 'N', 'SHOW_YN': 'Y',
+                'TEC_SEQ': rng.choice([1, 2]), 'TYPE': 1, 'ORDER_IDX': tet_seq,
+                'START_DATE': start.strftime('%Y-%m-%d %H:%M:%S'),
+                'END_DATE': (start + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')})
+            self._add(padguide2.PgEggName, {'TETN_SEQ': tet_seq, 'TET_SEQ': tet_seq, 'DEL_YN': 'N',
+                                            'LANGUAGE': 'US', 'NAME': 'Egg {}'.format(tet_seq)})
+            for monster_no in rng.sample(monster_nos, min(10, len(monster_nos))):
+                self._add(padguide2.PgEggMonster, {'TEM_SEQ': tem_seq, 'TET_SEQ': tet_seq,
+                                                   'MONSTER_NO': monster_no, 'DEL_YN': 'N'})
+                tem_seq += 1
+
+    def _generate_schedule(self):
+        rng = self.rng
+        event_count = 50
+        for event_seq in range(1, event_count + 1):
+            self._add(padguide2.PgEvent, {'EVENT_SEQ': event_seq,
+                                          'EVENT_NAME_US': 'Event {}'.format(event_seq)})
+
+        for schedule_seq in range(1, self.scheduled_event_count + 1):
+            open_time = self.now + timedelta(hours=rng.randint(-21 * 24, 7 * 24))
+            close_time = open_time + timedelta(hours=rng.choice([1, 24, 72, 168]))
+            self._add(padguide2.PgScheduledEvent, {
+                'SCHEDULE_SEQ': schedule_seq, 'SERVER': rng.choice(['US', 'JP']),
+                'DUNGEON_SEQ': rng.randint(1, self.dungeon_count), 'EVENT_SEQ': rng.randint(0, event_count),
+                'EVENT_TYPE': rng.choice([0, 1, 2, 3, 4, -100]), 'TEAM_DATA': rng.choice(['', 0, 1, 2, 3, 4]),
+                'URL': '',
+                'OPEN_DATE': open_time.strftime('%Y-%m-%d'), 'OPEN_HOUR': open_time.strftime('%H'),
+                'OPEN_MINUTE': '00', 'OPEN_WEEKDAY': 0,
+                'CLOSE_DATE': close_time.strftime('%Y-%m-%d'), 'CLOSE_HOUR': close_time.strftime('%H'),
+                'CLOSE_MINUTE': '00', 'CLOSE_WEEKDAY': 0,
+                'SERVER_OPEN_DATE': open_time.strftime('%Y-%m-%d'), 'SERVER_OPEN_HOUR': 1})
+
+    def _generate_sheets(self, monster_nos):
+        rng = self.rng
+        sample = rng.sample(monster_nos, min(len(monster_nos), 300 * self.scale))
+        self.sheet_to_csv['nicknames'] = 'nickname,id\n' + ''.join(
+            'nick{},{}\n'.format(monster_no, monster_no) for monster_no in sample)
+        self.sheet_to_csv['basenames'] = 'id,basename\n' + ''.join(
+            '{},base{}\n'.format(monster_no, monster_no) for monster_no in sample[:len(sample) // 2])
+        self.sheet_to_csv['monsterdata'] = 'id,name,lb,sa,active,leader,notes\n' + ''.join(
+            '{},,{},{},,,\n'.format(monster_no, rng.choice(['', '1.1', '1.2']), rng.choice(['', '1']))
+            for monster_no in sample[:len(sample) // 3])
+
+
+def setup(bot):
+    n = PadGuideBench(bot)
+    bot.add_cog(n)
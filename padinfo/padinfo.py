@@ -27,6 +27,7 @@ from enum import Enum
 from __main__ import user_allowed, send_cmd_help
 import discord
 from discord.ext import commands
+import numpy as np
 import prettytable
 import romkan
 import unidecode
@@ -109,11 +110,19 @@ class PadInfo:
         self.index_na = padguide2.empty_index()
 
         self.menu = Menu(bot)
+        self.embed_cache = EmbedRenderCache()
+
+        # (server, database generation, rotation version) -> rendered ^skillrotation pages
+        self.rotation_pages = {}
+
+        # Rebuilt lazily whenever the database generation changes
+        self.ls_matrix = None
 
         # These emojis are the keys into the idmenu submenus
         self.id_emoji = '\N{INFORMATION SOURCE}'
         self.evo_emoji = char_to_emoji('e')
         self.mats_emoji = char_to_emoji('m')
+        self.total_mats_emoji = char_to_emoji('t')
         self.ls_emoji = '\N{INFORMATION SOURCE}'
         self.left_emoji = char_to_emoji('l')
         self.right_emoji = char_to_emoji('r')
@@ -129,11 +138,16 @@ class PadInfo:
 
         self.historic_lookups = dataIO.load_json(self.historic_lookups_file_path)
 
+        generation_tracker.track('PadInfo cog', self)
+
     def __unload(self):
         # Manually nulling out database because the GC for cogs seems to be pretty shitty
         self.index_all = padguide2.empty_index()
         self.index_na = padguide2.empty_index()
         self.historic_lookups = {}
+        self.embed_cache.clear()
+        self.rotation_pages = {}
+        self.ls_matrix = None
 
     async def reload_nicknames(self):
         await self.bot.wait_until_ready()
@@ -153,6 +167,15 @@ class PadInfo:
         await pg_cog.wait_until_ready()
         self.index_all = pg_cog.create_index()
         self.index_na = pg_cog.create_index(lambda m: m.on_na)
+        generation_tracker.track('padinfo index_all', self.index_all)
+        generation_tracker.track('padinfo index_na', self.index_na)
+
+        # Names come from the index, so the rotation tables need to be rendered again
+        self.rotation_pages = {}
+        # Tabs rendered since the last database rebuild came from the old index's monsters
+        self.embed_cache.clear()
+        for server in padguide2.SKILL_ROTATION_SERVERS:
+            self._get_rotation_pages(pg_cog.database, server)
 
     def get_monster_by_no(self, monster_no: int):
         pg_cog = self.bot.get_cog('PadGuide2')
@@ -167,11 +190,21 @@ class PadInfo:
             return
 
         pg_cog = self.bot.get_cog('PadGuide2')
-        monsters = pg_cog.database.rotating_skillups(server)
-
-        for page in pagify(monsters_to_rotation_list(monsters, server, self.index_all)):
+        for page in self._get_rotation_pages(pg_cog.database, server):
             await self.bot.say(box(page))
 
+    def _get_rotation_pages(self, database: padguide2.PgRawDatabase, server: str):
+        """Renders the rotation table for a server, reusing it until the rotation changes."""
+        database.refresh_skill_rotations(server)
+        key = (server, database.generation, database.rotation_version)
+        if key not in self.rotation_pages:
+            # Drop the stale tables for this server
+            self.rotation_pages = {k: v for k, v in self.rotation_pages.items() if k[0] != server}
+            monsters = database.rotating_skillups(server)
+            table = monsters_to_rotation_list(monsters, server, self.index_all)
+            self.rotation_pages[key] = list(pagify(table))
+        return self.rotation_pages[key]
+
     @commands.command(pass_context=True)
     async def jpname(self, ctx, *, query: str):
         """Print the Japanese name of a monster"""
@@ -217,6 +250,62 @@ class PadInfo:
         else:
             await self.bot.say(self.makeFailureMsg(err))
 
+    @commands.command(pass_context=True)
+    async def totalmats(self, ctx, *, query: str):
+        """Monster info (total evo materials from the base form)"""
+        m, err, debug_info = self.findMonster(query)
+        if m is not None:
+            menu = await self._do_idmenu(ctx, m, self.total_mats_emoji)
+            if menu == EMBED_NOT_GENERATED:
+                await self.bot.say(inline('Not an evolved monster'))
+        else:
+            await self.bot.say(self.makeFailureMsg(err))
+
+    @commands.command(pass_context=True)
+    async def farm(self, ctx, *, query: str):
+        """Print where a monster (or any monster in its evo tree) drops"""
+        m, err, debug_info = self.findMonster(query)
+        if m is None:
+            await self.bot.say(self.makeFailureMsg(err))
+            return
+
+        database = self.bot.get_cog('PadGuide2').database
+        drops = database.tree_drops(m)
+        if not drops:
+            await self.bot.say(inline('{} is not farmable'.format(monsterToHeader(m))))
+            return
+
+        await self.bot.say(inline('Drop locations for {}'.format(monsterToHeader(m))))
+        for page in pagify(dropsToTable(database, drops)):
+            await self.bot.say(box(page))
+
+    @commands.command(pass_context=True)
+    async def evocost(self, ctx, from_query: str, to_query: str):
+        """Print the evolutions and materials needed to get from one monster to another
+
+        If either query contains spaces, wrap in quotes.
+        e.g.: ^evocost "sonia" "r sonia"
+        """
+        from_m, from_err, _ = self.findMonster(from_query)
+        to_m, to_err, _ = self.findMonster(to_query)
+        if from_err or to_err:
+            await self.bot.say(self.makeFailureMsg(from_err or to_err))
+            return
+
+        evolution_graph = self.bot.get_cog('PadGuide2').database.evolution_graph
+        path = evolution_graph.evolution_path(from_m, to_m)
+        if path is None:
+            await self.bot.say(inline('{} does not evolve into {}'.format(
+                monsterToHeader(from_m), monsterToHeader(to_m))))
+            return
+
+        embed = monsterToBaseEmbed(to_m)
+        embed.add_field(name='Evolution path',
+                        value='\n'.join(monsterToHeader(pm, link=True) for pm in path))
+        embed.add_field(name='Total materials',
+                        value=totalMatsToText(evolution_graph.total_materials(from_m, to_m)))
+        await self.bot.say(embed=embed)
+
     @commands.command(pass_context=True)
     async def pantheon(self, ctx, *, query: str):
         """Monster info (pantheon tab)"""
@@ -240,29 +329,43 @@ class PadInfo:
             await self.bot.say(self.makeFailureMsg(err))
 
     async def _do_idmenu(self, ctx, m, starting_menu_emoji):
-        id_embed = monsterToEmbed(m, self.get_emojis())
-        evo_embed = monsterToEvoEmbed(m)
-        mats_embed = monsterToEvoMatsEmbed(m)
-        pic_embed = monsterToPicEmbed(m)
-        other_info_embed = monsterToOtherInfoEmbed(m)
-
         emoji_to_embed = OrderedDict()
-        emoji_to_embed[self.id_emoji] = id_embed
-        emoji_to_embed[self.evo_emoji] = evo_embed
-        emoji_to_embed[self.mats_emoji] = mats_embed
-        emoji_to_embed[self.pic_emoji] = pic_embed
-
-        pantheon_embed = monsterToPantheonEmbed(m)
-        if pantheon_embed:
-            emoji_to_embed[self.pantheon_emoji] = pantheon_embed
+        emoji_to_embed[self.id_emoji] = self._lazy_embed(
+            m, 'id', lambda: monsterToEmbed(m, self.get_emojis()))
+        emoji_to_embed[self.evo_emoji] = self._lazy_embed(m, 'evo', lambda: monsterToEvoEmbed(m))
+        emoji_to_embed[self.mats_emoji] = self._lazy_embed(
+            m, 'mats', lambda: monsterToEvoMatsEmbed(m))
+        evolution_graph = self.bot.get_cog('PadGuide2').database.evolution_graph
+        if monsterHasTotalMats(m, evolution_graph):
+            emoji_to_embed[self.total_mats_emoji] = self._lazy_embed(
+                m, 'totalmats', lambda: monsterToTotalMatsEmbed(m, evolution_graph))
+        emoji_to_embed[self.pic_emoji] = self._lazy_embed(m, 'pic', lambda: monsterToPicEmbed(m))
+
+        if monsterHasPantheon(m):
+            emoji_to_embed[self.pantheon_emoji] = self._lazy_embed(
+                m, 'pantheon', lambda: monsterToPantheonEmbed(m))
+
+        if monsterHasSkillups(m):
+            emoji_to_embed[self.skillups_emoji] = self._lazy_embed(
+                m, 'skillups', lambda: monsterToSkillupsEmbed(m))
+
+        emoji_to_embed[self.other_info_emoji] = self._lazy_embed(
+            m, 'other_info', lambda: monsterToOtherInfoEmbed(m))
 
-        skillups_embed = monsterToSkillupsEmbed(m)
-        if skillups_embed:
-            emoji_to_embed[self.skillups_emoji] = skillups_embed
+        return await self._do_menu(ctx, starting_menu_emoji, emoji_to_embed)
 
-        emoji_to_embed[self.other_info_emoji] = other_info_embed
+    def _lazy_embed(self, m, tab_name, render_fn):
+        """Defers rendering a tab until it's selected, and caches the result.
 
-        return await self._do_menu(ctx, starting_menu_emoji, emoji_to_embed)
+        The cache key includes the database generation, skill rotation and emoji
+        servers, so a refresh, rotation or emoji server change naturally
+        invalidates old entries. The index lags database rebuilds, so
+        refresh_index also clears the cache.
+        """
+        pg_cog = self.bot.get_cog('PadGuide2')
+        key = (m.monster_no, pg_cog.database.generation, pg_cog.database.rotation_version,
+               tuple(sorted(self.settings.emojiServers())), tab_name)
+        return LazyMenuContent(lambda: self.embed_cache.get_or_render(key, render_fn))
 
     async def _do_evolistmenu(self, ctx, sm):
         monsters = sm.alt_evos
@@ -271,7 +374,8 @@ class PadInfo:
         emoji_to_embed = OrderedDict()
         for idx, m in enumerate(monsters):
             emoji = char_to_emoji(str(idx))
-            emoji_to_embed[emoji] = monsterToEmbed(m, self.get_emojis())
+            emoji_to_embed[emoji] = self._lazy_embed(
+                m, 'id', lambda m=m: monsterToEmbed(m, self.get_emojis()))
             if m == sm:
                 starting_menu_emoji = emoji
 
@@ -288,7 +392,9 @@ class PadInfo:
         try:
             result_msg, result_embed = await self.menu.custom_menu(ctx, emoji_to_embed, starting_menu_emoji, timeout=timeout)
             if result_msg and result_embed:
-                # Message is finished but not deleted, clear the footer
+                # Message is finished but not deleted, clear the footer. Copy
+                # first, the embed may be shared via the render cache.
+                result_embed = discord.Embed.from_data(result_embed.to_dict())
                 result_embed.set_footer(text=discord.Embed.Empty)
                 await self.bot.edit_message(result_msg, embed=result_embed)
         except Exception as ex:
@@ -366,11 +472,70 @@ class PadInfo:
 
         emoji_to_embed = OrderedDict()
         emoji_to_embed[self.ls_emoji] = monstersToLsEmbed(left_m, right_m)
-        emoji_to_embed[self.left_emoji] = monsterToEmbed(left_m, self.get_emojis())
-        emoji_to_embed[self.right_emoji] = monsterToEmbed(right_m, self.get_emojis())
+        emoji_to_embed[self.left_emoji] = self._lazy_embed(
+            left_m, 'id', lambda: monsterToEmbed(left_m, self.get_emojis()))
+        emoji_to_embed[self.right_emoji] = self._lazy_embed(
+            right_m, 'id', lambda: monsterToEmbed(right_m, self.get_emojis()))
 
         await self._do_menu(ctx, self.ls_emoji, emoji_to_embed)
 
+    @commands.command(pass_context=True)
+    async def lspair(self, ctx, *, query: str=''):
+        """Rank leader skill pairings by their combined multiplier
+
+        ^lspair [stat] [filters] [with <monster>]
+          stat    : hp, atk (default) or rcv
+          filters : na, an attribute (fire, water, wood, light, dark) or a type (dragon, god, ...)
+          with    : rank the best partners for that monster's leader skill instead of the best pairs
+
+        Monsters with identical multipliers are collapsed into the newest one.
+        e.g.: ^lspair na dark with r sonia
+        """
+        filter_text, _, monster_query = query.partition('with ')
+        matrix = self._get_ls_matrix()
+
+        stat = 'atk'
+        filters = {'na_only': False, 'attributes': [], 'types': []}
+        for token in padguide2.replace_colors(filter_text.lower()).split():
+            if token in LeaderSkillMatrix.STATS:
+                stat = token
+            elif token == 'na':
+                filters['na_only'] = True
+            elif token.title() in padguide2.Attribute.__members__:
+                filters['attributes'].append(padguide2.Attribute[token.title()])
+            elif token in matrix.type_to_mask:
+                filters['types'].append(token)
+            else:
+                await self.bot.say(inline('Unexpected filter: {}'.format(token)))
+                return
+
+        if monster_query.strip():
+            m, err, _ = self.findMonster(monster_query.strip())
+            if err:
+                await self.bot.say(self.makeFailureMsg(err))
+                return
+            if m not in matrix.monster_to_row:
+                await self.bot.say(inline('{} has no leader skill data'.format(monsterToHeader(m))))
+                return
+            pairs = [(m, p) for p in matrix.best_partners(m, stat=stat, **filters)]
+        else:
+            # Scores every candidate pair, so keep it off the event loop
+            pairs = await self.bot.loop.run_in_executor(
+                None, lambda: matrix.best_pairs(stat=stat, **filters))
+
+        if not pairs:
+            await self.bot.say(inline('No leader skills matched'))
+            return
+
+        for page in pagify(leaderPairsToTable(pairs)):
+            await self.bot.say(box(page))
+
+    def _get_ls_matrix(self):
+        database = self.bot.get_cog('PadGuide2').database
+        if self.ls_matrix is None or self.ls_matrix.generation != database.generation:
+            self.ls_matrix = LeaderSkillMatrix(database.all_monsters(), database.generation)
+        return self.ls_matrix
+
     @commands.command(name="helpid", pass_context=True, aliases=['helppic', 'helpimg'])
     async def _helpid(self, ctx):
         """Whispers you info on how to craft monster queries for ^id"""
@@ -390,8 +555,17 @@ class PadInfo:
         self.settings.emojiServers().clear()
         if emoji_servers:
             self.settings.setEmojiServers(emoji_servers.split(','))
+        self.embed_cache.clear()
         await self.bot.say(inline('Set {} servers'.format(len(self.settings.emojiServers()))))
 
+    @padinfo.command(pass_context=True)
+    @checks.is_owner()
+    async def embedcache(self, ctx):
+        """Print embed render cache statistics"""
+        cache = self.embed_cache
+        await self.bot.say(inline('{} cached embeds (max {}), hits={} misses={}'.format(
+            len(cache.embeds), cache.max_size, cache.hits, cache.misses)))
+
     def get_emojis(self):
         server_ids = self.settings.emojiServers()
         return [e for s in self.bot.servers if s.id in server_ids for e in s.emojis]
@@ -430,6 +604,155 @@ def setup(bot):
     print('done adding padinfo bot')
 
 
+class EmbedRenderCache(object):
+    """Bounded LRU cache of rendered embeds.
+
+    Embeds are shared between menus, so callers must not modify them.
+    """
+
+    def __init__(self, max_size=2000):
+        self.max_size = max_size
+        self.embeds = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render_fn):
+        embed = self.embeds.get(key)
+        if embed is not None:
+            self.hits += 1
+            self.embeds.move_to_end(key)
+            return embed
+
+        self.misses += 1
+        embed = render_fn()
+        self.embeds[key] = embed
+        while len(self.embeds) > self.max_size:
+            self.embeds.popitem(last=False)
+        return embed
+
+    def clear(self):
+        self.embeds.clear()
+
+
+# best_pairs scores this many left-hand leaders against every candidate at a time,
+# so its working arrays stay at PAIR_CHUNK_ROWS * candidates floats
+PAIR_CHUNK_ROWS = 256
+
+
+def top_scores(primary, secondary, flat_idx, limit):
+    """Positions of the limit best entries by primary, then secondary, then flat_idx, best first."""
+    limit = min(limit, primary.size)
+    if not limit:
+        return np.empty(0, dtype=np.int64)
+    cutoff_idx = primary.size - limit
+    cutoff = np.partition(primary, cutoff_idx)[cutoff_idx]
+    top = np.flatnonzero(primary >= cutoff)
+    top = top[np.lexsort((flat_idx[top], -secondary[top], -primary[top]))][:limit]
+    return top[primary[top] > -np.inf]
+
+
+class LeaderSkillMatrix(object):
+    """Leader skill multipliers for every monster, laid out as arrays.
+
+    Rows are sorted by monster_no descending, so the first row with a given set of
+    multipliers is the newest monster that has it. Pair scores are computed as
+    array products rather than looping over monsters.
+    """
+
+    STATS = ['hp', 'atk', 'rcv']
+
+    def __init__(self, monsters, generation):
+        self.generation = generation
+        self.monsters = sorted([m for m in monsters if m.leader_skill and m.leader_skill_data],
+                               key=lambda m: m.monster_no, reverse=True)
+        self.monster_to_row = {m: i for i, m in enumerate(self.monsters)}
+
+        size = len(self.monsters)
+        # Columns are hp, atk, rcv, resist
+        self.multipliers = np.array([m.leader_skill_data.get_data() for m in self.monsters],
+                                    dtype=np.float64).reshape(size, 4)
+        self.on_na = np.array([m.on_na for m in self.monsters], dtype=bool)
+        self.attr1 = np.array([m.attr1.value if m.attr1 else 0 for m in self.monsters], dtype=np.int8)
+        self.attr2 = np.array([m.attr2.value if m.attr2 else 0 for m in self.monsters], dtype=np.int8)
+
+        self.type_to_mask = {}
+        for i, m in enumerate(self.monsters):
+            for t in m.types:
+                if t not in self.type_to_mask:
+                    self.type_to_mask[t] = np.zeros(size, dtype=bool)
+                self.type_to_mask[t][i] = True
+
+    def _candidate_rows(self, na_only=False, attributes=[], types=[]):
+        mask = np.ones(len(self.monsters), dtype=bool)
+        if na_only:
+            mask &= self.on_na
+        for attr in attributes:
+            mask &= (self.attr1 == attr.value) | (self.attr2 == attr.value)
+        for t in types:
+            mask &= self.type_to_mask[t]
+
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return rows
+
+        # Collapse identical multipliers into the newest monster
+        _, first_idx = np.unique(self.multipliers[rows], axis=0, return_index=True)
+        return rows[np.sort(first_idx)]
+
+    def _score_columns(self, stat):
+        """The ranked stat column, and the two tie-breaking stat columns."""
+        col = self.STATS.index(stat)
+        return col, [c for c in range(len(self.STATS)) if c != col]
+
+    def best_partners(self, m: padguide2.PgMonster, stat='atk', limit=10, **filters):
+        """Returns the best partner leaders for m, ranked by the paired stat multiplier."""
+        col, other_cols = self._score_columns(stat)
+        rows = self._candidate_rows(**filters)
+        products = self.multipliers[rows, :3] * self.multipliers[self.monster_to_row[m], :3]
+
+        primary = products[:, col]
+        secondary = products[:, other_cols].prod(axis=1)
+        order = np.lexsort((-secondary, -primary))[:limit]
+        return [self.monsters[rows[i]] for i in order]
+
+    def best_pairs(self, stat='atk', limit=10, **filters):
+        """Returns the best (left, right) leader pairs, ranked by the paired stat multiplier."""
+        col, other_cols = self._score_columns(stat)
+        rows = self._candidate_rows(**filters)
+        count = len(rows)
+        if not count:
+            return []
+
+        values = self.multipliers[rows, col]
+        other_values = self.multipliers[rows][:, other_cols].prod(axis=1)
+
+        # The best pairs so far, as flat (left * count + right) indices and their scores
+        best_idx = np.empty(0, dtype=np.int64)
+        best_primary = np.empty(0)
+        best_secondary = np.empty(0)
+        for start in range(0, count, PAIR_CHUNK_ROWS):
+            end = min(start + PAIR_CHUNK_ROWS, count)
+            primary = np.outer(values[start:end], values)
+            secondary = np.outer(other_values[start:end], other_values)
+
+            # Pairs are symmetric; only consider each one once
+            primary[np.tril_indices(end - start, start - 1, count)] = -np.inf
+
+            flat_primary = primary.ravel()
+            flat_secondary = secondary.ravel()
+            flat_idx = np.arange(start * count, end * count, dtype=np.int64)
+            top = top_scores(flat_primary, flat_secondary, flat_idx, limit)
+
+            best_idx = np.concatenate([best_idx, flat_idx[top]])
+            best_primary = np.concatenate([best_primary, flat_primary[top]])
+            best_secondary = np.concatenate([best_secondary, flat_secondary[top]])
+            keep = top_scores(best_primary, best_secondary, best_idx, limit)
+            best_idx, best_primary, best_secondary = best_idx[keep], best_primary[keep], best_secondary[keep]
+
+        left_idx, right_idx = np.unravel_index(best_idx, (count, count))
+        return [(self.monsters[rows[l]], self.monsters[rows[r]]) for l, r in zip(left_idx, right_idx)]
+
+
 class PadInfoSettings(CogSettings):
     def make_default_settings(self):
         config = {}
@@ -546,11 +869,44 @@ def monsterToEvoMatsEmbed(m: padguide2.PgMonster):
     return embed
 
 
-def monsterToPantheonEmbed(m: padguide2.PgMonster):
+def monsterHasTotalMats(m: padguide2.PgMonster, evolution_graph: padguide2.EvolutionGraph):
+    return len(evolution_graph.ancestors(m)) > 0
+
+
+def totalMatsToText(total_mats, max_lines=15):
+    if not total_mats:
+        return 'None'
+    lines = ['{}x {}'.format(count, monsterToHeader(mat)) for mat, count in total_mats]
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + ['...and {} more'.format(len(lines) - max_lines)]
+    return '\n'.join(lines)
+
+
+def monsterToTotalMatsEmbed(m: padguide2.PgMonster, evolution_graph: padguide2.EvolutionGraph):
+    embed = monsterToBaseEmbed(m)
+
+    base_m = evolution_graph.ancestors(m)[0]
+    total_mats = evolution_graph.total_materials(base_m, m)
+    field_name = 'Total materials from {}'.format(monsterToHeader(base_m))
+    embed.add_field(name=field_name, value=totalMatsToText(total_mats))
+
+    return embed
+
+
+def monsterToPantheonList(m: padguide2.PgMonster):
     full_pantheon = m.series.monsters
-    pantheon_list = list(filter(lambda x: x.evo_from is None, full_pantheon))
-    if len(pantheon_list) == 0 or len(pantheon_list) > 6:
+    return list(filter(lambda x: x.evo_from is None, full_pantheon))
+
+
+def monsterHasPantheon(m: padguide2.PgMonster):
+    pantheon_size = len(monsterToPantheonList(m))
+    return 0 < pantheon_size <= 6
+
+
+def monsterToPantheonEmbed(m: padguide2.PgMonster):
+    if not monsterHasPantheon(m):
         return None
+    pantheon_list = monsterToPantheonList(m)
 
     embed = monsterToBaseEmbed(m)
 
@@ -563,13 +919,22 @@ def monsterToPantheonEmbed(m: padguide2.PgMonster):
     return embed
 
 
-def monsterToSkillupsEmbed(m: padguide2.PgMonster):
+def monsterToSkillupsLists(m: padguide2.PgMonster):
     skillups_list = m.active_skill.monsters_with_active if m.active_skill else []
     skillups_list = list(filter(lambda m: m.sell_mp < 3000, skillups_list))
-    server_skillups = m.active_skill.server_skillups if m.active_skill else []
+    server_skillups = m.active_skill.server_skillups if m.active_skill else {}
+    return skillups_list, server_skillups
+
+
+def monsterHasSkillups(m: padguide2.PgMonster):
+    skillups_list, server_skillups = monsterToSkillupsLists(m)
+    return len(skillups_list) + len(server_skillups) > 0
 
-    if len(skillups_list) + len(server_skillups) == 0:
+
+def monsterToSkillupsEmbed(m: padguide2.PgMonster):
+    if not monsterHasSkillups(m):
         return None
+    skillups_list, server_skillups = monsterToSkillupsLists(m)
 
     embed = monsterToBaseEmbed(m)
 
@@ -612,6 +977,18 @@ def monsterToPicEmbed(m: padguide2.PgMonster):
     return embed
 
 
+def dropsToTable(database: padguide2.PgRawDatabase, drops):
+    tbl = prettytable.PrettyTable(['Dungeon', 'Floor', 'Drops'])
+    tbl.hrules = prettytable.HEADER
+    tbl.vrules = prettytable.NONE
+    tbl.align = "l"
+    for drop in drops:
+        dungeon = database.getDungeon(drop.dungeon_seq)
+        drop_m = database.getMonster(drop.drop_monster_no)
+        tbl.add_row([dungeon.name, drop.floor or '', monsterToHeader(drop_m)])
+    return tbl.get_string()
+
+
 def monstersToLsEmbed(left_m: padguide2.PgMonster, right_m: padguide2.PgMonster):
     lhp, latk, lrcv, lresist = left_m.leader_skill_data.get_data()
     rhp, ratk, rrcv, rresist = right_m.leader_skill_data.get_data()
@@ -631,6 +1008,19 @@ def monstersToLsEmbed(left_m: padguide2.PgMonster, right_m: padguide2.PgMonster)
     return embed
 
 
+def leaderPairsToTable(pairs):
+    tbl = prettytable.PrettyTable(['Multiplier', 'Left', 'Right'])
+    tbl.hrules = prettytable.HEADER
+    tbl.vrules = prettytable.NONE
+    tbl.align = "l"
+    for left_m, right_m in pairs:
+        lhp, latk, lrcv, lresist = left_m.leader_skill_data.get_data()
+        rhp, ratk, rrcv, rresist = right_m.leader_skill_data.get_data()
+        multiplier_text = createMultiplierText(lhp, latk, lrcv, lresist, rhp, ratk, rrcv, rresist)
+        tbl.add_row([multiplier_text, monsterToHeader(left_m), monsterToHeader(right_m)])
+    return tbl.get_string()
+
+
 def monsterToHeaderEmbed(m: padguide2.PgMonster):
     header = monsterToLongHeader(m, link=True)
     embed = discord.Embed()
@@ -808,7 +1198,7 @@ def monsters_to_rotation_list(monster_list, server: str, index_all: padguide2.Mo
         'Ancient Draggie Knight',
     ]
 
-    monster_list.sort(key=lambda m: m.monster_no, reverse=True)
+    # monster_list is already sorted by monster_no descending
     next_rotation_date = None
     for m in monster_list:
         if server in m.future_skillup_rotation:
@@ -1,5 +1,7 @@
+from collections import OrderedDict
 import json
 import math
+import re
 
 import discord
 from discord.ext import commands
@@ -31,6 +33,10 @@ Single instance filters
 * shuffle     : Board shuffle (aka refresh)
 * unlock      : Orb unlock
 
+Stat filters (can be repeated, all must match)
+* hp(>n), atk(>n), rcv(>n), rarity(a-b), cost(<n), weighted(>n)
+  Accepts >n, >=n, <n, <=n, a-b (inclusive) or an exact value n
+
 Multiple instance filters 
 * active(str)     : Active skill name/description
 * board(colors,)  : Board change to a comma-sep list of colors
@@ -136,6 +142,42 @@ def replace_colors_in_text(text: str):
     return text
 
 
+STAT_NAME_TO_ATTR = {
+    'hp': 'hp',
+    'atk': 'atk',
+    'rcv': 'rcv',
+    'rarity': 'rarity',
+    'cost': 'cost',
+    'weighted': 'weighted_stats',
+}
+
+
+def parse_stat_range(value: str):
+    """Converts stat filter text like '>5000' or '3-5' into an inclusive (min, max) pair.
+
+    None is used for an open end of the range.
+    """
+    value = value.replace(' ', '')
+    match = re.match(r'^(\d+)-(\d+)$', value)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+
+    match = re.match(r'^(>=|<=|>|<|=)?(\d+)$', value)
+    if not match:
+        raise rpadutils.ReportableError('Unexpected stat range {}'.format(value))
+
+    op, num = match.group(1), int(match.group(2))
+    if op == '>':
+        return num + 1, None
+    if op == '>=':
+        return num, None
+    if op == '<':
+        return None, num - 1
+    if op == '<=':
+        return None, num
+    return num, num
+
+
 def clean_name(txt, name):
     return txt.replace(name, '').strip('() ')
 
@@ -165,6 +207,72 @@ def board_filter(colors):
     return fn
 
 
+class SearchResultPager(object):
+    """Lazily evaluates a search over presorted monsters, one page at a time.
+
+    Monsters must already be in display order. Matching stops as soon as a page
+    is filled, and resumes from the saved cursor when the next page is requested.
+    Only the header text for matches is retained.
+    """
+
+    def __init__(self, monsters, check_fn, page_size=10):
+        self.monsters = monsters
+        self.check_fn = check_fn
+        self.page_size = page_size
+
+        self.cursor = 0
+        self.pages = []
+        self.page_idx = -1
+
+    def exhausted(self):
+        return self.cursor >= len(self.monsters)
+
+    def _fetch_page(self):
+        page = []
+        while not self.exhausted() and len(page) < self.page_size:
+            m = self.monsters[self.cursor]
+            self.cursor += 1
+            if self.check_fn(m):
+                page.append('No. {} {}'.format(m.monster_no_na, m.name_na))
+        if page:
+            self.pages.append(page)
+
+    def has_page(self, idx):
+        while len(self.pages) <= idx and not self.exhausted():
+            self._fetch_page()
+        return 0 <= idx < len(self.pages)
+
+    def is_single_page(self):
+        return not self.has_page(1)
+
+    def next_page(self):
+        if self.has_page(self.page_idx + 1):
+            self.page_idx += 1
+        return self.page_text()
+
+    def prev_page(self):
+        if self.page_idx > 0:
+            self.page_idx -= 1
+        return self.page_text()
+
+    def page_text(self):
+        if not self.has_page(max(self.page_idx, 0)):
+            return box('Matched 0 monsters')
+
+        page = self.pages[self.page_idx]
+        first_idx = self.page_idx * self.page_size + 1
+        last_idx = first_idx + len(page) - 1
+        if self.has_page(self.page_idx + 1):
+            header = 'Results {}-{} (more available)'.format(first_idx, last_idx)
+        else:
+            header = 'Results {}-{} of {}'.format(first_idx, last_idx, last_idx)
+
+        msg = header
+        for line in page:
+            msg += '\n\t' + line
+        return box(msg)
+
+
 class PadSearchLexer(object):
     tokens = [
         'ACTIVE',
@@ -181,6 +289,7 @@ class PadSearchLexer(object):
         'ROW',
         'TYPE',
         'SHUFFLE',
+        'STAT',
         'UNLOCK',
     ]
 
@@ -255,6 +364,13 @@ class PadSearchLexer(object):
         r'shuffle(\(\))?'
         return t
 
+    def t_STAT(self, t):
+        r'(hp|atk|rcv|rarity|cost|weighted)\([<>=\d\- ]+\)'
+        stat_name = t.value[:t.value.find('(')]
+        min_value, max_value = parse_stat_range(clean_name(t.value, stat_name))
+        t.value = (STAT_NAME_TO_ATTR[stat_name], min_value, max_value)
+        return t
+
     def t_TYPE(self, t):
         r'type\([a-zA-z]+\)'
         t.value = clean_name(t.value, 'type')
@@ -277,7 +393,7 @@ class PadSearchLexer(object):
 
 class SearchConfig(object):
 
-    def __init__(self, lexer):
+    def __init__(self, lexer, stat_index):
         self.cd = None
         self.farmable = None
         self.haste = None
@@ -293,6 +409,7 @@ class SearchConfig(object):
         self.leader = []
         self.name = []
         self.row = []
+        self.stats = []
         self.types = []
 
         for tok in iter(lexer.token, None):
@@ -321,6 +438,8 @@ class SearchConfig(object):
                 self.name.append(value)
             if type == 'ROW':
                 self.row.append(assert_orbcolor(value))
+            if type == 'STAT':
+                self.stats.append(value)
             if type == 'TYPE':
                 if value not in TYPES:
                     raise rpadutils.ReportableError(
@@ -329,6 +448,11 @@ class SearchConfig(object):
 
         self.filters = list()
 
+        # Stats; resolved up front via binary search so they can reject cheaply
+        for stat, min_value, max_value in self.stats:
+            monster_nos = stat_index.monster_nos_in_range(stat, min_value, max_value)
+            self.filters.append(lambda m, s=monster_nos: m.monster_no in s)
+
         # Single
         if self.cd:
             self.filters.append(lambda m: m.search.active_min and m.search.active_min <= self.cd)
@@ -337,19 +461,16 @@ class SearchConfig(object):
             self.filters.append(lambda m: m.farmable_evo)
 
         if self.haste:
-            text = 'charge by {}'.format(self.haste)
-            self.filters.append(lambda m, t=text: t in m.search.active_desc)
+            self.filters.append(lambda m: m.search.haste == self.haste)
 
         if self.inheritable:
             self.filters.append(lambda m: m.is_inheritable)
 
         if self.shuffle:
-            text = 'switch orbs'
-            self.filters.append(lambda m, t=text: t in m.search.active_desc)
+            self.filters.append(lambda m: m.search.shuffle)
 
         if self.unlock:
-            text = 'removes lock'
-            self.filters.append(lambda m, t=text: t in m.search.active_desc)
+            self.filters.append(lambda m: m.search.unlock)
 
         # Multiple
         if self.active:
@@ -450,6 +571,7 @@ class PadSearch:
 
     def __init__(self, bot):
         self.bot = bot
+        self.menu = rpadutils.Menu(bot)
 
     @commands.command(pass_context=True)
     async def helpsearch(self, ctx):
@@ -462,35 +584,44 @@ class PadSearch:
 
         Use ^helpsearch for more info.
         """
+        pg_cog = self.bot.get_cog('PadGuide2')
+        database = pg_cog.database
+
         try:
-            config = self._make_search_config(filter_spec)
+            config = self._make_search_config(filter_spec, database)
         except Exception as ex:
             # Try to correct for missing closing tag
             try:
-                config = self._make_search_config(filter_spec + ')')
+                config = self._make_search_config(filter_spec + ')', database)
             except:
                 # If it still failed, raise the original exception
                 raise ex
 
-        pg_cog = self.bot.get_cog('PadGuide2')
-        monsters = pg_cog.database.all_monsters()
-        matched_monsters = list(filter(config.check_filters, monsters))
-        matched_monsters.sort(key=lambda m: m.monster_no_na, reverse=True)
+        monsters = database.monsters_by_no_na_desc()
+        pager = SearchResultPager(monsters, config.check_filters)
+
+        if pager.is_single_page():
+            await self.bot.say(pager.next_page())
+            return
 
-        msg = 'Matched {} monsters'.format(len(matched_monsters))
-        if len(matched_monsters) > 10:
-            msg += ' (limited to 10)'
-            matched_monsters = matched_monsters[0:10]
+        await self._do_pager_menu(ctx, pager)
 
-        for m in matched_monsters:
-            msg += '\n\tNo. {} {}'.format(m.monster_no_na, m.name_na)
+    async def _do_pager_menu(self, ctx, pager):
+        next_emoji = self.menu.emoji['next']
+        emoji_to_page = OrderedDict()
+        emoji_to_page[self.menu.emoji['back']] = rpadutils.LazyMenuContent(pager.prev_page)
+        emoji_to_page[next_emoji] = rpadutils.LazyMenuContent(pager.next_page)
+        emoji_to_page[self.menu.emoji['no']] = self.menu.reaction_delete_message
 
-        await self.bot.say(box(msg))
+        try:
+            await self.menu.custom_menu(ctx, emoji_to_page, next_emoji, timeout=30)
+        except Exception as ex:
+            print('Menu failure', ex)
 
-    def _make_search_config(self, input):
+    def _make_search_config(self, input, database):
         lexer = PadSearchLexer().build()
         lexer.input(input)
-        return SearchConfig(lexer)
+        return SearchConfig(lexer, database.stat_index)
 
     @commands.command(pass_context=True)
     @checks.is_owner()
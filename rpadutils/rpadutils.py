@@ -1,18 +1,34 @@
+import aiohttp
 import asyncio
+from collections import defaultdict
+from collections import deque
 from dateutil.tz import gettz
 import dill
 import discord
 from discord.ext import commands
 from discord.ext.commands import CommandNotFound
 from discord.ext.commands import converter
+import gc
+import gzip
+import hashlib
+import heapq
 import inspect
+import json
+import os
 from pathlib import Path
 import re
+import sys
+import threading
 import time
+import timeit
+import tracemalloc
 import unicodedata
+from urllib.parse import urlsplit
+import weakref
 
 from cogs.utils.chat_formatting import *
 
+from .utils import checks
 from .utils.dataIO import fileIO
 from .utils.padguide_api import *
 
@@ -21,6 +37,47 @@ class RpadUtils:
     def __init__(self, bot):
         self.bot = bot
 
+    def __unload(self):
+        # Release any open menus; the dispatcher listener would otherwise outlive the module
+        shutdown_menu_dispatcher()
+        shutdown_http_client()
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def menucount(self, ctx):
+        """Print the number of open reaction menus."""
+        count = _menu_dispatcher.open_count() if _menu_dispatcher else 0
+        await self.bot.say(inline('{} open menus'.format(count)))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def httpstats(self, ctx):
+        """Print shared HTTP client counters."""
+        if _http_client is None:
+            await self.bot.say(inline('HTTP client not started'))
+            return
+        await self.bot.say(box(_http_client.stats()))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def leakcheck(self, ctx):
+        """Report cog data generations that are still alive but shouldn't be.
+
+        Run 'tracemalloc on' first to include an allocation summary.
+        """
+        for page in pagify(generation_tracker.report()):
+            await self.bot.say(box(page))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def tracemalloc(self, ctx, enabled: bool):
+        """Enable or disable tracemalloc; tracing slows down every allocation."""
+        if enabled:
+            tracemalloc.start(5)
+        else:
+            tracemalloc.stop()
+        await self.bot.say(inline('tracemalloc is {}'.format('on' if tracemalloc.is_tracing() else 'off')))
+
     async def on_command_error(self, error, ctx):
         channel = ctx.message.channel
         if isinstance(error, ReportableError):
@@ -159,14 +216,43 @@ def shouldDownload(file_path, expiry_secs):
     return should_download(file_path, expiry_secs)
 
 
-def writeJsonFile(file_path, js_data):
-    with open(file_path, "w") as f:
-        json.dump(js_data, f, sort_keys=True, indent=4)
+# First two bytes of any gzip stream
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def writeJsonFile(file_path, js_data, compress=False):
+    """Writes compact JSON to a temp file and renames it over file_path.
+
+    A crash mid-write leaves the previous file intact instead of a truncated one.
+    If compress is set the file is gzipped; readJsonFile handles both.
+    """
+    content = json.dumps(js_data, separators=(',', ':')).encode('utf-8')
+    if compress:
+        content = gzip.compress(content, compresslevel=1)
+
+    tmp_file_path = file_path + '.tmp'
+    with open(tmp_file_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_file_path, file_path)
+
+
+def write_plain_file_atomic(file_path, content: str):
+    """Writes content to a temp file and renames it over file_path.
+
+    Readers never observe a partially written file.
+    """
+    tmp_file_path = file_path + '.tmp'
+    with open(tmp_file_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    os.replace(tmp_file_path, file_path)
 
 
 def readJsonFile(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+    with open(file_path, "rb") as f:
+        content = f.read()
+    if content[:2] == GZIP_MAGIC:
+        content = gzip.decompress(content)
+    return json.loads(content.decode('utf-8'))
 
 
 def checkPadguideCacheFile(cache_file, expiry_secs):
@@ -177,15 +263,55 @@ def checkPadguideCacheFile(cache_file, expiry_secs):
     return False
 
 
-async def async_cached_padguide_request(endpoint, result_file, time_ms=0):
+async def async_cached_padguide_request(endpoint, result_file, time_ms=0, compress=False, base_url=None,
+                                        max_bytes=None):
     """Make a request to the PadGuide API.
 
     The endpoint is the JSP file name on the PadGuide API.
     The result_file is the place to store the resulting file.
     The time_ms is the time since update to pull for. Set to 0 for all time. Cannot be 0 for events.
+    If compress is set the result_file is gzipped.
+    If base_url is set the request goes to a stand-in for the API at that url instead,
+    and max_bytes overrides the http client's response size limit for it.
+
+    Returns True if the stored contents changed. Unchanged responses only touch the file.
     """
-    resp = await async_padguide_ts_request(time_ms, endpoint)
-    writeJsonFile(result_file, resp)
+    if base_url:
+        resp = json.loads(await makeAsyncPlainRequest(
+            '{}/{}?time={}'.format(base_url, endpoint, time_ms), max_bytes=max_bytes))
+    else:
+        resp = await async_padguide_ts_request(time_ms, endpoint)
+    new_hash = content_hash(json.dumps(resp, sort_keys=True))
+    if os.path.exists(result_file) and read_cache_meta(result_file).get('sha256') == new_hash:
+        Path(result_file).touch()
+        return False
+
+    writeJsonFile(result_file, resp, compress=compress)
+    write_cache_meta(result_file, {'sha256': new_hash})
+    return True
+
+
+def content_hash(text: str):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def cache_meta_path(file_path):
+    return file_path + '.meta'
+
+
+def read_cache_meta(file_path):
+    """Returns the validators stored next to a cached file, or {} if there are none."""
+    meta_path = cache_meta_path(file_path)
+    if not os.path.exists(meta_path):
+        return {}
+    try:
+        return readJsonFile(meta_path)
+    except ValueError:
+        return {}
+
+
+def write_cache_meta(file_path, meta):
+    write_plain_file_atomic(cache_meta_path(file_path), json.dumps(meta))
 
 
 def writePlainFile(file_path, text_data):
@@ -204,19 +330,446 @@ def makePlainRequest(file_url):
     return data.decode('utf-8')
 
 
-async def makeAsyncPlainRequest(file_url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(file_url) as resp:
-            return await resp.text()
+async def makeAsyncPlainRequest(file_url, max_bytes=None):
+    return await get_http_client().get_text(file_url, max_bytes=max_bytes)
 
 
 async def makeAsyncCachedPlainRequest(file_path, file_url, expiry_secs):
-    if shouldDownload(file_path, expiry_secs):
-        resp = await makeAsyncPlainRequest(file_url)
-        writePlainFile(file_path, resp)
+    await refresh_cached_plain_file(file_path, file_url, expiry_secs)
     return readPlainFile(file_path)
 
 
+async def refresh_cached_plain_file(file_path, file_url, expiry_secs):
+    """Re-downloads file_url into file_path once the cached copy is older than expiry_secs.
+
+    The ETag, Last-Modified and content hash of the last download are kept in a
+    sidecar file and used to make the request conditional. If the server says the
+    file is unmodified, or sends back identical content, only the timestamp is
+    updated.
+
+    Returns True if the file contents changed.
+    """
+    if not shouldDownload(file_path, expiry_secs):
+        return False
+
+    meta = read_cache_meta(file_path) if os.path.exists(file_path) else {}
+    headers = {}
+    if 'etag' in meta:
+        headers['If-None-Match'] = meta['etag']
+    if 'last_modified' in meta:
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    resp = await get_http_client().fetch(file_url, headers=headers)
+    if resp.status == 304:
+        print('not modified: ' + file_url)
+        Path(file_path).touch()
+        return False
+    if resp.status != 200:
+        raise HttpError(resp.status, file_url)
+    text = resp.text()
+    new_meta = {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+        'sha256': content_hash(text),
+    }
+    new_meta = {k: v for k, v in new_meta.items() if v}
+
+    changed = new_meta['sha256'] != meta.get('sha256')
+    if changed:
+        writePlainFile(file_path, text)
+    else:
+        print('unchanged: ' + file_url)
+        Path(file_path).touch()
+    write_cache_meta(file_path, new_meta)
+    return changed
+
+
+class HttpError(Exception):
+    def __init__(self, status, url):
+        super().__init__('HTTP {} for {}'.format(status, url))
+        self.status = status
+        self.url = url
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class HttpResponse(object):
+    """A fully read response; safe to share between coalesced callers."""
+
+    def __init__(self, status, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self, encoding='utf-8'):
+        return self.body.decode(encoding, errors='replace')
+
+
+class HttpClient(object):
+    """Shared HTTP client for all cogs.
+
+    One aiohttp session (and connection pool) is reused for every request.
+    Concurrency is capped per host, each attempt has a timeout, idempotent
+    requests are retried on connection errors and 5xx responses, and bodies
+    larger than max_bytes are refused.
+
+    Concurrent GETs for the same url and headers share a single in-flight
+    fetch, so a burst of identical requests costs one round trip.
+    """
+
+    RETRY_METHODS = {'GET', 'HEAD'}
+
+    def __init__(self, per_host_limit=4, timeout_secs=30, retries=2, max_bytes=16 * 1024 * 1024):
+        self.per_host_limit = per_host_limit
+        self.timeout_secs = timeout_secs
+        self.retries = retries
+        self.max_bytes = max_bytes
+
+        self.session = None
+        self.host_to_semaphore = {}
+        self.key_to_inflight = {}
+
+        self.request_count = 0
+        self.coalesced_count = 0
+        self.retry_count = 0
+        self.failure_count = 0
+
+    def _get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    def _get_semaphore(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.host_to_semaphore:
+            self.host_to_semaphore[host] = asyncio.Semaphore(self.per_host_limit)
+        return self.host_to_semaphore[host]
+
+    async def fetch(self, url, method='GET', data=None, headers=None, max_bytes=None, timeout_secs=None):
+        """Returns an HttpResponse for any status; raises on connection failure or oversize bodies.
+
+        timeout_secs applies to each attempt, and defaults to the client's.
+        """
+        method = method.upper()
+        headers = headers or {}
+        max_bytes = max_bytes or self.max_bytes
+        timeout_secs = timeout_secs or self.timeout_secs
+        self.request_count += 1
+
+        if method != 'GET':
+            return await self._fetch_with_retries(url, method, data, headers, max_bytes, timeout_secs)
+
+        key = (url, frozenset(headers.items()), max_bytes, timeout_secs)
+        inflight = self.key_to_inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                self._fetch_with_retries(url, method, data, headers, max_bytes, timeout_secs))
+            self.key_to_inflight[key] = inflight
+            inflight.add_done_callback(lambda f: self.key_to_inflight.pop(key, None))
+        else:
+            self.coalesced_count += 1
+
+        # Shielded so one caller giving up doesn't cancel the fetch for the others
+        return await asyncio.shield(inflight)
+
+    async def get_bytes(self, url, max_bytes=None):
+        resp = await self.fetch(url, max_bytes=max_bytes)
+        if resp.status >= 400:
+            raise HttpError(resp.status, url)
+        return resp.body
+
+    async def get_text(self, url, max_bytes=None):
+        resp = await self.fetch(url, max_bytes=max_bytes)
+        if resp.status >= 400:
+            raise HttpError(resp.status, url)
+        return resp.text()
+
+    async def _fetch_with_retries(self, url, method, data, headers, max_bytes, timeout_secs):
+        attempts = 1 + (self.retries if method in self.RETRY_METHODS else 0)
+        for attempt in range(attempts):
+            if attempt:
+                self.retry_count += 1
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+            last_attempt = attempt == attempts - 1
+            try:
+                async with self._get_semaphore(url):
+                    resp = await asyncio.wait_for(
+                        self._fetch_once(url, method, data, headers, max_bytes), timeout_secs)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as ex:
+                if last_attempt:
+                    self.failure_count += 1
+                    raise
+                print('retrying {} after {!r}'.format(url, ex))
+                continue
+
+            if resp.status >= 500 and not last_attempt:
+                print('retrying {} after HTTP {}'.format(url, resp.status))
+                continue
+            return resp
+
+    async def _fetch_once(self, url, method, data, headers, max_bytes):
+        async with self._get_session().request(method, url, data=data, headers=headers) as resp:
+            content_length = resp.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise ResponseTooLarge('{} is {} bytes'.format(url, content_length))
+
+            chunks = []
+            total = 0
+            while True:
+                chunk = await resp.content.read(64 * 1024)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise ResponseTooLarge('{} is over {} bytes'.format(url, max_bytes))
+                chunks.append(chunk)
+
+            return HttpResponse(resp.status, resp.headers, b''.join(chunks))
+
+    def stats(self):
+        msg = 'requests: {}\ncoalesced: {}\nretries: {}\nfailures: {}\nin flight: {}'.format(
+            self.request_count, self.coalesced_count, self.retry_count, self.failure_count,
+            len(self.key_to_inflight))
+        for host, semaphore in sorted(self.host_to_semaphore.items()):
+            busy = self.per_host_limit - semaphore._value
+            if busy:
+                msg += '\n  {}: {} active'.format(host, busy)
+        return msg
+
+    def close(self):
+        if self.session is not None:
+            result = self.session.close()
+            # close() became a coroutine in later aiohttp versions
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result)
+            self.session = None
+
+
+_http_client = None
+
+
+def get_http_client():
+    """Get the shared HttpClient, creating it if necessary."""
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClient()
+    return _http_client
+
+
+def shutdown_http_client():
+    global _http_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
+
+# Upper bounds of the SQL latency histogram buckets in ms; slower statements land in an overflow bucket
+SQL_LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+SLOW_QUERY_SECS = 0.5
+SLOW_QUERY_LOG_SIZE = 50
+# Distinct statements tracked per SqlStats; beyond this, new ones (usually ad-hoc queries) share one entry
+SQL_STATEMENT_LIMIT = 200
+OTHER_STATEMENT = '(other statements)'
+
+SQL_INDEX_REGEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+
+
+class LatencyHistogram(object):
+    def __init__(self):
+        self.counts = [0] * (len(SQL_LATENCY_BUCKETS_MS) + 1)
+        self.total_count = 0
+        self.total_secs = 0
+        self.max_secs = 0
+
+    def add(self, elapsed_secs):
+        elapsed_ms = elapsed_secs * 1000
+        bucket = len(SQL_LATENCY_BUCKETS_MS)
+        for idx, bound in enumerate(SQL_LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = idx
+                break
+        self.counts[bucket] += 1
+        self.total_count += 1
+        self.total_secs += elapsed_secs
+        self.max_secs = max(self.max_secs, elapsed_secs)
+
+    def percentile(self, fraction):
+        """Upper bound in ms of the bucket holding the given fraction of calls, capped at the max seen."""
+        target = fraction * self.total_count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                break
+        if idx < len(SQL_LATENCY_BUCKETS_MS):
+            return '{}'.format(min(SQL_LATENCY_BUCKETS_MS[idx], round(self.max_secs * 1000, 1)))
+        return '>{}'.format(SQL_LATENCY_BUCKETS_MS[-1])
+
+
+class SqlStats(object):
+    """Per-statement latency histograms, query plans and a slow-query log for one SQLite database.
+
+    Statements are keyed by their whitespace-normalized text. The EXPLAIN QUERY PLAN
+    of each distinct statement is captured the first time it runs, and kept with any
+    slow-query log entries for it. The index usage report matches those plans against
+    the database's indexes, weighted by call counts. Once SQL_STATEMENT_LIMIT statements
+    are tracked, any new one is counted under OTHER_STATEMENT, without a plan.
+
+    Works with sqlite3 connections (execute/executemany, from any thread) and with
+    DB-API style async cursors such as aioodbc's (execute_async).
+    """
+
+    def __init__(self, slow_query_secs=SLOW_QUERY_SECS):
+        self.slow_query_secs = slow_query_secs
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+        self.sql_to_statement = {}
+        self.statement_to_histogram = {}
+        self.statement_to_plan = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    def statement(self, sql):
+        with self.lock:
+            statement = self.sql_to_statement.get(sql)
+            if statement is None:
+                statement = ' '.join(sql.split())
+                if statement not in self.statement_to_histogram and \
+                        len(self.statement_to_histogram) >= SQL_STATEMENT_LIMIT:
+                    # Not cached either, so a stream of distinct statements can't grow the cache
+                    return OTHER_STATEMENT
+                if len(self.sql_to_statement) < SQL_STATEMENT_LIMIT:
+                    self.sql_to_statement[sql] = statement
+                # Claims a slot, so the limit holds even before the first call is recorded
+                self.statement_to_histogram.setdefault(statement, LatencyHistogram())
+            return statement
+
+    def needs_plan(self, sql):
+        statement = self.statement(sql)
+        with self.lock:
+            return statement != OTHER_STATEMENT and statement not in self.statement_to_plan
+
+    def set_plan(self, sql, plan_rows):
+        """plan_rows are EXPLAIN QUERY PLAN rows; only the detail column is kept."""
+        self._set_plan_details(sql, [row[-1] for row in plan_rows])
+
+    def _set_plan_details(self, sql, details):
+        statement = self.statement(sql)
+        if statement == OTHER_STATEMENT:
+            return
+        with self.lock:
+            self.statement_to_plan[statement] = details
+
+    def capture_plan(self, con, sql, values=()):
+        """Runs EXPLAIN QUERY PLAN on a sqlite3 connection if this statement has no plan yet."""
+        if not self.needs_plan(sql):
+            return
+        try:
+            self.set_plan(sql, con.execute('EXPLAIN QUERY PLAN ' + sql, values).fetchall())
+        except Exception as ex:
+            self._set_plan_details(sql, ['no plan: {}'.format(ex)])
+
+    def record(self, sql, elapsed_secs):
+        statement = self.statement(sql)
+        with self.lock:
+            histogram = self.statement_to_histogram.get(statement)
+            if histogram is None:
+                # Only OTHER_STATEMENT; statement() registers the rest
+                histogram = LatencyHistogram()
+                self.statement_to_histogram[statement] = histogram
+            histogram.add(elapsed_secs)
+            if elapsed_secs >= self.slow_query_secs:
+                self.slow_queries.append((time.time(), elapsed_secs, statement))
+
+    def execute(self, con, sql, values=()):
+        self.capture_plan(con, sql, values)
+        before_time = timeit.default_timer()
+        try:
+            return con.execute(sql, values)
+        finally:
+            self.record(sql, timeit.default_timer() - before_time)
+
+    def executemany(self, con, sql, seq_of_values):
+        # Materialized so the first row can be used for the plan
+        seq_of_values = list(seq_of_values)
+        if seq_of_values:
+            self.capture_plan(con, sql, seq_of_values[0])
+        before_time = timeit.default_timer()
+        try:
+            return con.executemany(sql, seq_of_values)
+        finally:
+            self.record(sql, timeit.default_timer() - before_time)
+
+    async def execute_async(self, cur, sql, *params):
+        """await cur.execute(sql, *params), recorded; the plan is fetched through the same cursor first."""
+        if self.needs_plan(sql):
+            try:
+                await cur.execute('EXPLAIN QUERY PLAN ' + sql, *params)
+                self.set_plan(sql, await cur.fetchall())
+            except Exception as ex:
+                self._set_plan_details(sql, ['no plan: {}'.format(ex)])
+        before_time = timeit.default_timer()
+        try:
+            return await cur.execute(sql, *params)
+        finally:
+            self.record(sql, timeit.default_timer() - before_time)
+
+    def histogram_report(self):
+        with self.lock:
+            items = sorted([i for i in self.statement_to_histogram.items() if i[1].total_count],
+                           key=lambda i: i[1].total_secs, reverse=True)
+            lines = ['{:.0f}s since load; latency in ms'.format(time.time() - self.started),
+                     '{:>7} {:>6} {:>6} {:>6} {:>8} {:>8}  statement'.format(
+                         'calls', 'p50', 'p95', 'p99', 'max', 'total')]
+            for statement, histogram in items:
+                lines.append('{:>7} {:>6} {:>6} {:>6} {:>8} {:>8}  {}'.format(
+                    histogram.total_count, histogram.percentile(.5), histogram.percentile(.95),
+                    histogram.percentile(.99), round(histogram.max_secs * 1000, 1),
+                    round(histogram.total_secs * 1000), statement[:80]))
+        return '\n'.join(lines)
+
+    def slow_query_report(self):
+        with self.lock:
+            slow_queries = list(self.slow_queries)
+            statement_to_plan = dict(self.statement_to_plan)
+        if not slow_queries:
+            return 'No statements over {}s since load'.format(self.slow_query_secs)
+
+        msg = ''
+        for timestamp, elapsed_secs, statement in reversed(slow_queries):
+            msg += '{} {}s\n{}\n'.format(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)),
+                                          round(elapsed_secs, 3), statement)
+            for detail in statement_to_plan.get(statement, []):
+                msg += '  ' + detail + '\n'
+            msg += '\n'
+        return msg
+
+    def index_usage_report(self, index_names):
+        """Which of index_names the plans of statements run since load use, and how often."""
+        with self.lock:
+            statement_to_calls = {s: h.total_count for s, h in self.statement_to_histogram.items()}
+            plans = list(self.statement_to_plan.items())
+
+        index_to_usage = {name: [0, 0] for name in index_names}
+        for statement, plan in plans:
+            used = set(m.group(1) for detail in plan for m in SQL_INDEX_REGEX.finditer(detail))
+            for name in used:
+                if name in index_to_usage:
+                    index_to_usage[name][0] += 1
+                    index_to_usage[name][1] += statement_to_calls.get(statement, 0)
+
+        lines = ['{} statements seen in {:.0f}s since load'.format(len(plans), time.time() - self.started)]
+        for name, (statement_count, call_count) in sorted(index_to_usage.items(), key=lambda i: i[1][1]):
+            if statement_count:
+                lines.append('{}: {} statements, {} calls'.format(name, statement_count, call_count))
+            else:
+                lines.append('{}: unused'.format(name))
+        return '\n'.join(lines)
+
+
 async def boxPagifySay(say_fn, msg):
     for page in pagify(msg, delims=["\n"]):
         await say_fn(box(page))
@@ -226,6 +779,21 @@ class Forbidden():
     pass
 
 
+class LazyMenuContent(object):
+    """Wraps a zero-arg function which produces menu content on demand.
+
+    Use this as a value in a custom_menu emoji_to_message map when the content
+    is expensive to build or depends on state (e.g. paging). The function is
+    called every time the emoji is selected.
+    """
+
+    def __init__(self, content_fn):
+        self.content_fn = content_fn
+
+    def render(self):
+        return self.content_fn()
+
+
 def default_check(reaction, user):
     if user.bot:
         return False
@@ -315,6 +883,8 @@ class Menu():
 
         reactions_required = not message
         new_message_content = emoji_to_message[selected_emoji]
+        if isinstance(new_message_content, LazyMenuContent):
+            new_message_content = new_message_content.render()
         message = await self.show_menu(ctx, message, new_message_content)
 
         if reactions_required:
@@ -325,44 +895,205 @@ class Menu():
                     # failed to add reaction, ignore
                     pass
 
-        r = await self.bot.wait_for_reaction(
-            emoji=list(emoji_to_message.keys()),
-            message=message,
-            user=ctx.message.author,
-            check=check,
-            timeout=timeout)
+        state = MenuState(self, ctx, message, new_message_content,
+                          emoji_to_message, check, timeout)
+        get_menu_dispatcher(self.bot).open_menu(state)
+        return await state.result
 
-        if r is None:
-            try:
-                await self.bot.clear_reactions(message)
-            except Exception as e:
-                # This is expected when miru doesn't have manage messages
-                pass
-            return message, new_message_content
+    async def _handle_reaction(self, state, reaction, user):
+        """Called by the MenuDispatcher when a valid reaction arrives for an open menu.
 
-        react_emoji = r.reaction.emoji
-        react_action = emoji_to_message[r.reaction.emoji]
+        Returns True if the menu should stay open.
+        """
+        react_emoji = reaction.emoji
+        react_action = state.emoji_to_message[react_emoji]
+        message = state.message
 
         if inspect.iscoroutinefunction(react_action):
-            message = await react_action(self.bot, ctx, message)
+            message = await react_action(self.bot, state.ctx, message)
         elif inspect.isfunction(react_action):
-            message = react_action(ctx, message)
+            message = react_action(state.ctx, message)
+        else:
+            new_message_content = react_action
+            if isinstance(new_message_content, LazyMenuContent):
+                new_message_content = new_message_content.render()
+            message = await self.show_menu(state.ctx, message, new_message_content)
+            state.content = new_message_content
 
         # user function killed message, quit
         if not message:
-            return None, None
+            state.finish(None, None)
+            return False
 
+        state.message = message
         try:
-            await self.bot.remove_reaction(message, react_emoji, r.user)
+            await self.bot.remove_reaction(message, react_emoji, user)
         except:
             # This is expected when miru doesn't have manage messages
             pass
+        return True
+
 
-        return await self._custom_menu(
-            ctx, emoji_to_message, react_emoji,
-            timeout=timeout,
-            check=check,
-            message=message)
+class MenuState(object):
+    """State for a single open menu, tracked by the MenuDispatcher."""
+
+    def __init__(self, menu, ctx, message, content, emoji_to_message, check, timeout):
+        self.menu = menu
+        self.ctx = ctx
+        self.message = message
+        self.content = content
+        self.emoji_to_message = emoji_to_message
+        self.check = check
+        self.timeout = timeout
+        self.expires_at = None
+        self.busy = False
+        # Latest (reaction, user) that arrived while busy; applied when the current one finishes
+        self.pending = None
+
+        # Resolves to (message, content) when the menu closes
+        self.result = asyncio.Future(loop=menu.bot.loop)
+
+    def accepts(self, reaction, user):
+        if user.id != self.ctx.message.author.id:
+            return False
+        if reaction.emoji not in self.emoji_to_message:
+            return False
+        return self.check(reaction, user)
+
+    def finish(self, message, content):
+        if not self.result.done():
+            self.result.set_result((message, content))
+
+
+class MenuDispatcher(object):
+    """Routes reaction events to every open Menu from a single listener.
+
+    Open menus are kept in a dict keyed by message id, so idle menus cost
+    nothing per event. Timeouts live in a heap serviced by one task; entries
+    are invalidated lazily when a menu is refreshed or closed.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.closed = False
+        self.message_id_to_state = {}
+        self.expiry_heap = []  # (expires_at, sequence, message_id)
+        self.expiry_sequence = 0
+        self.wakeup = asyncio.Event(loop=bot.loop)
+
+        bot.add_listener(self.on_reaction_add, 'on_reaction_add')
+        self.expiry_task = bot.loop.create_task(self.expire_menus_task())
+
+    def shutdown(self):
+        """Closes every open menu and detaches from the bot."""
+        self.closed = True
+        self.bot.remove_listener(self.on_reaction_add, 'on_reaction_add')
+        self.expiry_task.cancel()
+        for state in self.message_id_to_state.values():
+            state.finish(state.message, state.content)
+        self.message_id_to_state.clear()
+        self.expiry_heap.clear()
+
+    def open_count(self):
+        return len(self.message_id_to_state)
+
+    def open_menu(self, state: MenuState):
+        self.message_id_to_state[state.message.id] = state
+        self._schedule_expiry(state)
+
+    def _schedule_expiry(self, state: MenuState):
+        state.expires_at = self.bot.loop.time() + state.timeout
+        self.expiry_sequence += 1
+        heapq.heappush(self.expiry_heap,
+                       (state.expires_at, self.expiry_sequence, state.message.id))
+        self.wakeup.set()
+
+    async def on_reaction_add(self, reaction, user):
+        state = self.message_id_to_state.get(reaction.message.id)
+        if state is None or not state.accepts(reaction, user):
+            return
+        if state.busy:
+            # Intermediate pages would be overwritten anyway, so only the latest reaction is kept
+            state.pending = (reaction, user)
+            return
+
+        state.busy = True
+        try:
+            while reaction is not None:
+                message_id = state.message.id
+                try:
+                    keep_open = await state.menu._handle_reaction(state, reaction, user)
+                except Exception as ex:
+                    print('Menu failure', ex)
+                    keep_open = False
+                    state.finish(state.message, state.content)
+
+                if not keep_open:
+                    self.message_id_to_state.pop(message_id, None)
+                    return
+
+                if state.message.id != message_id:
+                    # The action replaced the message; route reactions on the new one
+                    self.message_id_to_state.pop(message_id, None)
+                    self.message_id_to_state[state.message.id] = state
+                self._schedule_expiry(state)
+
+                reaction, user = state.pending or (None, None)
+                state.pending = None
+        finally:
+            state.busy = False
+
+    async def expire_menus_task(self):
+        while not self.closed:
+            timeout = None
+            if self.expiry_heap:
+                timeout = max(0, self.expiry_heap[0][0] - self.bot.loop.time())
+
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout, loop=self.bot.loop)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self._expire_menus()
+            except Exception as ex:
+                print('Menu expiry failure', ex)
+
+    async def _expire_menus(self):
+        now = self.bot.loop.time()
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            _, _, message_id = heapq.heappop(self.expiry_heap)
+            state = self.message_id_to_state.get(message_id)
+            if state is None or state.busy or state.expires_at > now:
+                # Stale entry; the menu closed or was refreshed
+                continue
+
+            self.message_id_to_state.pop(message_id)
+            try:
+                await self.bot.clear_reactions(state.message)
+            except Exception as e:
+                # This is expected when miru doesn't have manage messages
+                pass
+            state.finish(state.message, state.content)
+
+
+_menu_dispatcher = None
+
+
+def get_menu_dispatcher(bot):
+    """Get the shared MenuDispatcher, creating it if necessary."""
+    global _menu_dispatcher
+    if _menu_dispatcher is None or _menu_dispatcher.closed or _menu_dispatcher.bot != bot:
+        _menu_dispatcher = MenuDispatcher(bot)
+    return _menu_dispatcher
+
+
+def shutdown_menu_dispatcher():
+    global _menu_dispatcher
+    if _menu_dispatcher is not None:
+        _menu_dispatcher.shutdown()
+        _menu_dispatcher = None
 
 
 def char_to_emoji(c):
@@ -517,6 +1248,131 @@ def clean_global_mentions(content):
     return re.sub(r'(@)(\w)', '\\g<1>\u200b\\g<2>', content)
 
 
+class GenerationTracker(object):
+    """Tags generations of long-lived cog data with weak references.
+
+    Cogs register each database/index they build, and each cog instance, along with
+    how many generations of that label they expect to keep alive. Anything older
+    that is still reachable after a collection is a leak, usually across a reload.
+    """
+
+    def __init__(self):
+        # label -> number of newest generations expected to be alive
+        self.label_to_expected = {}
+        # label -> list of (generation number, created time, weakref)
+        self.label_to_generations = defaultdict(list)
+        self.generation_counter = 0
+        # Called after a check thawed a frozen heap, so whoever froze it can do so again
+        self.refreeze_callbacks = []
+
+    def track(self, label: str, obj, expected_alive: int=1):
+        self.generation_counter += 1
+        self.label_to_expected[label] = expected_alive
+        generations = self.label_to_generations[label]
+        generations.append((self.generation_counter, time.time(), weakref.ref(obj)))
+        # Forget generations that have already been freed
+        self.label_to_generations[label] = [g for g in generations if g[2]() is not None]
+
+    def leaked(self):
+        """Returns list of (label, generation number, created time, weakref) that outlived their expected lifetime."""
+        was_frozen = self._thaw()
+        try:
+            return self._leaked()
+        finally:
+            if was_frozen:
+                self._refreeze()
+
+    def _leaked(self):
+        gc.collect()
+        # The collection can run a callback that applies a pending freeze
+        self._thaw()
+        results = []
+        for label, generations in self.label_to_generations.items():
+            generations[:] = [g for g in generations if g[2]() is not None]
+            stale = generations[:-self.label_to_expected[label]] if self.label_to_expected[label] else generations
+            results.extend((label, number, created, ref) for number, created, ref in stale)
+        return results
+
+    def _thaw(self):
+        """Unfreezes the heap; frozen objects are never collected and never show up as referrers."""
+        if not hasattr(gc, 'get_freeze_count') or not gc.get_freeze_count():
+            return False
+        gc.unfreeze()
+        return True
+
+    def _refreeze(self):
+        for callback in self.refreeze_callbacks:
+            callback()
+
+    def report(self):
+        was_frozen = self._thaw()
+        try:
+            # Collects and prunes freed generations first, so the counts agree with the leaks
+            leaked = self._leaked()
+            msg = 'Live generations:\n'
+            for label, generations in sorted(self.label_to_generations.items()):
+                msg += '  {}: {} alive (expected {})\n'.format(
+                    label, len(generations), self.label_to_expected[label])
+
+            if was_frozen:
+                msg += '\nHeap was frozen; unfrozen for this check\n'
+            if not leaked:
+                msg += '\nNo leaked generations\n'
+            for label, number, created, ref in leaked:
+                msg += '\nLeaked {} #{}, {:.0f}s old, retained by:\n'.format(
+                    label, number, time.time() - created)
+                for description in describe_referrers(ref()):
+                    msg += '  {}\n'.format(description)
+        finally:
+            if was_frozen:
+                self._refreeze()
+
+        if tracemalloc.is_tracing():
+            msg += '\nTop allocations:\n'
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:10]:
+                msg += '  {}\n'.format(stat)
+        return msg
+
+
+def describe_referrers(obj, limit=10):
+    """Describes what holds references to obj, e.g. 'PadInfo.index_all'."""
+    this_frame = sys._getframe()
+    referrers = gc.get_referrers(obj)
+
+    results = []
+    for referrer in referrers:
+        if referrer is this_frame or inspect.isframe(referrer):
+            continue
+        if isinstance(referrer, dict):
+            owner = None
+            for o in gc.get_referrers(referrer):
+                if getattr(o, '__dict__', None) is referrer:
+                    owner = o
+                    break
+            if owner is not None:
+                results.append('{}.{}'.format(type(owner).__name__, keys_referring_to(referrer, obj)))
+            else:
+                results.append('dict key {}'.format(keys_referring_to(referrer, obj)))
+        elif isinstance(referrer, (list, tuple, set)):
+            results.append('{} of {} items'.format(type(referrer).__name__, len(referrer)))
+        elif hasattr(referrer, '__dict__'):
+            results.append('{}.{}'.format(type(referrer).__name__, keys_referring_to(vars(referrer), obj)))
+        else:
+            results.append(type(referrer).__name__)
+        if len(results) >= limit:
+            break
+    del referrers, this_frame
+    return results
+
+
+def keys_referring_to(mapping, obj):
+    # Not a closure; a cell holding obj would show up as a referrer
+    return ', '.join(str(k) for k, v in mapping.items() if v is obj)
+
+
+generation_tracker = GenerationTracker()
+
+
 class CogSettings:
     BASE_DATA_PATH = "data"
     SETTINGS_FILE_NAME = "settings.json"
@@ -4,7 +4,6 @@ import json
 import os
 from time import time
 
-import aiohttp
 import discord
 from discord.ext import commands
 
@@ -13,7 +12,7 @@ from cogs.utils import checks
 from cogs.utils.chat_formatting import pagify, box
 from cogs.utils.dataIO import dataIO
 
-from .rpadutils import Menu, char_to_emoji
+from .rpadutils import Menu, char_to_emoji, get_http_client
 from .utils.chat_formatting import *
 
 
@@ -34,14 +33,12 @@ class SchoolIdol:
         await self.bot.wait_until_ready()
 
         next_req = FIRST_REQ
-        async with aiohttp.ClientSession() as session:
-            while next_req:
-                print(next_req)
-                async with session.get(next_req) as resp:
-                    raw_resp = await resp.text()
-                    js_resp = json.loads(raw_resp)
-                    next_req = js_resp['next']
-                    self.card_data.extend(js_resp['results'])
+        while next_req:
+            print(next_req)
+            raw_resp = await get_http_client().get_text(next_req)
+            js_resp = json.loads(raw_resp)
+            next_req = js_resp['next']
+            self.card_data.extend(js_resp['results'])
         print('done retrieving cards: {}'.format(len(self.card_data)))
 
         self.id_to_card = {c['id']: c for c in self.card_data}
@@ -108,6 +108,12 @@ WHERE record_date = ?
   AND server_id = ?
 '''
 
+# Secondary indexes, for the index usage report
+INDEX_NAMES_QUERY = '''
+SELECT name FROM sqlite_master
+WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex%'
+'''
+
 
 class Seniority(object):
     """Automatically promote people based on activity."""
@@ -118,6 +124,7 @@ class Seniority(object):
         self.db_path = self.settings.folder + '/log.db'
         self.lock = True
         self.insert_timing = deque(maxlen=1000)
+        self.sql_stats = rpadutils.SqlStats()
         print('Seniority: init complete')
 
     def __unload(self):
@@ -169,7 +176,7 @@ class Seniority(object):
         await self.bot.say(inline('Deleting any existing points on ' + now_date_str))
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(DELETE_DAY_QUERY, now_date_str, server.id)
+                await self.sql_stats.execute_async(cur, DELETE_DAY_QUERY, now_date_str, server.id)
         await self.bot.say(inline('Done deleting existing points'))
 
         for channel_id in self.settings.channels(server.id).keys():
@@ -203,6 +210,31 @@ class Seniority(object):
         min_time = round(min(self.insert_timing), 4)
         await self.bot.say(inline('{} inserts, min={} max={} avg={}'.format(size, min_time, max_time, avg_time)))
 
+    @seniority.command(pass_context=True)
+    @checks.is_owner()
+    async def sqlstats(self, ctx):
+        """Print per-statement latency percentiles for the seniority database."""
+        for page in pagify(self.sql_stats.histogram_report()):
+            await self.bot.say(box(page))
+
+    @seniority.command(pass_context=True)
+    @checks.is_owner()
+    async def slowqueries(self, ctx):
+        """Print recent statements slower than rpadutils.SLOW_QUERY_SECS, with their query plans."""
+        for page in pagify(self.sql_stats.slow_query_report()):
+            await self.bot.say(box(page))
+
+    @seniority.command(pass_context=True)
+    @checks.is_owner()
+    async def indexusage(self, ctx):
+        """Print which indexes the statements run since load actually use."""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(INDEX_NAMES_QUERY)
+                index_names = [r[0] for r in await cur.fetchall()]
+        for page in pagify(self.sql_stats.index_usage_report(index_names)):
+            await self.bot.say(box(page))
+
     @seniority.command(pass_context=True)
     @checks.is_owner()
     async def togglelock(self, ctx):
@@ -415,7 +447,7 @@ class Seniority(object):
 
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(GET_LOOKBACK_POINTS_QUERY, server.id, lookback_date_str)
+                await self.sql_stats.execute_async(cur, GET_LOOKBACK_POINTS_QUERY, server.id, lookback_date_str)
                 rows = await cur.fetchall()
         return rows
 
@@ -730,27 +762,27 @@ class Seniority(object):
     async def get_current_channel_points(self, now_date_str: str, server: discord.Server, channel: discord.Channel, user: discord.User):
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(GET_NEWMESSAGE_POINTS_QUERY, now_date_str, server.id, channel.id, user.id)
+                await self.sql_stats.execute_async(cur, GET_NEWMESSAGE_POINTS_QUERY, now_date_str, server.id, channel.id, user.id)
                 results = await cur.fetchone()
                 return results.points if results else 0
 
     async def get_current_server_points(self, now_date_str: str, server: discord.Server, user: discord.User):
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(GET_NEWMESSAGE_SERVER_POINTS_QUERY, now_date_str, server.id, user.id)
+                await self.sql_stats.execute_async(cur, GET_NEWMESSAGE_SERVER_POINTS_QUERY, now_date_str, server.id, user.id)
                 results = await cur.fetchone()
                 return results.points if results else 0
 
     async def save_current_points(self, now_date_str: str, server: discord.Server, channel: discord.Channel, user: discord.User, new_points: int):
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(REPLACE_POINTS_QUERY, now_date_str, server.id, channel.id, user.id, new_points)
+                await self.sql_stats.execute_async(cur, REPLACE_POINTS_QUERY, now_date_str, server.id, channel.id, user.id, new_points)
 
     async def queryAndPrint(self, server, query, values, max_rows=100, reverse=False, total=False):
         before_time = timeit.default_timer()
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(query, *values)
+                await self.sql_stats.execute_async(cur, query, *values)
                 rows = await cur.fetchall()
                 columns = [x[0] for x in cur.description]
         execution_time = timeit.default_timer() - before_time
@@ -1,7 +1,18 @@
+import asyncio
+from collections import defaultdict
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import csv
 from datetime import datetime, timedelta
+import gzip
+import io
+import json
 import os
+import queue
+import re
+import tempfile
 import textwrap
+import threading
 import timeit
 
 import discord
@@ -24,6 +35,19 @@ PATH_LIST = ['data', 'sqlactivitylog']
 PATH = os.path.join(*PATH_LIST)
 JSON = os.path.join(*PATH_LIST, "settings.json")
 DB = os.path.join(*PATH_LIST, "log.db")
+ARCHIVE_PATH = os.path.join(*PATH_LIST, "archive")
+ARCHIVE_FILE_PATTERN = os.path.join(ARCHIVE_PATH, "messages-{}.jsonl.gz")
+
+# PRAGMA user_version of the compact schema; 0 is the original all-STRING schema
+SCHEMA_VERSION = 1
+
+# msg_type is stored as a small integer
+MSG_TYPES = {
+    'NEW': 1,
+    'EDIT': 2,
+    'DELETE': 3,
+}
+MSG_TYPE_NAMES = {v: k for k, v in MSG_TYPES.items()}
 
 ALL_COLUMNS = [
     ('timestamp', 'Time (PT)'),
@@ -34,16 +58,30 @@ ALL_COLUMNS = [
     ('clean_content', 'Message'),
 ]
 
+# clean_content is NULL when it is the same as content; read coalesce(clean_content, content)
 CREATE_TABLE = '''
 CREATE TABLE IF NOT EXISTS messages(
   rowid INTEGER PRIMARY KEY ASC AUTOINCREMENT,
   timestamp TIMESTAMP NOT NULL,
-  server_id STRING NOT NULL,
-  channel_id STRING NOT NULL,
-  user_id STRING NOT NULL,
-  msg_type STRING NOT NULL,
-  content STRING NOT NULL,
-  clean_content STRING NOT NULL)
+  server_id INTEGER NOT NULL,
+  channel_id INTEGER NOT NULL,
+  user_id INTEGER NOT NULL,
+  msg_type INTEGER NOT NULL,
+  content TEXT NOT NULL,
+  clean_content TEXT)
+'''
+
+# Attachment and embed reprs, for the few messages that have any; keyed by messages.rowid
+CREATE_EXTRAS_TABLE = '''
+CREATE TABLE IF NOT EXISTS message_extras(
+  rowid INTEGER PRIMARY KEY,
+  attachments TEXT,
+  embeds TEXT)
+'''
+
+INSERT_EXTRAS = '''
+INSERT INTO message_extras(rowid, attachments, embeds)
+VALUES(:rowid, :attachments, :embeds)
 '''
 
 CREATE_INDEX_1 = '''
@@ -56,11 +94,49 @@ CREATE INDEX IF NOT EXISTS idx_messages_server_id_user_id_timestamp
 ON messages(server_id, user_id, timestamp)
 '''
 
-CREATE_INDEX_3 = '''
-CREATE INDEX IF NOT EXISTS idx_messages_server_id_clean_content
-ON messages(server_id, clean_content)
+# Content searches go through messages_fts; this index never served them
+DROP_INDEX_3 = '''
+DROP INDEX IF EXISTS idx_messages_server_id_clean_content
+'''
+
+# Moves an original-schema table aside so the compact one can take its name; MessageWriter
+# then copies it over a chunk at a time, newest first. New rows get rowids above every
+# legacy row, so copied rows keep their rowids. The FTS content view goes too; the rename
+# would otherwise repoint it at messages_legacy.
+START_COMPACT_MIGRATION = '''
+BEGIN;
+DROP TABLE IF EXISTS messages_fts;
+DROP VIEW IF EXISTS messages_fts_content;
+DROP TABLE IF EXISTS fts_backfill;
+DROP INDEX IF EXISTS idx_messages_server_id_channel_id_user_id_timestamp;
+DROP INDEX IF EXISTS idx_messages_server_id_user_id_timestamp;
+DROP INDEX IF EXISTS idx_messages_server_id_clean_content;
+DROP INDEX IF EXISTS idx_messages_server_id_timestamp;
+DROP INDEX IF EXISTS idx_messages_server_id_channel_id_timestamp;
+ALTER TABLE messages RENAME TO messages_legacy;
+''' + CREATE_TABLE + ''';
+INSERT INTO sqlite_sequence(name, seq)
+SELECT 'messages', coalesce(max(rowid), 0) FROM messages_legacy;
+PRAGMA user_version = 1;
+COMMIT;
 '''
 
+LEGACY_CHUNK_QUERY = '''
+SELECT rowid, timestamp, server_id, channel_id, user_id, msg_type, content, clean_content
+FROM messages_legacy
+ORDER BY rowid DESC
+LIMIT :row_count
+'''
+
+LEGACY_DELETE = 'DELETE FROM messages_legacy WHERE rowid >= :start_rowid'
+
+INSERT_LEGACY_MESSAGE = '''
+INSERT INTO messages(rowid, timestamp, server_id, channel_id, user_id, msg_type, content, clean_content)
+VALUES(:rowid, :timestamp, :server_id, :channel_id, :user_id, :msg_type, :content, :clean_content)
+'''
+
+LEGACY_CHUNK_ROWS = 5000
+
 CREATE_INDEX_4 = '''
 CREATE INDEX IF NOT EXISTS idx_messages_server_id_timestamp
 ON messages(server_id, timestamp)
@@ -71,15 +147,119 @@ CREATE INDEX IF NOT EXISTS idx_messages_server_id_channel_id_timestamp
 ON messages(server_id, channel_id, timestamp)
 '''
 
+# External content FTS5 index over the effective clean_content, keyed by messages.rowid
+CREATE_FTS_CONTENT_VIEW = '''
+CREATE VIEW IF NOT EXISTS messages_fts_content AS
+SELECT rowid, coalesce(clean_content, content) AS clean_content
+FROM messages
+'''
+
+CREATE_FTS_TABLE = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+USING fts5(clean_content, content='messages_fts_content', content_rowid='rowid')
+'''
+
+# Rows that existed before messages_fts was created; indexed in chunks by the writer
+CREATE_FTS_BACKFILL_TABLE = '''
+CREATE TABLE IF NOT EXISTS fts_backfill(
+  next_rowid INTEGER NOT NULL,
+  end_rowid INTEGER NOT NULL)
+'''
+
+FTS_INDEX_ROWS = '''
+INSERT INTO messages_fts(rowid, clean_content)
+SELECT rowid, coalesce(clean_content, content)
+FROM messages
+WHERE rowid > :start_rowid
+  AND rowid <= :end_rowid
+'''
+
+FTS_BACKFILL_CHUNK = 5000
+
+MAX_ROWID_QUERY = 'SELECT coalesce(max(rowid), 0) FROM messages'
+
+# Secondary indexes, for the index usage report
+INDEX_NAMES_QUERY = '''
+SELECT name FROM sqlite_master
+WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex%'
+'''
+
+# Months are archived oldest first; timestamps are stored as UTC ISO text so string bounds work
+OLDEST_TIMESTAMP_QUERY = 'SELECT min(timestamp) FROM messages'
+
+ARCHIVE_MONTH_QUERY = '''
+SELECT m.rowid, m.timestamp, m.server_id, m.channel_id, m.user_id, m.msg_type,
+       m.content, coalesce(m.clean_content, m.content), e.attachments, e.embeds
+FROM messages m
+LEFT JOIN message_extras e ON e.rowid = m.rowid
+WHERE m.timestamp >= :start_timestamp
+  AND m.timestamp < :end_timestamp
+ORDER BY m.rowid
+'''
+
+ARCHIVE_FTS_DELETE = '''
+INSERT INTO messages_fts(messages_fts, rowid, clean_content)
+SELECT 'delete', rowid, coalesce(clean_content, content)
+FROM messages
+WHERE timestamp >= :start_timestamp
+  AND timestamp < :end_timestamp
+'''
+
+ARCHIVE_EXTRAS_DELETE = '''
+DELETE FROM message_extras
+WHERE rowid IN (
+    SELECT rowid FROM messages
+    WHERE timestamp >= :start_timestamp
+      AND timestamp < :end_timestamp)
+'''
+
+ARCHIVE_DELETE = '''
+DELETE FROM messages
+WHERE timestamp >= :start_timestamp
+  AND timestamp < :end_timestamp
+'''
+
+# Default retention; 0 disables archiving / deleting archives
+DEFAULT_HOT_MONTHS = 0
+DEFAULT_RETENTION_MONTHS = 0
+
+INSERT_MESSAGE = '''
+INSERT INTO messages(timestamp, server_id, channel_id, user_id, msg_type, content, clean_content)
+VALUES(:timestamp, :server_id, :channel_id, :user_id, :msg_type, :content, :clean_content)
+'''
+
 MAX_LOGS = 500
 
+# Read-only connections used for exlog and rawquery, each on its own worker thread
+READ_POOL_SIZE = 3
+READ_QUERY_TIMEOUT_SECS = 30
+RAW_QUERY_TIMEOUT_SECS = 120
+# Rows rendered per message while streaming results
+STREAM_CHUNK_ROWS = 25
+
+# exlog export walks the cursor this many rows at a time, so memory stays flat however long the history is
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_QUERY_TIMEOUT_SECS = 600
+# Discord's attachment limit
+EXPORT_MAX_BYTES = 8 * 1024 * 1024
+EXPORT_FORMATS = ['csv', 'jsonl']
+
+# Write-behind tuning; a batch commits when it reaches this many rows or is this old
+WRITE_BATCH_SIZE = 500
+WRITE_BATCH_MAX_AGE_SECS = 0.25
+# Past this many pending rows, new messages are dropped instead of growing memory unbounded
+WRITE_QUEUE_MAX_SIZE = 100000
+
+# Listings also return the attachment/embed reprs, which _format_row shows after the message
 USER_QUERY = '''
 SELECT * FROM (
-    SELECT timestamp, channel_id, msg_type, clean_content
-    FROM messages INDEXED BY idx_messages_server_id_user_id_timestamp
-    WHERE server_id = :server_id
-      AND user_id = :user_id
-    ORDER BY timestamp DESC
+    SELECT m.timestamp, m.channel_id, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+           e.attachments, e.embeds
+    FROM messages m INDEXED BY idx_messages_server_id_user_id_timestamp
+    LEFT JOIN message_extras e ON e.rowid = m.rowid
+    WHERE m.server_id = :server_id
+      AND m.user_id = :user_id
+    ORDER BY m.timestamp DESC
     LIMIT :row_count
 )
 ORDER BY timestamp ASC
@@ -87,12 +267,14 @@ ORDER BY timestamp ASC
 
 CHANNEL_QUERY = '''
 SELECT * FROM (
-    SELECT timestamp, user_id, msg_type, clean_content
-    FROM messages INDEXED BY idx_messages_server_id_channel_id_timestamp
-    WHERE server_id = :server_id
-      AND channel_id = :channel_id
-      AND user_id <> :bot_id
-    ORDER BY timestamp DESC
+    SELECT m.timestamp, m.user_id, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+           e.attachments, e.embeds
+    FROM messages m INDEXED BY idx_messages_server_id_channel_id_timestamp
+    LEFT JOIN message_extras e ON e.rowid = m.rowid
+    WHERE m.server_id = :server_id
+      AND m.channel_id = :channel_id
+      AND m.user_id <> :bot_id
+    ORDER BY m.timestamp DESC
     LIMIT :row_count
 )
 ORDER BY timestamp ASC
@@ -100,25 +282,64 @@ ORDER BY timestamp ASC
 
 USER_CHANNEL_QUERY = '''
 SELECT * FROM (
-    SELECT timestamp, msg_type, clean_content
-    FROM messages INDEXED BY idx_messages_server_id_channel_id_user_id_timestamp
-    WHERE server_id = :server_id
-      AND user_id = :user_id
-      AND channel_id = :channel_id
-    ORDER BY timestamp DESC
+    SELECT m.timestamp, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+           e.attachments, e.embeds
+    FROM messages m INDEXED BY idx_messages_server_id_channel_id_user_id_timestamp
+    LEFT JOIN message_extras e ON e.rowid = m.rowid
+    WHERE m.server_id = :server_id
+      AND m.user_id = :user_id
+      AND m.channel_id = :channel_id
+    ORDER BY m.timestamp DESC
+    LIMIT :row_count
+)
+ORDER BY timestamp ASC
+'''
+
+# In the FTS queries, CROSS JOIN keeps the FTS match as the outer loop; otherwise the planner
+# may walk every message of the server through an index and evaluate MATCH once per row
+CONTENT_FTS_QUERY = '''
+SELECT * FROM (
+    SELECT m.timestamp, m.channel_id, m.user_id, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+           e.attachments, e.embeds
+    FROM messages_fts
+    CROSS JOIN messages m ON m.rowid = messages_fts.rowid
+    LEFT JOIN message_extras e ON e.rowid = m.rowid
+    WHERE messages_fts MATCH :fts_query
+      AND m.server_id = :server_id
+      AND m.user_id <> :bot_id
+      AND (:content_query IS NULL OR lower(coalesce(m.clean_content, m.content)) LIKE lower(:content_query))
+    ORDER BY messages_fts.rowid DESC
     LIMIT :row_count
 )
 ORDER BY timestamp ASC
 '''
 
+# msg_type 1 is NEW
+WHOSAYS_FTS_QUERY = '''
+SELECT m.user_id, count(*)
+FROM messages_fts
+CROSS JOIN messages m ON m.rowid = messages_fts.rowid
+WHERE messages_fts MATCH :fts_query
+  AND m.server_id = :server_id
+  AND m.user_id <> :bot_id
+  AND m.msg_type = 1
+  AND (:content_query IS NULL OR lower(coalesce(m.clean_content, m.content)) LIKE lower(:content_query))
+GROUP BY 1
+ORDER BY 2 DESC
+LIMIT :row_count
+'''
+
+# Fallbacks for when FTS5 is unavailable or still backfilling, and for patterns with no usable terms
 CONTENT_QUERY = '''
 SELECT * FROM (
-    SELECT timestamp, channel_id, user_id, msg_type, clean_content
-    FROM messages INDEXED BY idx_messages_server_id_clean_content
-    WHERE server_id = :server_id
-      AND lower(clean_content) LIKE lower(:content_query)
-      AND user_id <> :bot_id
-    ORDER BY timestamp DESC
+    SELECT m.timestamp, m.channel_id, m.user_id, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+           e.attachments, e.embeds
+    FROM messages m INDEXED BY idx_messages_server_id_timestamp
+    LEFT JOIN message_extras e ON e.rowid = m.rowid
+    WHERE m.server_id = :server_id
+      AND lower(coalesce(m.clean_content, m.content)) LIKE lower(:content_query)
+      AND m.user_id <> :bot_id
+    ORDER BY m.timestamp DESC
     LIMIT :row_count
 )
 ORDER BY timestamp ASC
@@ -126,55 +347,179 @@ ORDER BY timestamp ASC
 
 WHOSAYS_QUERY = '''
 SELECT user_id, count(*)
-FROM messages INDEXED BY idx_messages_server_id_clean_content
+FROM messages INDEXED BY idx_messages_server_id_timestamp
 WHERE server_id = :server_id
-  AND lower(clean_content) LIKE lower(:content_query)
+  AND lower(coalesce(clean_content, content)) LIKE lower(:content_query)
   AND user_id <> :bot_id
-  AND msg_type = 'NEW'
+  AND msg_type = 1
 GROUP BY 1
 ORDER BY 2 DESC
 LIMIT :row_count
 '''
 
+# Rollups maintained by MessageWriter; every message row counts, like the raw reports did.
+# Days are UTC dates, stored as YYYY-MM-DD text.
+CREATE_ROLLUP_SERVER_DAY = '''
+CREATE TABLE IF NOT EXISTS rollup_server_day(
+  server_id STRING NOT NULL,
+  day TEXT NOT NULL,
+  distinct_users INTEGER NOT NULL,
+  total_messages INTEGER NOT NULL,
+  PRIMARY KEY(server_id, day)) WITHOUT ROWID
+'''
+
+CREATE_ROLLUP_CHANNEL_DAY_USER = '''
+CREATE TABLE IF NOT EXISTS rollup_channel_day_user(
+  server_id STRING NOT NULL,
+  channel_id STRING NOT NULL,
+  day TEXT NOT NULL,
+  user_id STRING NOT NULL,
+  total_messages INTEGER NOT NULL,
+  PRIMARY KEY(server_id, channel_id, day, user_id)) WITHOUT ROWID
+'''
+
+CREATE_ROLLUP_USER_DAY_CHANNEL = '''
+CREATE TABLE IF NOT EXISTS rollup_user_day_channel(
+  server_id STRING NOT NULL,
+  user_id STRING NOT NULL,
+  day TEXT NOT NULL,
+  channel_id STRING NOT NULL,
+  total_messages INTEGER NOT NULL,
+  PRIMARY KEY(server_id, user_id, day, channel_id)) WITHOUT ROWID
+'''
+
+ROLLUP_TABLES = ['rollup_server_day', 'rollup_channel_day_user', 'rollup_user_day_channel']
+
+# Upserts are INSERT OR IGNORE + UPDATE; ON CONFLICT DO UPDATE needs a newer SQLite than some hosts have
+ROLLUP_USER_SEEN_QUERY = '''
+SELECT 1 FROM rollup_user_day_channel
+WHERE server_id = :server_id AND user_id = :user_id AND day = :day
+LIMIT 1
+'''
+
+ROLLUP_SERVER_DAY_INSERT = '''
+INSERT OR IGNORE INTO rollup_server_day(server_id, day, distinct_users, total_messages)
+VALUES(:server_id, :day, 0, 0)
+'''
+
+ROLLUP_SERVER_DAY_UPDATE = '''
+UPDATE rollup_server_day
+SET distinct_users = distinct_users + :new_users, total_messages = total_messages + :count
+WHERE server_id = :server_id AND day = :day
+'''
+
+ROLLUP_CHANNEL_DAY_USER_INSERT = '''
+INSERT OR IGNORE INTO rollup_channel_day_user(server_id, channel_id, day, user_id, total_messages)
+VALUES(:server_id, :channel_id, :day, :user_id, 0)
+'''
+
+ROLLUP_CHANNEL_DAY_USER_UPDATE = '''
+UPDATE rollup_channel_day_user
+SET total_messages = total_messages + :count
+WHERE server_id = :server_id AND channel_id = :channel_id AND day = :day AND user_id = :user_id
+'''
+
+ROLLUP_USER_DAY_CHANNEL_INSERT = '''
+INSERT OR IGNORE INTO rollup_user_day_channel(server_id, user_id, day, channel_id, total_messages)
+VALUES(:server_id, :user_id, :day, :channel_id, 0)
+'''
+
+ROLLUP_USER_DAY_CHANNEL_UPDATE = '''
+UPDATE rollup_user_day_channel
+SET total_messages = total_messages + :count
+WHERE server_id = :server_id AND user_id = :user_id AND day = :day AND channel_id = :channel_id
+'''
+
+REBUILD_ROLLUP_CHANNEL_DAY_USER = '''
+INSERT INTO rollup_channel_day_user(server_id, channel_id, day, user_id, total_messages)
+SELECT server_id, channel_id, DATE(timestamp), user_id, count(*)
+FROM messages
+GROUP BY 1, 2, 3, 4
+'''
+
+REBUILD_ROLLUP_USER_DAY_CHANNEL = '''
+INSERT INTO rollup_user_day_channel(server_id, user_id, day, channel_id, total_messages)
+SELECT server_id, user_id, day, channel_id, total_messages
+FROM rollup_channel_day_user
+WHERE day >= :first_day
+'''
+
+REBUILD_ROLLUP_SERVER_DAY = '''
+INSERT INTO rollup_server_day(server_id, day, distinct_users, total_messages)
+SELECT server_id, day, COUNT(DISTINCT user_id), SUM(total_messages)
+FROM rollup_channel_day_user
+WHERE day >= :first_day
+GROUP BY 1, 2
+'''
+
+# Days before the oldest message left in the database were archived; their rollups are kept
+FIRST_DAY_QUERY = 'SELECT DATE(min(timestamp)) FROM messages'
+
 DAILY_REPORT_QUERY = '''
-SELECT DATE(timestamp) AS date, COUNT(DISTINCT user_id) AS distinct_users, count(*) AS total_messages
-FROM messages INDEXED BY idx_messages_server_id_timestamp
+SELECT day AS date, distinct_users, total_messages
+FROM rollup_server_day
 WHERE server_id = :server_id
-  AND timestamp > :start_timestamp
-GROUP BY date
-ORDER BY date DESC
+  AND day > :start_day
+ORDER BY day DESC
 LIMIT :row_count
 '''
 
 PERIOD_REPORT_QUERY = '''
-SELECT COUNT(DISTINCT user_id) AS distinct_users, count(*) AS total_messages
-FROM messages INDEXED BY idx_messages_server_id_timestamp
-WHERE server_id = :server_id
-  AND timestamp between :start_timestamp and :end_timestamp
+SELECT
+  (SELECT COUNT(DISTINCT user_id)
+   FROM rollup_user_day_channel
+   WHERE server_id = :server_id
+     AND day >= :start_day AND day < :end_day) AS distinct_users,
+  (SELECT coalesce(SUM(total_messages), 0)
+   FROM rollup_server_day
+   WHERE server_id = :server_id
+     AND day >= :start_day AND day < :end_day) AS total_messages
 '''
 
 CHANNEL_REPORT_QUERY = '''
-SELECT user_id, count(*) AS total_messages
-FROM messages INDEXED BY idx_messages_server_id_channel_id_timestamp
+SELECT user_id, SUM(total_messages) AS total_messages
+FROM rollup_channel_day_user
 WHERE server_id = :server_id
   AND channel_id = :channel_id
-  AND timestamp between :start_timestamp and :end_timestamp
+  AND day >= :start_day AND day < :end_day
 GROUP BY 1
 ORDER BY 2 DESC
 LIMIT :row_count
 '''
 
 USER_REPORT_QUERY = '''
-SELECT channel_id, count(*) AS total_messages
-FROM messages INDEXED BY idx_messages_server_id_user_id_timestamp
+SELECT channel_id, SUM(total_messages) AS total_messages
+FROM rollup_user_day_channel
 WHERE server_id = :server_id
   AND user_id = :user_id
-  AND timestamp between :start_timestamp and :end_timestamp
+  AND day >= :start_day AND day < :end_day
 GROUP BY 1
 ORDER BY 2 DESC
 LIMIT :row_count
 '''
 
+# Exports read in index order, oldest first, so nothing is sorted or buffered
+EXPORT_USER_QUERY = '''
+SELECT m.timestamp, m.channel_id, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+       e.attachments, e.embeds
+FROM messages m INDEXED BY idx_messages_server_id_user_id_timestamp
+LEFT JOIN message_extras e ON e.rowid = m.rowid
+WHERE m.server_id = :server_id
+  AND m.user_id = :user_id
+ORDER BY m.timestamp ASC
+'''
+
+EXPORT_CHANNEL_QUERY = '''
+SELECT m.timestamp, m.user_id, m.msg_type, coalesce(m.clean_content, m.content) AS clean_content,
+       e.attachments, e.embeds
+FROM messages m INDEXED BY idx_messages_server_id_channel_id_timestamp
+LEFT JOIN message_extras e ON e.rowid = m.rowid
+WHERE m.server_id = :server_id
+  AND m.channel_id = :channel_id
+  AND m.user_id <> :bot_id
+ORDER BY m.timestamp ASC
+'''
+
 SENIORITY_BACKFILL_QUERY = '''
 SELECT user_id, content
 FROM messages INDEXED BY idx_messages_server_id_channel_id_timestamp
@@ -191,33 +536,141 @@ class SqlActivityLogger(object):
         self.bot = bot
         self.settings = dataIO.load_json(JSON)
         self.lock = False
+        self.sql_stats = rpadutils.SqlStats()
         self.con = lite.connect(DB, detect_types=lite.PARSE_DECLTYPES)
         self.con.row_factory = lite.Row
+        # WAL lets queries run while the writer thread is committing
+        self.con.execute('PRAGMA journal_mode=WAL')
+        migration_pending = self._upgrade_schema()
         self.con.execute(CREATE_TABLE)
+        self.con.execute(CREATE_EXTRAS_TABLE)
         self.con.execute(CREATE_INDEX_1)
         self.con.execute(CREATE_INDEX_2)
-        self.con.execute(CREATE_INDEX_3)
+        self.con.execute(DROP_INDEX_3)
         self.con.execute(CREATE_INDEX_4)
         self.con.execute(CREATE_INDEX_5)
-        self.insert_timing = deque(maxlen=1000)
+        self.fts_enabled = self._create_fts_table()
+        rollups_exist = self.con.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'rollup_server_day'").fetchone()
+        self.con.execute(CREATE_ROLLUP_SERVER_DAY)
+        self.con.execute(CREATE_ROLLUP_CHANNEL_DAY_USER)
+        self.con.execute(CREATE_ROLLUP_USER_DAY_CHANNEL)
+        self.con.commit()
+
+        self.writer = MessageWriter(DB, self.sql_stats, self.fts_enabled, migration_pending)
+        self.writer.start()
+        if not rollups_exist:
+            # First run with rollups; populate them from the existing history
+            self.writer.rebuild_rollups()
+
+        self.read_pool = ReadPool(DB, READ_POOL_SIZE, self.sql_stats)
+        self.archive_task = bot.loop.create_task(self.archive_loop())
+
+    def _upgrade_schema(self):
+        """Starts the compact schema migration if needed. True while legacy rows remain to be copied."""
+        version = self.con.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            if self.con.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages'").fetchone():
+                print('sqlactivitylog migrating messages to the compact schema')
+                self.con.executescript(START_COMPACT_MIGRATION)
+            else:
+                self.con.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+        return self.con.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_legacy'").fetchone() is not None
+
+    def _create_fts_table(self):
+        """Creates messages_fts if needed, queueing a backfill of existing rows. False if FTS5 is missing."""
+        fts_exists = self.con.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        view_sql = self.con.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'messages_fts_content'").fetchone()
+        if view_sql and 'messages_legacy' in view_sql[0]:
+            # Left behind by migrations that renamed messages out from under the view
+            self.con.execute('DROP VIEW messages_fts_content')
+        self.con.execute(CREATE_FTS_CONTENT_VIEW)
+        try:
+            self.con.execute(CREATE_FTS_TABLE)
+        except lite.OperationalError as ex:
+            print('sqlactivitylog full text search unavailable:', ex)
+            return False
+
+        self.con.execute(CREATE_FTS_BACKFILL_TABLE)
+        if not fts_exists:
+            end_rowid = self.con.execute(MAX_ROWID_QUERY).fetchone()[0]
+            self.con.execute('INSERT INTO fts_backfill VALUES(0, ?)', (end_rowid,))
+        return True
+
+    def _fts_ready(self):
+        return self.fts_enabled and not self.writer.backfill_pending
+
+    def _content_query(self, fts_query, like_query, values):
+        """Picks the FTS query when possible, otherwise the LIKE scan.
+
+        Returns (query, err); err is set for empty patterns, and when the only option
+        is a leading-wildcard scan of the whole server.
+        """
+        wildcard_err = 'You cannot start this query with a wildcard'
+        pattern = values['content_query']
+        if not pattern.strip():
+            return None, 'Query cannot be empty'
+        leading_wildcard = pattern[0] in ('%', '_')
+        if '%' in pattern or '_' in pattern:
+            # LIKE pattern; FTS narrows the candidates and LIKE keeps the exact semantics
+            values['fts_query'] = like_to_fts_query(pattern) if self._fts_ready() else ''
+            if values['fts_query']:
+                return fts_query, None
+            return (None, wildcard_err) if leading_wildcard else (like_query, None)
+
+        if not self._fts_ready():
+            return like_query, None
+        values['fts_query'] = text_to_fts_query(pattern)
+        if not values['fts_query']:
+            return None, 'Query needs at least one word to search for'
+        values['content_query'] = None
+        return fts_query, None
 
     def __unload(self):
         self.lock = True
+        self.archive_task.cancel()
+        # Blocks until everything queued so far is committed
+        self.writer.stop()
+        self.read_pool.close()
         self.con.close()
 
     @commands.command(pass_context=True)
     @checks.is_owner()
     async def rawquery(self, ctx, *, query: str):
-        await self.queryAndPrint(ctx.message.server, query, {}, {})
+        """Run a read-only query against the log database."""
+        await self.queryAndPrint(ctx.message.server, query, {}, [], timeout_secs=RAW_QUERY_TIMEOUT_SECS)
 
     @commands.command(pass_context=True)
     @checks.is_owner()
     async def inserttiming(self, ctx):
-        size = len(self.insert_timing)
-        avg_time = round(sum(self.insert_timing) / size, 4)
-        max_time = round(max(self.insert_timing), 4)
-        min_time = round(min(self.insert_timing), 4)
-        await self.bot.say(inline('{} inserts, min={} max={} avg={}'.format(size, min_time, max_time, avg_time)))
+        """Print write-behind queue depth, batch sizes and commit latency."""
+        await self.bot.say(box(self.writer.stats()))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def sqlstats(self, ctx):
+        """Print per-statement latency percentiles for the log database."""
+        for page in pagify(self.sql_stats.histogram_report()):
+            await self.bot.say(box(page))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def slowqueries(self, ctx):
+        """Print recent statements slower than rpadutils.SLOW_QUERY_SECS, with their query plans."""
+        for page in pagify(self.sql_stats.slow_query_report()):
+            await self.bot.say(box(page))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def indexusage(self, ctx):
+        """Print which indexes the statements run since load actually use.
+
+        Unused indexes only cost time on every insert; check over a representative period first.
+        """
+        index_names = [r[0] for r in self.con.execute(INDEX_NAMES_QUERY)]
+        for page in pagify(self.sql_stats.index_usage_report(index_names)):
+            await self.bot.say(box(page))
 
     @commands.command(pass_context=True)
     @checks.is_owner()
@@ -225,6 +678,81 @@ class SqlActivityLogger(object):
         self.lock = not self.lock
         await self.bot.say(inline('Locked is now {}'.format(self.lock)))
 
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def rebuildrollups(self, ctx):
+        """Recompute the daily report rollups from the raw message history.
+
+        Days that were already archived out of the database keep their rollups.
+
+        Runs on the writer thread; new messages queue up until it finishes.
+        """
+        if self.writer.migration_pending:
+            await self.bot.say(inline('Schema migration still running; rollups are rebuilt once it finishes'))
+            return
+        await self.bot.say(inline('Rebuilding rollups'))
+        before_time = timeit.default_timer()
+        done = self.writer.rebuild_rollups()
+        await self.bot.loop.run_in_executor(None, done.wait)
+        execution_time = timeit.default_timer() - before_time
+        await self.bot.say(inline('Rollups rebuilt in {}s'.format(round(execution_time, 2))))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def compactlogs(self, ctx):
+        """Report the compact schema migration, and vacuum once it is done.
+
+        The migration runs by itself in the background, newest messages first.
+        Space freed by it is only returned to the filesystem by a vacuum, which
+        pauses logging (messages queue up) while it rewrites the database.
+        """
+        if self.writer.migration_pending:
+            await self.bot.say(box(self.writer.migration_stats()))
+            return
+        await self.bot.say(inline('Vacuuming'))
+        done = self.writer.vacuum()
+        await self.bot.loop.run_in_executor(None, done.wait)
+        await self.bot.say(box(self.writer.last_vacuum_result))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def logretention(self, ctx, hot_months: int, retention_months: int):
+        """Set how long messages stay in the database and in the archive.
+
+        Months older than hot_months are moved out of the database into a
+        compressed monthly archive that exlog archive can still search.
+        Archives older than retention_months are deleted.
+        Daily report counts are kept regardless. Use 0 to disable either step.
+        """
+        self.settings['hot_months'] = max(0, hot_months)
+        self.settings['retention_months'] = max(0, retention_months)
+        self.save_json()
+        await self.bot.say(inline('Keeping {} months in the database, {} months of archives'.format(
+            self.settings['hot_months'] or 'all', self.settings['retention_months'] or 'all')))
+
+    @commands.command(pass_context=True)
+    @checks.is_owner()
+    async def archivelogs(self, ctx):
+        """Run the archive and retention step now instead of waiting for the daily run."""
+        await self.bot.say(inline('Archiving'))
+        await self.bot.say(box(await self.run_archive()))
+
+    async def archive_loop(self):
+        while self == self.bot.get_cog('SqlActivityLogger'):
+            try:
+                if self.settings.get('hot_months') or self.settings.get('retention_months'):
+                    print(await self.run_archive())
+            except Exception as ex:
+                print('sqlactivitylog archive failed', ex)
+            await asyncio.sleep(24 * 60 * 60)
+
+    async def run_archive(self):
+        done = self.writer.archive(ARCHIVE_PATH,
+                                   self.settings.get('hot_months', DEFAULT_HOT_MONTHS),
+                                   self.settings.get('retention_months', DEFAULT_RETENTION_MONTHS))
+        await self.bot.loop.run_in_executor(None, done.wait)
+        return self.writer.last_archive_result
+
     @commands.group(pass_context=True, no_pm=True)
     @checks.mod_or_permissions(manage_server=True)
     async def exlog(self, context):
@@ -313,13 +841,11 @@ class SqlActivityLogger(object):
 
         Case-insensitive search of messages from every user/channel.
         Put the query in quotes if it is more than one word.
+        Words match as a phrase; end a word with * for a prefix search (whal*).
+        LIKE patterns with % and _ also work, e.g. "%4 whale%".
         Count is optional, with a low default and a maximum value.
         The bot is excluded from results.
         """
-        if query[0] in ('%', '_'):
-            await self.bot.say('`You cannot start this query with a wildcard`')
-            return
-
         count = min(count, MAX_LOGS)
         server = ctx.message.server
         values = {
@@ -336,7 +862,11 @@ class SqlActivityLogger(object):
             ('clean_content', 'Message'),
         ]
 
-        await self.queryAndPrint(server, CONTENT_QUERY, values, column_data)
+        query, err = self._content_query(CONTENT_FTS_QUERY, CONTENT_QUERY, values)
+        if err:
+            await self.bot.say(inline(err))
+            return
+        await self.queryAndPrint(server, query, values, column_data)
 
     @exlog.command(pass_context=True, no_pm=True)
     async def whosays(self, ctx, query, count=10):
@@ -344,13 +874,10 @@ class SqlActivityLogger(object):
 
         Case-insensitive search of messages from every user/channel, grouped by user.
         Put the query in quotes if it is more than one word.
+        Accepts the same phrase, prefix and LIKE searches as exlog query.
         Count is optional, with a low default and a maximum value.
         The bot is excluded from results.
         """
-        if query[0] in ('%', '_'):
-            await self.bot.say('`You cannot start this query with a wildcard`')
-            return
-
         count = min(count, MAX_LOGS)
         server = ctx.message.server
         values = {
@@ -363,7 +890,85 @@ class SqlActivityLogger(object):
             ('user_id', 'User'),
         ]
 
-        await self.queryAndPrint(server, WHOSAYS_QUERY, values, column_data)
+        query, err = self._content_query(WHOSAYS_FTS_QUERY, WHOSAYS_QUERY, values)
+        if err:
+            await self.bot.say(inline(err))
+            return
+        await self.queryAndPrint(server, query, values, column_data)
+
+    @exlog.command(pass_context=True, no_pm=True)
+    async def archive(self, ctx, month, query, count=10):
+        """exlog archive 2017-01 "4 whale" 100
+
+        Case-insensitive search of an archived month, for messages that are
+        no longer in the database. Same phrase and LIKE syntax as exlog query,
+        except prefix searches. Slow; the whole month is read.
+        """
+        try:
+            datetime.strptime(month, '%Y-%m')
+        except ValueError:
+            await self.bot.say(inline('Month must be YYYY-MM'))
+            return
+
+        archive_file = ARCHIVE_FILE_PATTERN.format(month)
+        if not os.path.exists(archive_file):
+            await self.bot.say(inline('No archive for {}'.format(month)))
+            return
+
+        count = min(count, MAX_LOGS)
+        server = ctx.message.server
+        before_time = timeit.default_timer()
+        rows = await self.bot.loop.run_in_executor(
+            None, search_archive, archive_file, server.id, self.bot.user.id, query, count)
+        execution_time = timeit.default_timer() - before_time
+
+        column_data = [
+            ('timestamp', 'Time (PT)'),
+            ('channel_id', 'Channel'),
+            ('user_id', 'User'),
+            ('msg_type', 'Type'),
+            ('clean_content', 'Message'),
+        ]
+        for idx in range(0, len(rows), STREAM_CHUNK_ROWS):
+            await self._say_table(server, column_data, rows[idx:idx + STREAM_CHUNK_ROWS])
+        await self.bot.say(inline('{} results fetched in {}s'.format(len(rows), round(execution_time, 2))))
+
+    @exlog.group(pass_context=True, no_pm=True)
+    async def export(self, ctx):
+        """Full message histories as a gzipped csv or jsonl attachment."""
+        if ctx.invoked_subcommand is None:
+            await send_cmd_help(ctx)
+
+    @export.command(name='user', pass_context=True, no_pm=True)
+    async def export_user(self, ctx, user: discord.User, fmt='csv'):
+        """exlog export user tactical_retreat jsonl
+
+        Every logged message for a user across all channels, oldest first.
+        Format is csv (default) or jsonl.
+        """
+        server = ctx.message.server
+        values = {
+            'server_id': server.id,
+            'user_id': user.id,
+        }
+        file_name = 'messages-{}-{}'.format(server.id, user.id)
+        await self.exportQuery(ctx, EXPORT_USER_QUERY, values, file_name, fmt)
+
+    @export.command(name='channel', pass_context=True, no_pm=True)
+    async def export_channel(self, ctx, channel: discord.Channel, fmt='csv'):
+        """exlog export channel #general_chat
+
+        Every logged message in a channel, oldest first. The bot is excluded.
+        Format is csv (default) or jsonl.
+        """
+        server = ctx.message.server
+        values = {
+            'server_id': server.id,
+            'bot_id': self.bot.user.id,
+            'channel_id': channel.id,
+        }
+        file_name = 'messages-{}-{}'.format(server.id, channel.id)
+        await self.exportQuery(ctx, EXPORT_CHANNEL_QUERY, values, file_name, fmt)
 
     @exlog.command(pass_context=True, no_pm=True)
     async def dailyreport(self, ctx, count=10):
@@ -377,7 +982,7 @@ class SqlActivityLogger(object):
         values = {
             'server_id': server.id,
             'row_count': count,
-            'start_timestamp': start_date,
+            'start_day': start_date.strftime('%Y-%m-%d'),
         }
         column_data = []
 
@@ -395,14 +1000,11 @@ class SqlActivityLogger(object):
         start_date = datetime.strptime(start_date, "%Y-%m-%d")
         end_date = datetime.strptime(end_date, "%Y-%m-%d")
 
-        start_date = start_date.replace(tzinfo=pytz.utc)
-        end_date = end_date.replace(tzinfo=pytz.utc)
-
         server = ctx.message.server
         values = {
             'server_id': server.id,
-            'start_timestamp': start_date,
-            'end_timestamp': end_date,
+            'start_day': start_date.strftime('%Y-%m-%d'),
+            'end_day': end_date.strftime('%Y-%m-%d'),
         }
         column_data = []
 
@@ -421,15 +1023,12 @@ class SqlActivityLogger(object):
         start_date = datetime.strptime(start_date, "%Y-%m-%d")
         end_date = datetime.strptime(end_date, "%Y-%m-%d")
 
-        start_date = start_date.replace(tzinfo=pytz.utc)
-        end_date = end_date.replace(tzinfo=pytz.utc)
-
         server = ctx.message.server
         values = {
             'server_id': server.id,
             'channel_id': channel.id,
-            'start_timestamp': start_date,
-            'end_timestamp': end_date,
+            'start_day': start_date.strftime('%Y-%m-%d'),
+            'end_day': end_date.strftime('%Y-%m-%d'),
             'row_count': count,
         }
         column_data = []
@@ -449,35 +1048,144 @@ class SqlActivityLogger(object):
         start_date = datetime.strptime(start_date, "%Y-%m-%d")
         end_date = datetime.strptime(end_date, "%Y-%m-%d")
 
-        start_date = start_date.replace(tzinfo=pytz.utc)
-        end_date = end_date.replace(tzinfo=pytz.utc)
-
         server = ctx.message.server
         values = {
             'server_id': server.id,
             'user_id': user.id,
-            'start_timestamp': start_date,
-            'end_timestamp': end_date,
+            'start_day': start_date.strftime('%Y-%m-%d'),
+            'end_day': end_date.strftime('%Y-%m-%d'),
             'row_count': count,
         }
         column_data = []
 
         await self.queryAndPrint(server, USER_REPORT_QUERY, values, column_data)
 
-    async def queryAndPrint(self, server, query, values, column_data, max_rows=MAX_LOGS * 2):
+    async def queryAndPrint(self, server, query, values, column_data, max_rows=MAX_LOGS * 2,
+                            timeout_secs=READ_QUERY_TIMEOUT_SECS):
+        """Runs query on the read pool and streams the results as they are fetched."""
         before_time = timeit.default_timer()
-        cursor = self.con.execute(query, values)
-        rows = cursor.fetchall()
+        try:
+            cursor = await self.read_pool.execute(query, values, timeout_secs)
+        except QueryTimeout:
+            await self.bot.say(inline('Query timed out after {}s'.format(timeout_secs)))
+            return
+        except lite.OperationalError as ex:
+            await self.bot.say(inline('Query failed: {}'.format(ex)))
+            return
+
+        try:
+            if len(column_data) == 0:
+                column_data = ALL_COLUMNS
+
+            results_columns = cursor.columns
+            column_data = [r for r in column_data if r[0] in results_columns]
+            for missing_col in [col for col in results_columns if col not in [c[0] for c in column_data]]:
+                if missing_col in ('attachments', 'embeds'):
+                    # _format_row folds these into the message
+                    continue
+                column_data.append((missing_col, missing_col))
+
+            row_count = 0
+            while row_count <= max_rows:
+                try:
+                    rows = await cursor.fetchmany(min(STREAM_CHUNK_ROWS, max_rows + 1 - row_count))
+                except QueryTimeout:
+                    await self.bot.say(inline('Query timed out after {}s'.format(timeout_secs)))
+                    return
+                if not rows:
+                    break
+
+                await self._say_table(server, column_data, rows)
+                row_count += len(rows)
+        finally:
+            await cursor.close()
+
         execution_time = timeit.default_timer() - before_time
+        await self.bot.say(inline('{} results fetched in {}s'.format(row_count, round(execution_time, 2))))
 
-        if len(column_data) == 0:
-            column_data = ALL_COLUMNS
+    async def exportQuery(self, ctx, query, values, file_name, fmt):
+        """Streams query results into a gzipped temp file a chunk at a time, then uploads it."""
+        if fmt not in EXPORT_FORMATS:
+            await self.bot.say(inline('Format must be one of ' + ', '.join(EXPORT_FORMATS)))
+            return
 
-        results_columns = [d[0] for d in cursor.description]
-        column_data = [r for r in column_data if r[0] in results_columns]
-        for missing_col in [col for col in results_columns if col not in [c[0] for c in column_data]]:
-            column_data.append((missing_col, missing_col))
+        server = ctx.message.server
+        before_time = timeit.default_timer()
+        try:
+            cursor = await self.read_pool.execute(query, values, EXPORT_QUERY_TIMEOUT_SECS)
+        except QueryTimeout:
+            await self.bot.say(inline('Query timed out after {}s'.format(EXPORT_QUERY_TIMEOUT_SECS)))
+            return
+        except lite.OperationalError as ex:
+            await self.bot.say(inline('Query failed: {}'.format(ex)))
+            return
 
+        with tempfile.TemporaryFile() as export_file:
+            try:
+                # Closing the wrapper finishes the gzip stream but leaves export_file open
+                gz_file = gzip.GzipFile(fileobj=export_file, mode='wb')
+                with io.TextIOWrapper(gz_file, encoding='utf-8', newline='') as text_file:
+                    column_names = export_columns(cursor.columns)
+                    writer = None
+                    if fmt == 'csv':
+                        writer = csv.DictWriter(text_file, column_names)
+                        writer.writeheader()
+
+                    row_count = 0
+                    while True:
+                        try:
+                            rows = await cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                        except QueryTimeout:
+                            await self.bot.say(inline('Query timed out after {}s'.format(EXPORT_QUERY_TIMEOUT_SECS)))
+                            return
+                        if not rows:
+                            break
+
+                        for row in rows:
+                            export_row = self._export_row(server, row)
+                            if writer:
+                                writer.writerow(export_row)
+                            else:
+                                text_file.write(json.dumps(export_row) + '\n')
+                        row_count += len(rows)
+
+                        text_file.flush()
+                        if export_file.tell() > EXPORT_MAX_BYTES:
+                            await self.bot.say(inline('Export is over the {} MB upload limit after {} rows'.format(
+                                EXPORT_MAX_BYTES // 1024 // 1024, row_count)))
+                            return
+            finally:
+                await cursor.close()
+
+            execution_time = timeit.default_timer() - before_time
+            msg = '{} rows exported in {}s'.format(row_count, round(execution_time, 2))
+            export_file.seek(0)
+            await self.bot.send_file(ctx.message.channel, export_file,
+                                     filename='{}.{}.gz'.format(file_name, fmt), content=inline(msg))
+
+    def _export_row(self, server, row):
+        """Like _format_row, but untruncated and with ids kept alongside the names."""
+        export_row = {}
+        for col in row.keys():
+            value = row[col]
+            if col in ('attachments', 'embeds'):
+                continue
+            if col == 'timestamp':
+                value = value.replace(tzinfo=pytz.utc).isoformat()
+            if col == 'channel_id':
+                channel = server.get_channel(str(value))
+                export_row['channel_name'] = channel.name if channel else ''
+            if col == 'user_id':
+                member = server.get_member(str(value))
+                export_row['user_name'] = member.name if member else ''
+            if col == 'msg_type':
+                value = MSG_TYPE_NAMES.get(value, value)
+            if col == 'clean_content':
+                value = with_extras(value, row['attachments'], row['embeds'])
+            export_row[col] = str(value) if col.endswith('_id') else value
+        return export_row
+
+    async def _say_table(self, server, column_data, rows):
         column_names = [c[0] for c in column_data]
         column_headers = [c[1] for c in column_data]
 
@@ -485,46 +1193,46 @@ class SqlActivityLogger(object):
         tbl.hrules = prettytable.HEADER
         tbl.vrules = prettytable.NONE
         tbl.align = 'l'
+        for row in rows:
+            tbl.add_row(self._format_row(server, column_names, row))
 
-        for idx, row in enumerate(rows):
-            if idx > max_rows:
-                break
-
-            table_row = list()
-            for col in column_names:
-                if col not in row.keys():
-                    table_row.append('')
-                    continue
-                raw_value = row[col]
-                value = str(raw_value)
-                if col == 'timestamp':
-                    # Assign a UTC timezone to the datetime
-                    raw_value = raw_value.replace(tzinfo=pytz.utc)
-                    # Change the UTC timezone to PT
-                    raw_value = NA_TZ_OBJ.normalize(raw_value)
-                    value = raw_value.strftime("%F %X")
-                if col == 'channel_id':
-                    channel = server.get_channel(value) if server else None
-                    value = channel.name if channel else value
-                if col == 'user_id':
-                    member = server.get_member(value) if server else None
-                    value = member.name if member else value
-                if col == 'server_id':
-                    server_obj = self.bot.get_server(value)
-                    value = server_obj.name if server_obj else value
-                if col == 'clean_content':
-                    value = value.replace('```', '~~~')
-                    value = value.replace('`', '\`')
-                    value = '\n'.join(textwrap.wrap(value, 60))
-                table_row.append(value)
-
-            tbl.add_row(table_row)
-
-        result_text = "{} results fetched in {}s\n{}".format(
-            len(rows), round(execution_time, 2), tbl.get_string())
-        for p in pagify(result_text):
+        for p in pagify(tbl.get_string()):
             await self.bot.say(box(p))
 
+    def _format_row(self, server, column_names, row):
+        table_row = list()
+        for col in column_names:
+            if col not in row.keys():
+                table_row.append('')
+                continue
+            raw_value = row[col]
+            value = str(raw_value)
+            if col == 'timestamp':
+                # Assign a UTC timezone to the datetime
+                raw_value = raw_value.replace(tzinfo=pytz.utc)
+                # Change the UTC timezone to PT
+                raw_value = NA_TZ_OBJ.normalize(raw_value)
+                value = raw_value.strftime("%F %X")
+            if col == 'channel_id':
+                channel = server.get_channel(value) if server else None
+                value = channel.name if channel else value
+            if col == 'user_id':
+                member = server.get_member(value) if server else None
+                value = member.name if member else value
+            if col == 'server_id':
+                server_obj = self.bot.get_server(value)
+                value = server_obj.name if server_obj else value
+            if col == 'msg_type':
+                value = MSG_TYPE_NAMES.get(raw_value, value)
+            if col == 'clean_content':
+                if 'attachments' in row.keys():
+                    value = with_extras(value, row['attachments'], row['embeds'])
+                value = value.replace('```', '~~~')
+                value = value.replace('`', '\`')
+                value = '\n'.join(textwrap.wrap(value, 60))
+            table_row.append(value)
+        return table_row
+
     def save_json(self):
         dataIO.save_json(JSON, self.settings)
 
@@ -544,41 +1252,23 @@ class SqlActivityLogger(object):
         if message.author.id == self.bot.user.id:
             return
 
-        stmt = '''
-          INSERT INTO messages(timestamp, server_id, channel_id, user_id, msg_type, content, clean_content)
-          VALUES(:timestamp, :server_id, :channel_id, :user_id, :msg_type, :content, :clean_content)
-        '''
         timestamp = timestamp or datetime.utcnow()
         server_id = message.server.id if message.server else -1
         channel_id = message.channel.id if message.channel else -1
 
-        msg_content = message.content
-        msg_clean_content = message.clean_content
-        if message.attachments:
-            extra_txt = '\nattachments: ' + str(message.attachments)
-            msg_content = (msg_content + extra_txt).strip()
-            msg_clean_content = (msg_clean_content + extra_txt).strip()
-
-        if message.embeds:
-            extra_txt = '\nembeds: ' + str(message.embeds)
-            msg_content = (msg_content + extra_txt).strip()
-            msg_clean_content = (msg_clean_content + extra_txt).strip()
-
         values = {
             'timestamp': timestamp,
-            'server_id': server_id,
-            'channel_id': channel_id,
-            'user_id': message.author.id,
-            'msg_type': msg_type,
-            'content': msg_content,
-            'clean_content': msg_clean_content,
+            'server_id': int(server_id),
+            'channel_id': int(channel_id),
+            'user_id': int(message.author.id),
+            'msg_type': MSG_TYPES[msg_type],
+            'content': message.content,
+            'clean_content': message.clean_content if message.clean_content != message.content else None,
+            'attachments': str(message.attachments) if message.attachments else None,
+            'embeds': str(message.embeds) if message.embeds else None,
         }
 
-        before_time = timeit.default_timer()
-        self.con.execute(stmt, values)
-        self.con.commit()
-        execution_time = timeit.default_timer() - before_time
-        self.insert_timing.append(execution_time)
+        self.writer.enqueue(values)
 
     def get_server_channel_date_msgs(self, server_id, channel_id, start_date_str):
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
@@ -592,11 +1282,633 @@ class SqlActivityLogger(object):
             'end_timestamp': end_date,
         }
 
-        cursor = self.con.execute(SENIORITY_BACKFILL_QUERY, values)
+        cursor = self.sql_stats.execute(self.con, SENIORITY_BACKFILL_QUERY, values)
         rows = cursor.fetchall()
         return [(str(r['user_id']), str(r['content'])) for r in rows]
 
 
+class MessageWriter(threading.Thread):
+    """Commits logged messages from a dedicated thread.
+
+    Rows are queued from the event loop and inserted with executemany, one
+    transaction per batch, so the gateway never waits on an fsync. A batch is
+    committed once it has WRITE_BATCH_SIZE rows or its oldest row is
+    WRITE_BATCH_MAX_AGE_SECS old.
+
+    New rows are added to messages_fts and counted into the daily rollups in the
+    same transaction. Rows older than the FTS table are backfilled a chunk at a
+    time between batches.
+
+    Archiving also runs here, so moving a month out never races an insert.
+    So does the compact schema migration, which copies legacy rows across in
+    chunks between batches.
+    """
+
+    _REBUILD_ROLLUPS = object()
+    _ARCHIVE = object()
+    _VACUUM = object()
+    _STOP = object()
+
+    def __init__(self, db_path, sql_stats, fts_enabled, migration_pending):
+        super().__init__(name='sqlactivitylog-writer', daemon=True)
+        self.db_path = db_path
+        self.sql_stats = sql_stats
+        self.fts_enabled = fts_enabled
+        self.backfill_pending = fts_enabled
+        self.migration_pending = migration_pending
+        self.queue = queue.Queue(maxsize=WRITE_QUEUE_MAX_SIZE)
+
+        self.batch_sizes = deque(maxlen=1000)
+        self.commit_timing = deque(maxlen=1000)
+        self.written_count = 0
+        self.dropped_count = 0
+        self.error_count = 0
+        self.backfilled_count = 0
+
+        self.migrated_count = 0
+        self.migration_next_rowid = None
+
+        self.archive_params = None
+        self.last_archive_result = ''
+        self.last_vacuum_result = ''
+
+    def enqueue(self, values):
+        try:
+            self.queue.put_nowait(values)
+        except queue.Full:
+            self.dropped_count += 1
+
+    def rebuild_rollups(self):
+        """Queues a rollup rebuild; returns an Event set once it is committed."""
+        done = threading.Event()
+        self.queue.put((self._REBUILD_ROLLUPS, done))
+        return done
+
+    def archive(self, archive_path, hot_months, retention_months):
+        """Queues an archive run; returns an Event set once it finishes."""
+        self.archive_params = (archive_path, hot_months, retention_months)
+        done = threading.Event()
+        self.queue.put((self._ARCHIVE, done))
+        return done
+
+    def vacuum(self):
+        """Queues a VACUUM; returns an Event set once it finishes."""
+        done = threading.Event()
+        self.queue.put((self._VACUUM, done))
+        return done
+
+    def stop(self):
+        self.queue.put((self._STOP, None))
+        self.join()
+
+    def run(self):
+        con = lite.connect(self.db_path)
+        # Safe with WAL; only the last commits can be lost on power failure, never corrupted
+        con.execute('PRAGMA synchronous=NORMAL')
+        try:
+            stopping = False
+            while not stopping:
+                # Wake up periodically while there is backfill work to do
+                idle_timeout = 0.1 if self.backfill_pending or self.migration_pending else None
+                batch, command, done = self._next_batch(idle_timeout)
+                if batch:
+                    self._write_batch(con, batch)
+                if command is self._REBUILD_ROLLUPS:
+                    self._rebuild_rollups(con)
+                if command is self._ARCHIVE:
+                    self.last_archive_result = self._archive(con, *self.archive_params)
+                if command is self._VACUUM:
+                    self.last_vacuum_result = self._vacuum(con)
+                if done:
+                    done.set()
+                stopping = command is self._STOP
+                if self.migration_pending and not stopping:
+                    self._migrate_chunk(con)
+                elif self.backfill_pending and not stopping:
+                    self._backfill_chunk(con)
+        finally:
+            con.close()
+
+    def _next_batch(self, idle_timeout):
+        """Collects rows until the batch is full, old enough, or a command arrives.
+
+        Returns (batch, command, done); command and done are None if no command arrived.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < WRITE_BATCH_SIZE:
+            timeout = idle_timeout if deadline is None else max(0, deadline - timeit.default_timer())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if isinstance(item, tuple):
+                command, done = item
+                return batch, command, done
+
+            batch.append(item)
+            if deadline is None:
+                deadline = timeit.default_timer() + WRITE_BATCH_MAX_AGE_SECS
+        return batch, None, None
+
+    def _write_batch(self, con, batch):
+        before_time = timeit.default_timer()
+        try:
+            with con:
+                start_rowid = self.sql_stats.execute(con, MAX_ROWID_QUERY).fetchone()[0]
+                plain_rows = [row for row in batch if not row['attachments'] and not row['embeds']]
+                self.sql_stats.executemany(con, INSERT_MESSAGE, plain_rows)
+                for row in batch:
+                    if row['attachments'] or row['embeds']:
+                        cursor = self.sql_stats.execute(con, INSERT_MESSAGE, row)
+                        self.sql_stats.execute(con, INSERT_EXTRAS, dict(row, rowid=cursor.lastrowid))
+                if self.fts_enabled:
+                    end_rowid = self.sql_stats.execute(con, MAX_ROWID_QUERY).fetchone()[0]
+                    self.sql_stats.execute(con, FTS_INDEX_ROWS, {'start_rowid': start_rowid, 'end_rowid': end_rowid})
+                self._update_rollups(con, batch)
+        except Exception as ex:
+            self.error_count += 1
+            print('sqlactivitylog failed to write {} rows: {}'.format(len(batch), ex))
+            return
+        self.commit_timing.append(timeit.default_timer() - before_time)
+        self.batch_sizes.append(len(batch))
+        self.written_count += len(batch)
+
+    def _update_rollups(self, con, batch):
+        channel_counts = defaultdict(int)
+        for row in batch:
+            key = (row['server_id'], row['channel_id'], rollup_day(row['timestamp']), row['user_id'])
+            channel_counts[key] += 1
+
+        # A user is new for the day if the rollup has no rows for them yet; check before updating it
+        server_counts = defaultdict(int)
+        server_new_users = defaultdict(int)
+        checked_users = set()
+        for (server_id, channel_id, day, user_id), count in channel_counts.items():
+            server_counts[(server_id, day)] += count
+            if (server_id, day, user_id) in checked_users:
+                continue
+            checked_users.add((server_id, day, user_id))
+            seen = self.sql_stats.execute(con, ROLLUP_USER_SEEN_QUERY,
+                                          {'server_id': server_id, 'user_id': user_id, 'day': day}).fetchone()
+            if not seen:
+                server_new_users[(server_id, day)] += 1
+
+        channel_values = [{'server_id': k[0], 'channel_id': k[1], 'day': k[2], 'user_id': k[3], 'count': v}
+                          for k, v in channel_counts.items()]
+        server_values = [{'server_id': k[0], 'day': k[1], 'count': v, 'new_users': server_new_users[k]}
+                         for k, v in server_counts.items()]
+
+        self.sql_stats.executemany(con, ROLLUP_CHANNEL_DAY_USER_INSERT, channel_values)
+        self.sql_stats.executemany(con, ROLLUP_CHANNEL_DAY_USER_UPDATE, channel_values)
+        self.sql_stats.executemany(con, ROLLUP_USER_DAY_CHANNEL_INSERT, channel_values)
+        self.sql_stats.executemany(con, ROLLUP_USER_DAY_CHANNEL_UPDATE, channel_values)
+        self.sql_stats.executemany(con, ROLLUP_SERVER_DAY_INSERT, server_values)
+        self.sql_stats.executemany(con, ROLLUP_SERVER_DAY_UPDATE, server_values)
+
+    def _rebuild_rollups(self, con):
+        """Returns False if the rebuild failed, or was skipped because the migration is running."""
+        if self.migration_pending:
+            # Legacy rows are not in messages yet; the migration rebuilds once they are
+            return False
+        try:
+            with con:
+                first_day = self.sql_stats.execute(con, FIRST_DAY_QUERY).fetchone()[0]
+                if first_day is None:
+                    return True
+                values = {'first_day': first_day}
+                for table in ROLLUP_TABLES:
+                    con.execute('DELETE FROM {} WHERE day >= :first_day'.format(table), values)
+                self.sql_stats.execute(con, REBUILD_ROLLUP_CHANNEL_DAY_USER)
+                self.sql_stats.execute(con, REBUILD_ROLLUP_USER_DAY_CHANNEL, values)
+                self.sql_stats.execute(con, REBUILD_ROLLUP_SERVER_DAY, values)
+        except Exception as ex:
+            self.error_count += 1
+            print('sqlactivitylog rollup rebuild failed: {}'.format(ex))
+            return False
+        return True
+
+    def _archive(self, con, archive_path, hot_months, retention_months):
+        """Moves whole months older than hot_months into archive files, then applies retention.
+
+        Rollups are left alone, so reports still cover archived months. Messages
+        are only removed after their archive file is safely on disk.
+        """
+        if self.backfill_pending:
+            # Removing rows from messages_fts needs them to have been indexed first
+            return 'FTS backfill still running, try again later'
+        if self.migration_pending:
+            return 'schema migration still running, try again later'
+
+        os.makedirs(archive_path, exist_ok=True)
+        results = []
+        try:
+            if hot_months:
+                cutoff = add_months(month_start(datetime.utcnow()), -hot_months)
+                while True:
+                    oldest = self.sql_stats.execute(con, OLDEST_TIMESTAMP_QUERY).fetchone()[0]
+                    if oldest is None:
+                        break
+                    start = month_start(datetime.strptime(oldest[:7], '%Y-%m'))
+                    if start >= cutoff:
+                        break
+                    count = self._archive_month(con, archive_path, start)
+                    results.append('archived {} rows from {}'.format(count, start.strftime('%Y-%m')))
+
+            if retention_months:
+                oldest_kept = add_months(month_start(datetime.utcnow()), -retention_months).strftime('%Y-%m')
+                for file_name in sorted(os.listdir(archive_path)):
+                    month = file_name[len('messages-'):len('messages-YYYY-MM')]
+                    if file_name.startswith('messages-') and month < oldest_kept:
+                        os.remove(os.path.join(archive_path, file_name))
+                        results.append('deleted archive for {}'.format(month))
+        except Exception as ex:
+            self.error_count += 1
+            results.append('archive failed: {}'.format(ex))
+            print('sqlactivitylog archive failed: {}'.format(ex))
+
+        return '\n'.join(results) or 'nothing to archive'
+
+    def _archive_month(self, con, archive_path, start):
+        values = {
+            'start_timestamp': start.strftime(TIMESTAMP_FORMAT),
+            'end_timestamp': add_months(start, 1).strftime(TIMESTAMP_FORMAT),
+        }
+        archive_file = os.path.join(archive_path, 'messages-{}.jsonl.gz'.format(start.strftime('%Y-%m')))
+        tmp_file = archive_file + '.tmp'
+
+        count = 0
+        with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+            for row in self.sql_stats.execute(con, ARCHIVE_MONTH_QUERY, values):
+                f.write(json.dumps({
+                    'timestamp': row[1],
+                    'server_id': str(row[2]),
+                    'channel_id': str(row[3]),
+                    'user_id': str(row[4]),
+                    'msg_type': MSG_TYPE_NAMES.get(row[5], row[5]),
+                    'content': with_extras(row[6], row[8], row[9]),
+                    'clean_content': with_extras(row[7], row[8], row[9]),
+                }) + '\n')
+                count += 1
+
+        # Late rows for an already archived month are appended as another gzip member
+        if os.path.exists(archive_file):
+            with open(tmp_file, 'rb') as new_f:
+                new_bytes = new_f.read()
+            with open(archive_file, 'rb') as old_f, open(tmp_file, 'wb') as f:
+                f.write(old_f.read())
+                f.write(new_bytes)
+        with open(tmp_file, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_file, archive_file)
+
+        with con:
+            if self.fts_enabled:
+                self.sql_stats.execute(con, ARCHIVE_FTS_DELETE, values)
+            self.sql_stats.execute(con, ARCHIVE_EXTRAS_DELETE, values)
+            self.sql_stats.execute(con, ARCHIVE_DELETE, values)
+        return count
+
+    def _migrate_chunk(self, con):
+        """Copies the newest LEGACY_CHUNK_ROWS legacy rows into the compact table, with their FTS entries."""
+        try:
+            rows = self.sql_stats.execute(con, LEGACY_CHUNK_QUERY, {'row_count': LEGACY_CHUNK_ROWS}).fetchall()
+            if not rows:
+                # Rollups only counted new messages while legacy rows were copied. Rebuilt
+                # before the legacy table goes away, so a restart in between still gets here
+                self.migration_pending = False
+                if not self._rebuild_rollups(con):
+                    self.migration_pending = True
+                    return
+                con.execute('DROP TABLE messages_legacy')
+                print('sqlactivitylog compact schema migration done, {} rows'.format(self.migrated_count))
+                return
+
+            compact_rows = [compact_legacy_row(row) for row in rows]
+            start_rowid = rows[-1][0]
+            with con:
+                self.sql_stats.executemany(con, INSERT_LEGACY_MESSAGE, compact_rows)
+                extras_rows = [row for row in compact_rows if row['attachments'] or row['embeds']]
+                self.sql_stats.executemany(con, INSERT_EXTRAS, extras_rows)
+                if self.fts_enabled:
+                    fts_values = {'start_rowid': start_rowid - 1, 'end_rowid': rows[0][0]}
+                    self.sql_stats.execute(con, FTS_INDEX_ROWS, fts_values)
+                self.sql_stats.execute(con, LEGACY_DELETE, {'start_rowid': start_rowid})
+            self.migrated_count += len(rows)
+            self.migration_next_rowid = start_rowid - 1
+        except Exception as ex:
+            self.error_count += 1
+            print('sqlactivitylog schema migration failed: {}'.format(ex))
+
+    def migration_stats(self):
+        msg = 'compact schema migration: {} rows copied'.format(self.migrated_count)
+        if self.migration_next_rowid is not None:
+            msg += ', at most {} left'.format(self.migration_next_rowid)
+        return msg
+
+    def _vacuum(self, con):
+        before_time = timeit.default_timer()
+        try:
+            # In WAL mode pages land in the WAL first; checkpoint so the file sizes are comparable
+            con.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            before_size = os.path.getsize(self.db_path)
+            con.execute('VACUUM')
+            con.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception as ex:
+            self.error_count += 1
+            return 'vacuum failed: {}'.format(ex)
+        execution_time = timeit.default_timer() - before_time
+        after_size = os.path.getsize(self.db_path)
+        return 'vacuumed in {}s: {} MB -> {} MB'.format(
+            round(execution_time, 2), round(before_size / 1024 / 1024, 1), round(after_size / 1024 / 1024, 1))
+
+    def _backfill_chunk(self, con):
+        try:
+            row = con.execute('SELECT next_rowid, end_rowid FROM fts_backfill').fetchone()
+            if row is None:
+                self.backfill_pending = False
+                return
+
+            next_rowid, end_rowid = row
+            chunk_end_rowid = min(next_rowid + FTS_BACKFILL_CHUNK, end_rowid)
+            with con:
+                self.sql_stats.execute(con, FTS_INDEX_ROWS, {'start_rowid': next_rowid, 'end_rowid': chunk_end_rowid})
+                if chunk_end_rowid >= end_rowid:
+                    con.execute('DELETE FROM fts_backfill')
+                else:
+                    con.execute('UPDATE fts_backfill SET next_rowid = ?', (chunk_end_rowid,))
+            self.backfilled_count += chunk_end_rowid - next_rowid
+        except Exception as ex:
+            self.error_count += 1
+            print('sqlactivitylog fts backfill failed: {}'.format(ex))
+
+    def stats(self):
+        msg = 'queue depth: {}\nwritten: {}\ndropped: {}\nfailed batches: {}'.format(
+            self.queue.qsize(), self.written_count, self.dropped_count, self.error_count)
+        if self.migration_pending or self.migrated_count:
+            msg += '\n' + self.migration_stats() + (', in progress' if self.migration_pending else ', done')
+        if self.fts_enabled:
+            msg += '\nfts backfill: {} rows{}'.format(
+                self.backfilled_count, ', in progress' if self.backfill_pending else ', done')
+        if self.batch_sizes:
+            msg += '\nbatch size: avg={} max={}'.format(
+                round(sum(self.batch_sizes) / len(self.batch_sizes), 1), max(self.batch_sizes))
+        if self.commit_timing:
+            msg += '\ncommit latency: min={} max={} avg={}'.format(
+                round(min(self.commit_timing), 4), round(max(self.commit_timing), 4),
+                round(sum(self.commit_timing) / len(self.commit_timing), 4))
+        return msg
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class ReadPool(object):
+    """A few read-only connections, each used from a worker thread.
+
+    Queries never run on the event loop or on the writer's connection, so a
+    slow report neither freezes the bot nor delays logging. Each query has a
+    time limit on its worker-thread time, enforced through the SQLite progress
+    handler.
+    """
+
+    def __init__(self, db_path, size, sql_stats):
+        self.sql_stats = sql_stats
+        self.executor = ThreadPoolExecutor(max_workers=size)
+        # Connections are handed out on the event loop; the semaphore queues callers when all are busy
+        self.semaphore = asyncio.Semaphore(size)
+        self.connections = []
+        for _ in range(size):
+            con = lite.connect('file:{}?mode=ro'.format(db_path), uri=True,
+                               detect_types=lite.PARSE_DECLTYPES, check_same_thread=False)
+            con.row_factory = lite.Row
+            self.connections.append(con)
+
+    async def execute(self, query, values, timeout_secs):
+        """Returns a ReadCursor holding one of the connections until it is closed."""
+        await self.semaphore.acquire()
+        con = self.connections.pop()
+
+        cursor = ReadCursor(self, con, query, timeout_secs)
+        try:
+            if self.sql_stats.needs_plan(query):
+                await asyncio.get_event_loop().run_in_executor(
+                    self.executor, self.sql_stats.capture_plan, con, query, values)
+            await cursor.run(con.execute, query, values)
+        except BaseException:
+            await cursor.close()
+            raise
+        return cursor
+
+    def release(self, con):
+        self.connections.append(con)
+        self.semaphore.release()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for con in self.connections:
+            con.close()
+        self.connections = []
+
+
+class ReadCursor(object):
+    """A statement running on a ReadPool connection; its latency is recorded when it is closed."""
+
+    def __init__(self, pool, con, query, timeout_secs):
+        self.pool = pool
+        self.con = con
+        self.query = query
+        self.cursor = None
+        self.columns = []
+        # Time spent running the statement on the worker thread, across execute and fetches
+        self.elapsed_secs = 0
+        # Start of the execute or fetch currently running on the worker thread, if any
+        self.run_start = None
+        # The timeout counts only that worker time, not time spent sending pages between fetches
+        self.timeout_secs = timeout_secs
+        # Returning non-zero from the handler aborts the running statement
+        con.set_progress_handler(lambda: self._busy_secs() > self.timeout_secs, 10000)
+
+    def _busy_secs(self):
+        run_start = self.run_start
+        if run_start is None:
+            return self.elapsed_secs
+        return self.elapsed_secs + timeit.default_timer() - run_start
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_event_loop()
+        try:
+            result = await loop.run_in_executor(self.pool.executor, self._timed, fn, *args)
+        except lite.OperationalError as ex:
+            if self.elapsed_secs > self.timeout_secs:
+                raise QueryTimeout() from ex
+            raise
+        if isinstance(result, lite.Cursor):
+            self.cursor = result
+            self.columns = [d[0] for d in result.description or []]
+        return result
+
+    def _timed(self, fn, *args):
+        self.run_start = timeit.default_timer()
+        try:
+            return fn(*args)
+        finally:
+            self.elapsed_secs += timeit.default_timer() - self.run_start
+            self.run_start = None
+
+    async def fetchmany(self, size):
+        if self.cursor is None:
+            return []
+        return await self.run(self.cursor.fetchmany, size)
+
+    async def close(self):
+        if self.con is None:
+            return
+        self.pool.sql_stats.record(self.query, self.elapsed_secs)
+        con, self.con = self.con, None
+        con.set_progress_handler(None, 0)
+        if self.cursor is not None:
+            self.cursor.close()
+        self.pool.release(con)
+
+
+def export_columns(columns):
+    """Export file columns for a query; names follow their ids and the extras fold into clean_content."""
+    export_cols = []
+    for col in columns:
+        if col in ('attachments', 'embeds'):
+            continue
+        export_cols.append(col)
+        if col == 'channel_id':
+            export_cols.append('channel_name')
+        if col == 'user_id':
+            export_cols.append('user_name')
+    return export_cols
+
+
+def split_extras(text):
+    """Splits off the attachment/embed reprs the original schema appended to message text.
+
+    Returns (text, attachments, embeds).
+    """
+    extras = {}
+    for name in ('embeds', 'attachments'):
+        marker = name + ': ['
+        idx = text.rfind('\n' + marker)
+        if idx != -1 and text.endswith(']'):
+            extras[name] = text[idx + len(marker):]
+            text = text[:idx]
+        elif text.startswith(marker) and text.endswith(']'):
+            extras[name] = text[len(marker) - 1:]
+            text = ''
+    return text, extras.get('attachments'), extras.get('embeds')
+
+
+def with_extras(text, attachments, embeds):
+    """Inverse of split_extras; the message text as the original schema stored it."""
+    if attachments:
+        text = (text + '\nattachments: ' + attachments).strip()
+    if embeds:
+        text = (text + '\nembeds: ' + embeds).strip()
+    return text
+
+
+def compact_legacy_row(row):
+    """Converts a messages_legacy row to INSERT_LEGACY_MESSAGE / INSERT_EXTRAS values."""
+    rowid, timestamp, server_id, channel_id, user_id, msg_type, content, clean_content = row
+    content, attachments, embeds = split_extras(content)
+    clean_content = split_extras(clean_content)[0]
+    return {
+        'rowid': rowid,
+        'timestamp': timestamp,
+        'server_id': server_id,
+        'channel_id': channel_id,
+        'user_id': user_id,
+        'msg_type': MSG_TYPES.get(msg_type, msg_type),
+        'content': content,
+        'clean_content': clean_content if clean_content != content else None,
+        'attachments': attachments,
+        'embeds': embeds,
+    }
+
+
+def month_start(dt):
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(dt, months):
+    """Shifts a first-of-month datetime by a number of months."""
+    month_index = dt.year * 12 + dt.month - 1 + months
+    return dt.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def like_to_regex(pattern):
+    """Compiles a LIKE pattern; plain text matches anywhere, like an FTS phrase."""
+    if '%' not in pattern and '_' not in pattern:
+        return re.compile(re.escape(pattern), re.IGNORECASE)
+    parts = []
+    for c in pattern:
+        parts.append('.*' if c == '%' else '.' if c == '_' else re.escape(c))
+    return re.compile('^' + ''.join(parts) + '$', re.IGNORECASE | re.DOTALL)
+
+
+def search_archive(archive_file, server_id, bot_id, query, count):
+    """Scans one archive file; returns the last count matches, oldest first."""
+    regex = like_to_regex(query)
+    matches = deque(maxlen=count)
+    with gzip.open(archive_file, 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            if str(row['server_id']) != server_id or str(row['user_id']) == bot_id:
+                continue
+            if regex.search(row['clean_content']):
+                row['timestamp'] = datetime.strptime(row['timestamp'][:19], TIMESTAMP_FORMAT)
+                matches.append(row)
+    return sorted(matches, key=lambda r: r['timestamp'])
+
+
+def rollup_day(timestamp):
+    """The UTC date a message is counted under, matching SQLite's DATE(timestamp)."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(pytz.utc)
+    return timestamp.strftime('%Y-%m-%d')
+
+
+def text_to_fts_query(text):
+    """Builds an FTS5 phrase query from the words in text; a word followed by * is a prefix term.
+
+    Every term is quoted, so user input can never be parsed as FTS5 syntax.
+    Returns '' if the text has no words.
+    """
+    terms = []
+    for match in re.finditer(r'([^\W_]+)(\*?)', text):
+        terms.append('"{}"{}'.format(match.group(1).lower(), match.group(2)))
+    return ' + '.join(terms)
+
+
+def like_to_fts_query(pattern):
+    """Builds an FTS5 query matching a superset of the rows a LIKE pattern matches.
+
+    Only whole words are used, since FTS can't match inside a word; a word cut
+    off by a trailing wildcard becomes a prefix term. Returns '' if the pattern
+    has no usable words.
+    """
+    terms = []
+    segments = re.split(r'[%_]', pattern)
+    for idx, segment in enumerate(segments):
+        open_left = idx > 0
+        open_right = idx < len(segments) - 1
+        for match in re.finditer(r'[^\W_]+', segment):
+            if match.start() == 0 and open_left:
+                # Could be the tail of a longer word
+                continue
+            prefix = match.end() == len(segment) and open_right
+            terms.append('"{}"{}'.format(match.group(0).lower(), '*' if prefix else ''))
+    return ' '.join(terms)
+
+
 def check_folders():
     if not os.path.exists(PATH):
         os.mkdir(PATH)